@@ -17,17 +17,89 @@ mkdir -p "$IA_PS3_DIR" "$LOGS_DIR"
 CACHE_FILE="$IA_PS3_DIR/ps3_items_cache.txt"
 PKG_FILE="$IA_PS3_DIR/pkg_links.txt"  # Archivo para almacenar los enlaces PKG
 
+# Módulos Python de la imagen (con su bytecode ya compilado) y catálogo PKG compilado
+# en la construcción: las listas se cargan sin volver a parsear los .txt
+PS3_LIB_DIR="${PS3_LIB_DIR:-/usr/lib/ps3}"
+CATALOGO="${PS3_CATALOGO:-$PS3_LIB_DIR/pkg_catalogo.bin}"
+
 hora() {
     date +%H:%M:%S
 }
 
+# Ejecuta un módulo de PS3_LIB_DIR (python3 -m usa el bytecode precompilado)
+ps3_py() {
+    PYTHONPATH="$PS3_LIB_DIR${PYTHONPATH:+:$PYTHONPATH}" python3 -m "$@"
+}
+
+# Pool de libray: como mucho LIBRAY_HILOS desencriptados a la vez (por defecto uno por núcleo).
+# Cada hueco es una ficha en un FIFO: un trabajo arranca en cuanto otro devuelve la suya.
+LIBRAY_HILOS="${LIBRAY_HILOS:-$(nproc 2>/dev/null || echo 2)}"
+ESTADOS_DIR=""
+
+iniciar_pool_libray() {
+    local fifo i
+    fifo=$(mktemp -u "${TMPDIR:-/tmp}/ps3_libray.XXXXXX")
+    mkfifo "$fifo"
+    exec 3<>"$fifo"
+    rm -f "$fifo"
+    for ((i = 0; i < LIBRAY_HILOS; i++)); do
+        printf 'x\n' >&3
+    done
+    ESTADOS_DIR=$(mktemp -d)
+    printf "${rojo}[$(hora)] ${cyan}⚙️ Pool de libray: $LIBRAY_HILOS proceso(s) simultáneo(s)${sincolor}\n"
+}
+
+registrar_estado() {
+    # $1 = nº de trabajo, $2 = estado (OK / ERROR ...), $3 = archivo, $4 = detalle
+    printf '%s\t%s\t%s\n' "$2" "$3" "$4" > "$ESTADOS_DIR/$(printf '%05d' "$1")"
+}
+
+resumen_trabajos() {
+    local ok=0 fallos=0 estado archivo detalle f
+    printf "\n${cyan}📋 Resumen por archivo:${sincolor}\n"
+    for f in "$ESTADOS_DIR"/*; do
+        [[ -f "$f" ]] || continue
+        IFS=$'\t' read -r estado archivo detalle < "$f"
+        if [[ "$estado" == "OK" ]]; then
+            ok=$((ok + 1))
+            printf "  ${verde}✅ %s${sincolor} → %s\n" "$archivo" "$detalle"
+        else
+            fallos=$((fallos + 1))
+            printf "  ${rojo}❌ %s [%s]${sincolor} → %s\n" "$archivo" "$estado" "$detalle"
+        fi
+    done
+    rm -rf "$ESTADOS_DIR"
+    ESTADOS_DIR=""
+    exec 3>&-
+    if [[ $fallos -eq 0 ]]; then
+        printf "${verde}[$(hora)] ✅ $ok archivo(s) descargados y procesados con éxito. ${sincolor}\n"
+    else
+        printf "${rojo}[$(hora)] ⚠️ $ok correcto(s), $fallos con errores. Revisa los logs indicados.${sincolor}\n"
+    fi
+}
+
 finalizar() {
     printf "${rojo} \n\n Finalizando el script${sincolor}\n"
+    if [[ -n "$ESTADOS_DIR" ]]; then rm -rf "$ESTADOS_DIR"; fi
     exit
 }
 
 trap finalizar SIGINT
 
+# Caché compartida de descargas: si se monta una carpeta y se define PS3_CACHE_DIR
+# (por ejemplo -v /mnt/nas/ps3cache:/cache -e PS3_CACHE_DIR=/cache), arrancamos el
+# proxy local con caché y lo usan curl e ia para las URLs http:// (enlaces PKG)
+iniciar_proxy_cache() {
+    [[ -n "${PS3_CACHE_DIR:-}" ]] || return 0
+    command -v python3 >/dev/null && [[ -f "$PS3_LIB_DIR/ps3_cache.py" ]] || return 0
+    local puerto="${PS3_CACHE_PUERTO:-8118}"
+    ps3_py ps3_cache proxy --puerto "$puerto" > "$LOGS_DIR/ps3_cache_proxy.log" 2>&1 &
+    export http_proxy="http://127.0.0.1:$puerto"
+    printf "${verde}🗄️ Caché compartida activa en $PS3_CACHE_DIR (proxy $http_proxy)${sincolor}\n"
+}
+
+iniciar_proxy_cache
+
 configurar_cuenta_ia() {
     printf "\n${amarillo}🔐 Configuración de cuenta Internet Archive${sincolor}\n"
     printf "${cyan}Se necesitan credenciales para acceder a archive.org${sincolor}\n\n"
@@ -189,14 +261,13 @@ descargar_desde_ia() {
     procesar_archivo() {
         local input_file="$1"
         local output_file="$2"
+        local n="$3"
         local log_file="$LOGS_DIR/libray_$(basename "${input_file//[^a-zA-Z0-9]/_}").log"
-        local item_dir
+        local item_dir ficha rc=0
         item_dir=$(dirname "$input_file")
-        
-        while pgrep -x "libray" > /dev/null; do
-            printf "${rojo}[$(hora)] ⏳ Esperando a que termine un proceso de 'libray' antes de iniciar el siguiente...${sincolor}\n"
-            sleep 300
-        done
+
+        # Espera una ficha libre del pool (bloquea sin sondear)
+        read -r -u 3 ficha
 
         printf "${rojo}[$(hora)] ${cyan}🔐 Procesando:${sincolor} $input_file\n"
         if libray -i "$input_file" -o "$output_file" > "$log_file" 2>&1; then
@@ -206,27 +277,44 @@ descargar_desde_ia() {
             printf "${rojo}[$(hora)] ${cyan}🧹 Eliminando log: $log_file ${sincolor}\n"
             rm -f "$log_file"
             [[ -d "$item_dir" && -z "$(ls -A "$item_dir")" ]] && rmdir "$item_dir" && printf "🧼 Carpeta vacía detectada, eliminando: $item_dir\n"
+            registrar_estado "$n" "OK" "$(basename "$input_file")" "$output_file"
         else
+            rc=$?
             printf "${rojo}[$(hora)] ❌ Error procesando $input_file. Revisa '$log_file'.${sincolor}\n"
+            registrar_estado "$n" "ERROR libray rc=$rc" "$(basename "$input_file")" "$log_file"
         fi
+
+        # Devuelve la ficha: el siguiente archivo en cola arranca al instante
+        printf '%s\n' "$ficha" >&3
     }
 
+    iniciar_pool_libray
+    N=0
+    PIDS_LIBRAY=()
     for FILE_NAME in "${SELECTED_FILES[@]}"; do
+        N=$((N + 1))
         printf "${rojo}[$(hora)] ${cyan}📥 Iniciando descarga de: ${sincolor} $FILE_NAME\n"
-        descargar_archivo "$SELECTED_ITEM" "$FILE_NAME" "$DEST_PATH"
 
         PENDING_INPUT_FILE="$DEST_PATH/$(basename "$SELECTED_ITEM")/$FILE_NAME"
         PENDING_OUTPUT_FILE="$FINAL_DEST_PATH/$(echo "$FILE_NAME" | sed 's/[[:space:]]/_/g' | sed "s/'//g" | sed 's/\"//g' | sed 's/[^a-zA-Z0-9._-]//g').decrypted.iso"
 
-        if [[ -n "$PENDING_INPUT_FILE" ]]; then
-            procesar_archivo "$PENDING_INPUT_FILE" "$PENDING_OUTPUT_FILE" &
+        if ! descargar_archivo "$SELECTED_ITEM" "$FILE_NAME" "$DEST_PATH"; then
+            registrar_estado "$N" "ERROR descarga" "$FILE_NAME" "$LOGS_DIR/download_${FILE_NAME//[^a-zA-Z0-9]/_}.log"
+            continue
         fi
+
+        # Se encola en segundo plano y se sigue descargando; libray arranca cuando haya hueco
+        procesar_archivo "$PENDING_INPUT_FILE" "$PENDING_OUTPUT_FILE" "$N" &
+        PIDS_LIBRAY+=("$!")
     done
 
-    printf "${rojo}[$(hora)] ${verde}📥 Iniciando descarga del siguiente archivo... ${sincolor}\n"
-    wait
+    printf "${rojo}[$(hora)] ${cyan}⏳ Descargas terminadas, esperando a los procesos de libray... ${sincolor}\n"
+    # Se espera solo a los trabajos de libray, no a otros procesos en segundo plano (p. ej. el proxy de caché)
+    if [[ ${#PIDS_LIBRAY[@]} -gt 0 ]]; then
+        wait "${PIDS_LIBRAY[@]}"
+    fi
 
-    printf "${verde}[$(hora)] ✅ Todos los archivos han sido descargados y procesados con éxito. ${sincolor}\n"
+    resumen_trabajos
 }
 
 descargar_desde_pkg() {
@@ -243,9 +331,13 @@ descargar_desde_pkg() {
     # Crear carpeta si no existe
     mkdir -p "$PKG_DIR"
 
-    # Buscar ficheros .txt disponibles dentro de ~/.iaPS3/pkg
+    # Listas del catálogo compilado (si existe) más los .txt propios de ~/.iaPS3/pkg
+    TXT_FILES=()
+    if [[ -f "$CATALOGO" && -f "$PS3_LIB_DIR/ps3_catalogo.py" ]] && command -v python3 >/dev/null; then
+        mapfile -t TXT_FILES < <(ps3_py ps3_catalogo listas "$CATALOGO")
+    fi
     printf "${cyan}🔍 Buscando ficheros .txt en $PKG_DIR...${sincolor}\n"
-    mapfile -t TXT_FILES < <(find "$PKG_DIR" -type f -name "*.txt")
+    mapfile -t -O "${#TXT_FILES[@]}" TXT_FILES < <(find "$PKG_DIR" -type f -name "*.txt")
 
     if [[ ${#TXT_FILES[@]} -eq 0 ]]; then
         printf "${rojo}❌ No se encontraron ficheros .txt en $PKG_DIR${sincolor}\n"
@@ -265,16 +357,24 @@ descargar_desde_pkg() {
 
     # Combinar todos los archivos seleccionados en uno temporal
     temp_file=$(mktemp)
+    listas_catalogo=()
     for file in $SELECTED_TXT; do
+        if [[ ! -f "$file" ]]; then
+            listas_catalogo+=("$file")
+            continue
+        fi
         awk '
         BEGIN { RS = ""; FS = "\n" }
         {
             name = $1
             url = $2
-            gsub(/ - (BCES|BLES)[0-9]{5}.*/, "", name)
+            gsub(/ - [A-Z][A-Z][A-Z][A-Z][0-9][0-9][0-9][0-9][0-9].*/, "", name)
             print name "|" url
         }' "$file" >> "$temp_file"
     done
+    if [[ ${#listas_catalogo[@]} -gt 0 ]]; then
+        ps3_py ps3_catalogo entradas "$CATALOGO" "${listas_catalogo[@]}" >> "$temp_file"
+    fi
 
     # Selector múltiple de juegos
     seleccion=$(cut -d '|' -f 1 "$temp_file" | fzf --multi --height=40% --reverse --prompt="Selecciona juegos PKG: ")
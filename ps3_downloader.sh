@@ -40,8 +40,56 @@ hora() {
     date +%H:%M:%S
 }
 
+# Pool de libray: como mucho LIBRAY_HILOS desencriptados a la vez (por defecto uno por núcleo).
+# Cada hueco es una ficha en un FIFO: un trabajo arranca en cuanto otro devuelve la suya.
+LIBRAY_HILOS="${LIBRAY_HILOS:-$(nproc 2>/dev/null || echo 2)}"
+ESTADOS_DIR=""
+
+iniciar_pool_libray() {
+    local fifo i
+    fifo=$(mktemp -u "${TMPDIR:-/tmp}/ps3_libray.XXXXXX")
+    mkfifo "$fifo"
+    exec 3<>"$fifo"
+    rm -f "$fifo"
+    for ((i = 0; i < LIBRAY_HILOS; i++)); do
+        printf 'x\n' >&3
+    done
+    ESTADOS_DIR=$(mktemp -d)
+    printf "${rojo}[$(hora)] ${cyan}⚙️ Pool de libray: $LIBRAY_HILOS proceso(s) simultáneo(s)${sincolor}\n"
+}
+
+registrar_estado() {
+    # $1 = nº de trabajo, $2 = estado (OK / ERROR ...), $3 = archivo, $4 = detalle
+    printf '%s\t%s\t%s\n' "$2" "$3" "$4" > "$ESTADOS_DIR/$(printf '%05d' "$1")"
+}
+
+resumen_trabajos() {
+    local ok=0 fallos=0 estado archivo detalle f
+    printf "\n${cyan}📋 Resumen por archivo:${sincolor}\n"
+    for f in "$ESTADOS_DIR"/*; do
+        [[ -f "$f" ]] || continue
+        IFS=$'\t' read -r estado archivo detalle < "$f"
+        if [[ "$estado" == "OK" ]]; then
+            ok=$((ok + 1))
+            printf "  ${verde}✅ %s${sincolor} → %s\n" "$archivo" "$detalle"
+        else
+            fallos=$((fallos + 1))
+            printf "  ${rojo}❌ %s [%s]${sincolor} → %s\n" "$archivo" "$estado" "$detalle"
+        fi
+    done
+    rm -rf "$ESTADOS_DIR"
+    ESTADOS_DIR=""
+    exec 3>&-
+    if [[ $fallos -eq 0 ]]; then
+        printf "${verde}[$(hora)] ✅ $ok archivo(s) descargados y procesados con éxito. ${sincolor}\n"
+    else
+        printf "${rojo}[$(hora)] ⚠️ $ok correcto(s), $fallos con errores. Revisa los logs indicados.${sincolor}\n"
+    fi
+}
+
 finalizar() {
     printf "${rojo} \n\n Finalizando el script${sincolor}\n"
+    if [[ -n "$ESTADOS_DIR" ]]; then rm -rf "$ESTADOS_DIR"; fi
     exit
 }
 
@@ -141,14 +189,13 @@ descargar_archivo() {
 procesar_archivo() {
     local input_file="$1"
     local output_file="$2"
+    local n="$3"
     local log_file="$LOGS_DIR/libray_$(basename "${input_file//[^a-zA-Z0-9]/_}").log"
-    local item_dir
+    local item_dir ficha rc=0
     item_dir=$(dirname "$input_file")
-    
-    while pgrep -x "libray" > /dev/null; do
-        printf "${rojo}[$(hora)] ⏳ Esperando a que termine un proceso de 'libray' antes de iniciar el siguiente...${sincolor}\n"
-        sleep 300
-    done
+
+    # Espera una ficha libre del pool (bloquea sin sondear)
+    read -r -u 3 ficha
 
     printf "${rojo}[$(hora)] ${cyan}🔐 Procesando:${sincolor} $input_file\n"
     if libray -i "$input_file" -o "$output_file" > "$log_file" 2>&1; then
@@ -158,24 +205,41 @@ procesar_archivo() {
         printf "${rojo}[$(hora)] ${cyan}🧹 Eliminando log: $log_file ${sincolor}\n"
         rm -f "$log_file"
         [[ -d "$item_dir" && -z "$(ls -A "$item_dir")" ]] && rmdir "$item_dir" && printf "🧼 Carpeta vacía detectada, eliminando: $item_dir\n"
+        registrar_estado "$n" "OK" "$(basename "$input_file")" "$output_file"
     else
+        rc=$?
         printf "${rojo}[$(hora)] ❌ Error procesando $input_file. Revisa '$log_file'.${sincolor}\n"
+        registrar_estado "$n" "ERROR libray rc=$rc" "$(basename "$input_file")" "$log_file"
     fi
+
+    # Devuelve la ficha: el siguiente archivo en cola arranca al instante
+    printf '%s\n' "$ficha" >&3
 }
 
+iniciar_pool_libray
+N=0
+PIDS_LIBRAY=()
 for FILE_NAME in "${SELECTED_FILES[@]}"; do
+    N=$((N + 1))
     printf "${rojo}[$(hora)] ${cyan}📥 Iniciando descarga de: ${sincolor} $FILE_NAME\n"
-    descargar_archivo "$SELECTED_ITEM" "$FILE_NAME" "$DEST_PATH"
 
     PENDING_INPUT_FILE="$DEST_PATH/$(basename "$SELECTED_ITEM")/$FILE_NAME"
     PENDING_OUTPUT_FILE="$FINAL_DEST_PATH/$(echo "$FILE_NAME" | sed 's/[[:space:]]/_/g' | sed "s/'//g" | sed 's/\"//g' | sed 's/[^a-zA-Z0-9._-]//g').decrypted.iso"
 
-    if [[ -n "$PENDING_INPUT_FILE" ]]; then
-        procesar_archivo "$PENDING_INPUT_FILE" "$PENDING_OUTPUT_FILE" &
+    if ! descargar_archivo "$SELECTED_ITEM" "$FILE_NAME" "$DEST_PATH"; then
+        registrar_estado "$N" "ERROR descarga" "$FILE_NAME" "$LOGS_DIR/download_${FILE_NAME//[^a-zA-Z0-9]/_}.log"
+        continue
     fi
+
+    # Se encola en segundo plano y se sigue descargando; libray arranca cuando haya hueco
+    procesar_archivo "$PENDING_INPUT_FILE" "$PENDING_OUTPUT_FILE" "$N" &
+    PIDS_LIBRAY+=("$!")
 done
 
-printf "${rojo}[$(hora)] ${verde}📥 Iniciando descarga del siguiente archivo... ${sincolor}\n"
-wait
+printf "${rojo}[$(hora)] ${cyan}⏳ Descargas terminadas, esperando a los procesos de libray... ${sincolor}\n"
+# Se espera solo a los trabajos de libray, no a otros procesos en segundo plano (p. ej. el proxy de caché)
+if [[ ${#PIDS_LIBRAY[@]} -gt 0 ]]; then
+    wait "${PIDS_LIBRAY[@]}"
+fi
 
-printf "${verde}[$(hora)] ✅ Todos los archivos han sido descargados y procesados con éxito. ${sincolor}\n"
+resumen_trabajos
@@ -124,6 +124,21 @@ if not exist "%ps3DownloaderDir%" mkdir "%ps3DownloaderDir%"
 
 copy /Y "ps3IAPKGv1_gui.py" "%ps3DownloaderDir%\" >> "%logFile%"
 copy /Y "ps3IAPKGv1.py" "%ps3DownloaderDir%\" >> "%logFile%"
+copy /Y "ps3_cache.py" "%ps3DownloaderDir%\" >> "%logFile%"
+copy /Y "ps3_log.py" "%ps3DownloaderDir%\" >> "%logFile%"
+copy /Y "ps3_planificador.py" "%ps3DownloaderDir%\" >> "%logFile%"
+copy /Y "ps3_crawler.py" "%ps3DownloaderDir%\" >> "%logFile%"
+copy /Y "ps3_importar_tsv.py" "%ps3DownloaderDir%\" >> "%logFile%"
+copy /Y "ps3_salida.py" "%ps3DownloaderDir%\" >> "%logFile%"
+copy /Y "ps3_pkg.py" "%ps3DownloaderDir%\" >> "%logFile%"
+copy /Y "ps3_indice.py" "%ps3DownloaderDir%\" >> "%logFile%"
+copy /Y "ps3_perfil.py" "%ps3DownloaderDir%\" >> "%logFile%"
+copy /Y "ps3_catalogo.py" "%ps3DownloaderDir%\" >> "%logFile%"
+copy /Y "ps3_demonio.py" "%ps3DownloaderDir%\" >> "%logFile%"
+copy /Y "ps3_reparto.py" "%ps3DownloaderDir%\" >> "%logFile%"
+copy /Y "ps3_redump.py" "%ps3DownloaderDir%\" >> "%logFile%"
+copy /Y "ps3_bench.py" "%ps3DownloaderDir%\" >> "%logFile%"
+copy /Y "ps3_sync.py" "%ps3DownloaderDir%\" >> "%logFile%"
 
 :: Crear acceso directo en el escritorio
 echo Creando acceso directo en el escritorio...
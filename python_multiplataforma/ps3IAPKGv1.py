@@ -24,9 +24,10 @@ import time
 import json
 import shutil
 import signal
+import threading
 import getpass
 from pathlib import Path
-from typing import List, Tuple, Dict
+from typing import Callable, List, Optional, Tuple, Dict
 
 # --- Dependencias de red ---
 import requests
@@ -36,6 +37,29 @@ except ImportError:
     print("[ERROR] Falta la dependencia 'internetarchive'. Instala con: pip install internetarchive")
     sys.exit(1)
 
+# Caché compartida de descargas (opcional, se activa con PS3_CACHE_DIR)
+import ps3_cache
+# Log estructurado único (JSON-lines) en ~/.iaPS3/logs
+import ps3_log
+# Planificación del lote según el espacio libre
+import ps3_planificador
+# Tamaños y estado de los enlaces del catálogo PKG (pkg_meta.json)
+import ps3_crawler
+# Salida de las ISO desencriptadas (ISO normal o CSO comprimida por bloques)
+import ps3_salida
+# Extracción de PKG en streaming (AES-CTR)
+import ps3_pkg
+# Índice del catálogo por Title ID / Content ID (packs juego + extras)
+import ps3_indice
+# Trazas de --profile para Chrome/Perfetto
+import ps3_perfil
+# Cliente del demonio de descargas (si hay uno en marcha, los trabajos se le envían)
+import ps3_demonio
+# Veredicto redump de cada ISO desencriptada (huellas calculadas al escribirla)
+import ps3_redump
+# Sincronización incremental de una selección con una carpeta espejo
+import ps3_sync
+
 # Colores cross-platform
 try:
     from colorama import init as colorama_init, Fore, Style
@@ -63,6 +87,15 @@ IA_PS3_DIR.mkdir(parents=True, exist_ok=True)
 LOGS_DIR.mkdir(parents=True, exist_ok=True)
 PKG_DIR.mkdir(parents=True, exist_ok=True)
 
+# Formato de las ISO desencriptadas: "iso" (normal) o "cso" (comprimida por bloques)
+FORMATO_SALIDA = os.environ.get("PS3_FORMATO_SALIDA", "iso").lower()
+# Cada bloque CSO se comprueba en memoria al comprimirlo; PS3_VERIFICAR_CSO=1 además
+# descomprime la CSO entera al terminar (una segunda pasada sobre toda la imagen)
+VERIFICAR_CSO = os.environ.get("PS3_VERIFICAR_CSO", "0") == "1"
+# Partes para FAT32: PS3_PARTES=fat32 / 2G / 700M... (vacío = no partir) y estilo de nombres
+TAM_PARTE = ps3_salida.tamano_parte(os.environ.get("PS3_PARTES", ""))
+ESTILO_PARTES = os.environ.get("PS3_ESTILO_PARTES", "numerico")
+
 # --- Utilidades ---
 
 
@@ -171,8 +204,9 @@ def mostrar_menu_principal() -> None:
     print()
     print(f"  {amarillo}1.{reset} {cyan}Descargar desde Archive.org{reset}")
     print(f"  {amarillo}2.{reset} {cyan}Descargar desde enlaces PKG{reset}")
-    print(f"  {amarillo}3.{reset} {cyan}Configurar cuenta Archive.org{reset}")
-    print(f"  {amarillo}4.{reset} {rojo}Salir{reset}")
+    print(f"  {amarillo}3.{reset} {cyan}Descargar pack por Title ID (juego + extras){reset}")
+    print(f"  {amarillo}4.{reset} {cyan}Configurar cuenta Archive.org{reset}")
+    print(f"  {amarillo}5.{reset} {rojo}Salir{reset}")
     print()
     print(f"{cyan}====================================================")
     print(f"{rojo}       De firstatack para gamers con problemas {reset}")
@@ -226,6 +260,32 @@ def elegir_multi(opciones: List[str], prompt: str) -> List[int]:
 
 
 SEARCH_QUERY = "sony_playstation3"  # similar a bash
+# Tiempo que se reutilizan los metadatos de un item (lista de ficheros, tamaños, hashes)
+ITEM_TTL = 600
+
+_local = threading.local()
+_items_cache: Dict[str, Tuple[float, object]] = {}
+_items_lock = threading.Lock()
+
+
+def sesion_http() -> requests.Session:
+    """Sesión HTTP por hilo: las conexiones se reutilizan entre descargas del mismo hilo."""
+    s = getattr(_local, 'session', None)
+    if s is None:
+        s = _local.session = requests.Session()
+    return s
+
+
+def obtener_item(item_identifier: str, refrescar: bool = False):
+    """ia.get_item con los metadatos guardados en memoria durante ITEM_TTL segundos."""
+    with _items_lock:
+        guardado = _items_cache.get(item_identifier)
+    if guardado and not refrescar and time.time() - guardado[0] < ITEM_TTL:
+        return guardado[1]
+    item = ia.get_item(item_identifier)
+    with _items_lock:
+        _items_cache[item_identifier] = (time.time(), item)
+    return item
 
 
 def actualizar_cache_items() -> bool:
@@ -254,23 +314,24 @@ def actualizar_cache_items() -> bool:
         return False
 
 
-def descargar_archivo(item_identifier: str, file_name: str, dest_dir: Path) -> bool:
-    log_file = LOGS_DIR / \
-        f"download_{re.sub(r'[^a-zA-Z0-9]', '_', file_name)}.log"
+def descargar_archivo(item_identifier: str, file_name: str, dest_dir: Path,
+                      progreso: Optional[Callable[[int, int], None]] = None) -> bool:
+    """Descarga un fichero de un item. `progreso(bytes_hechos, bytes_totales)` es opcional."""
+    job = f"{item_identifier}/{file_name}"
     print(f"{rojo}[{hora()}] {cyan}📥 Descargando: {reset}{file_name}...")
     try:
-        item = ia.get_item(item_identifier)
-        # internetarchive permite descargar un archivo concreto con patterns=False y archivos exactos
-        # Descargamos dentro de dest_dir / item_identifier, tal como hacía 'ia download'
-        dest = dest_dir / item_identifier
-        dest.mkdir(parents=True, exist_ok=True)
-        with open(log_file, 'w', encoding='utf-8') as lf:
+        with ps3_log.fase(job, "descarga") as info:
+            with ps3_log.fase(job, "metadatos"):
+                item = obtener_item(item_identifier)
+            # internetarchive permite descargar un archivo concreto con patterns=False y archivos exactos
+            # Descargamos dentro de dest_dir / item_identifier, tal como hacía 'ia download'
+            dest = dest_dir / item_identifier
+            dest.mkdir(parents=True, exist_ok=True)
             # Descargar recorriendo los ficheros del item y buscando coincidencia exacta por nombre
             target = next(
                 (f for f in item.files if f.get('name') == file_name), None)
             if not target:
-                lf.write(
-                    f"Archivo {file_name} no encontrado en {item_identifier}.\n")
+                info.update(ok=False, motivo="no encontrado en el item")
                 print(
                     f"{rojo}[{hora()}] ❌ No se encontró {file_name} en {item_identifier}.{reset}")
                 return False
@@ -279,21 +340,29 @@ def descargar_archivo(item_identifier: str, file_name: str, dest_dir: Path) -> b
                 # Construcción manual
                 # https://archive.org/download/<identifier>/<file_name>
                 url = f"https://archive.org/download/{item_identifier}/{file_name}"
-            resp = requests.get(url, stream=True, timeout=60)
-            resp.raise_for_status()
             out_path = dest / file_name
-            with open(out_path, 'wb') as f_out:
-                for chunk in resp.iter_content(chunk_size=1024 * 1024):
-                    if chunk:
-                        f_out.write(chunk)
-            lf.write(f"Descargado: {out_path}\n")
+            info.update(url=url, destino=str(out_path))
+            cache = ps3_cache.obtener_cache()
+            if cache is not None:
+                # Los metadatos del item traen el SHA-1: si ya está en caché ni siquiera tocamos la red
+                hashes = {k: target[k] for k in ('sha1', 'md5') if target.get(k)}
+                resultado = cache.descargar(url, out_path, session=sesion_http(), hashes=hashes,
+                                            progreso=progreso)
+                info["cache"] = resultado
+                print(f"{rojo}[{hora()}] {cyan}🗄️ Caché:{reset} {resultado}")
+            else:
+                resp = sesion_http().get(url, stream=True, timeout=60)
+                resp.raise_for_status()
+                total = int(resp.headers.get('Content-Length') or target.get('size') or 0)
+                with open(out_path, 'wb') as f_out:
+                    info["bytes"] = ps3_perfil.transferir(resp.iter_content(chunk_size=1024 * 1024),
+                                                          f_out.write, total, progreso, job, info)
         print(f"{rojo}[{hora()}]{verde}✅ Descarga completa:{reset} {file_name}")
         return True
     except Exception as e:
-        with open(log_file, 'a', encoding='utf-8') as lf:
-            lf.write(f"Error: {e}\n")
         print(
-            f"{rojo}[{hora()}] ❌ Error descargando {file_name}. Revisa '{log_file}'.{reset}")
+            f"{rojo}[{hora()}] ❌ Error descargando {file_name}: {e}. "
+            f"Revisa: python ps3_log.py --job \"{job}\"{reset}")
         return False
 
 
@@ -304,13 +373,8 @@ def sanitize_filename(name: str) -> str:
     return x
 
 
-def procesar_archivo_con_libray(input_file: Path, output_file: Path) -> None:
-    log_file = LOGS_DIR / \
-        f"libray_{re.sub(r'[^a-zA-Z0-9]', '_', input_file.name)}.log"
-    item_dir = input_file.parent
-
-    print(f"{rojo}[{hora()}] {cyan}🔐 Procesando:{reset} {input_file}")
-
+def comando_libray() -> Optional[List[str]]:
+    """Comando para invocar libray (ejecutable en el PATH o libray.py). None si no está."""
     # Paso 1: Intentar encontrar un ejecutable de 'libray' en el PATH.
     libray_command = shutil.which("libray")
 
@@ -324,7 +388,7 @@ def procesar_archivo_con_libray(input_file: Path, output_file: Path) -> None:
         if not python_exe:
             print(
                 f"{rojo}[{hora()}] ❌ No se pudo encontrar el intérprete de Python. Saltando procesamiento.{reset}")
-            return
+            return None
 
         # Ruta dinámica al script de libray.py
         appdata_path = Path.home() / "AppData"
@@ -338,7 +402,7 @@ def procesar_archivo_con_libray(input_file: Path, output_file: Path) -> None:
              
         if not libray_script_path:
             print(f"{rojo}[{hora()}] ❌ No se encontró el script 'libray.py' en ninguna carpeta 'site-packages'.{reset}")
-            return
+            return None
         else:
             print(f"{verde}[{hora()}] ✅ Se encontró el script 'libray.py'. Iniciando procesamiento...{reset}")        
         
@@ -347,40 +411,273 @@ def procesar_archivo_con_libray(input_file: Path, output_file: Path) -> None:
     else:
         # Si se encontró el ejecutable, el comando es solo la ruta.
         libray_command = [libray_command]
+    return libray_command
+
+
+def _ejecutar_libray(libray_command: List[str], input_file: Path, output: Path, job: str) -> int:
+    """Lanza libray volcando su salida línea a línea al log estructurado. Devuelve el rc."""
+    import subprocess
+    proc = subprocess.Popen(
+        libray_command + ['-i', str(input_file), '-o', str(output)],
+        stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+        text=True, encoding='utf-8', errors='replace'
+    )
+    for linea in proc.stdout:
+        linea = linea.rstrip()
+        if linea:
+            ps3_log.registro(job, "libray", linea)
+    return proc.wait()
+
+
+def ruta_salida(output_file: Path, formato: str) -> Path:
+    """Ruta final según el formato: *.decrypted.iso o *.decrypted.cso."""
+    return output_file.with_suffix(".cso") if formato == "cso" else output_file
+
+
+def _libray_a_salida(libray_command: List[str], input_file: Path, salida: ps3_salida.Salida, job: str) -> int:
+    """libray escribe en una tubería y `salida` recibe los bytes según llegan (sin
+    escribir la ISO completa). Sin tuberías (Windows) se pasa por una ISO temporal."""
+    try:
+        if ps3_salida.TUBERIAS:
+            with ps3_salida.tuberia(salida, salida.destino.parent) as fifo:
+                rc = _ejecutar_libray(libray_command, input_file, fifo, job)
+        else:
+            temporal = salida.destino.with_name(salida.destino.name + ".libray.part")
+            try:
+                rc = _ejecutar_libray(libray_command, input_file, temporal, job)
+                if rc == 0:
+                    ps3_salida.copiar(temporal, salida)
+            finally:
+                temporal.unlink(missing_ok=True)
+        if rc != 0:
+            salida.abortar()
+            return rc
+        salida.close()
+    except BaseException:
+        salida.abortar()
+        raise
+    return rc
+
+
+def _verificar_cso(output_file: Path, salida: ps3_salida.SalidaCSO, job: str) -> None:
+    """Comprobación antes de borrar la ISO cifrada: cabecera y tamaño contra lo escrito
+    (los bloques ya se comprobaron al comprimirlos) o, con PS3_VERIFICAR_CSO=1, la CSO
+    entera descomprimida contra el SHA-1 de la imagen."""
+    with ps3_log.fase(job, "verificar_cso", completa=VERIFICAR_CSO):
+        try:
+            if VERIFICAR_CSO:
+                ps3_salida.verificar_cso(output_file, sha1=salida.sha1.hexdigest())
+            else:
+                ps3_salida.comprobar_cso(output_file, salida.total, salida.tamano)
+        except ValueError:
+            output_file.unlink(missing_ok=True)
+            raise
+
+
+def _veredicto_redump(huellas: ps3_salida.Huellas, input_file: Path, job: str, info: Dict) -> None:
+    """Busca las huellas de la ISO en los DAT de redump y deja el veredicto en el log."""
+    v = ps3_redump.comprobar(huellas, input_file.name)
+    campos = {**huellas.a_dict(), "redump": v.estado, "juego": v.juego}
+    info.update(campos)
+    # Una imagen que no coincide sale con `ps3_log.py --fallos`
+    (ps3_log.error if v.estado == "no_coincide" else ps3_log.registro)(job, "redump", v.estado, **campos)
+    if v.estado == "verificado":
+        print(f"{rojo}[{hora()}] {verde}💿 Redump: verificado{reset} ({v.juego})")
+    elif v.estado == "no_coincide":
+        print(f"{rojo}[{hora()}] {amarillo}⚠️ Redump: la imagen NO coincide con{reset} {v.juego} "
+              f"(SHA-1 {huellas.sha1})")
+    else:
+        print(f"{rojo}[{hora()}] {cyan}❔ Redump: no está en los DAT{reset} (SHA-1 {huellas.sha1})")
+
+
+def procesar_archivo_con_libray(input_file: Path, output_file: Path, job: Optional[str] = None,
+                                formato: Optional[str] = None, tam_parte: Optional[int] = None) -> bool:
+    """Desencripta con libray. Devuelve True si la salida quedó generada.
+
+    Con formato "cso" (o PS3_FORMATO_SALIDA=cso) la ISO se guarda comprimida por bloques
+    en `*.decrypted.cso`, sin escribir nunca la ISO completa. Con `tam_parte` (o
+    PS3_PARTES) la ISO se escribe directamente en partes para FAT32 con su manifiesto.
+    Si hay DAT de redump, CRC32/MD5/SHA-1 se calculan mientras se escribe la imagen y
+    el veredicto (verificado / no_coincide / desconocido) queda en el log.
+    """
+    # Mismo id de trabajo que la descarga: <item>/<fichero>
+    job = job or f"{input_file.parent.name}/{input_file.name}"
+    item_dir = input_file.parent
+    formato = (formato or FORMATO_SALIDA).lower()
+    tam_parte = TAM_PARTE if tam_parte is None else tam_parte
+    output_file = ruta_salida(output_file, formato)
+    if formato == "cso" and tam_parte:
+        print(f"{amarillo}[{hora()}] ⚠️ La salida CSO no se parte; se genera un único fichero.{reset}")
+        tam_parte = 0
+
+    print(f"{rojo}[{hora()}] {cyan}🔐 Procesando:{reset} {input_file}")
+
+    libray_command = comando_libray()
+    if not libray_command:
+        return False
+
+    # Con DAT de redump la imagen se pasa por SalidaHuellas; el índice se carga mientras tanto
+    huellas = ps3_salida.Huellas() if ps3_redump.activo() else None
+    if huellas is not None:
+        ps3_redump.precargar()
+
+    def con_huellas(salida: ps3_salida.Salida) -> ps3_salida.Salida:
+        return ps3_salida.SalidaHuellas(salida, huellas) if huellas is not None else salida
 
     try:
-        import subprocess
-        with open(log_file, 'w', encoding='utf-8') as lf:
-            proc = subprocess.run(
-                libray_command + ['-i', str(input_file), '-o', str(output_file)],
-                stdout=lf, stderr=subprocess.STDOUT, check=False
-            )
-
-        if proc.returncode == 0 and output_file.exists():
+        with ps3_log.fase(job, "libray", entrada=str(input_file), salida=str(output_file),
+                          formato=formato) as info:
+            if formato == "cso":
+                salida = ps3_salida.SalidaCSO(output_file, input_file.stat().st_size)
+                rc = _libray_a_salida(libray_command, input_file, con_huellas(salida), job)
+                if rc == 0:
+                    info.update(sha1=salida.sha1.hexdigest(), comprimido=output_file.stat().st_size)
+                    _verificar_cso(output_file, salida, job)
+            elif tam_parte:
+                salida = ps3_salida.SalidaPartes(output_file, tam_parte, ESTILO_PARTES)
+                rc = _libray_a_salida(libray_command, input_file, con_huellas(salida), job)
+                info.update(partes=len(salida.partes), sha1=salida.sha1.hexdigest())
+            elif huellas is not None and ps3_salida.TUBERIAS:
+                rc = _libray_a_salida(libray_command, input_file,
+                                      con_huellas(ps3_salida.SalidaFichero(output_file)), job)
+            else:
+                rc = _ejecutar_libray(libray_command, input_file, output_file, job)
+                if rc == 0 and huellas is not None and output_file.exists():
+                    # Sin tuberías (Windows) la ISO normal no pasa por Python: se lee una vez
+                    huellas = ps3_salida.huellas_fichero(output_file)
+            if rc == 0 and huellas is not None and ps3_salida.existe_salida(output_file):
+                _veredicto_redump(huellas, input_file, job, info)
+            info.update(rc=rc, ok=rc == 0 and ps3_salida.existe_salida(output_file))
+
+        if rc == 0 and ps3_salida.existe_salida(output_file):
             print(f"{rojo}[{hora()}] {verde}✅ Procesado correctamente:{reset} {output_file}")
             print(f"{rojo}[{hora()}] {cyan}🗑️ Eliminando archivo original:{reset} {input_file}")
             try:
                 input_file.unlink(missing_ok=True)
             except Exception:
                 pass
-            print(f"{rojo}[{hora()}] {cyan}🧹 Eliminando log:{reset} {log_file}")
-            try:
-                log_file.unlink(missing_ok=True)
-            except Exception:
-                pass
             try:
                 if item_dir.exists() and not any(item_dir.iterdir()):
                     item_dir.rmdir()
                     print(f"🧼 Carpeta vacía detectada, eliminando: {item_dir}")
             except Exception:
                 pass
-        else:
-            print(f"{rojo}[{hora()}] ❌ Error procesando {input_file}. Revisa '{log_file}'.{reset}")
+            return True
+        print(f"{rojo}[{hora()}] ❌ Error procesando {input_file}. "
+              f"Revisa: python ps3_log.py --job \"{job}\"{reset}")
     except Exception as e:
-        with open(log_file, 'a', encoding='utf-8') as lf:
-            lf.write(f"Excepción: {e}\n")
-        print(f"{rojo}[{hora()}] ❌ Error procesando {input_file}. Revisa '{log_file}'.{reset}")
-        
+        print(f"{rojo}[{hora()}] ❌ Error procesando {input_file}: {e}. "
+              f"Revisa: python ps3_log.py --job \"{job}\"{reset}")
+    return False
+
+def tamanos_archivos_ia(item_identifier: str, nombres: List[str]) -> Dict[str, int]:
+    """Tamaño de cada fichero según los metadatos del item (HEAD como respaldo). 0 = desconocido."""
+    tamanos: Dict[str, int] = {n: 0 for n in nombres}
+    try:
+        with ps3_log.fase(item_identifier, "metadatos"):
+            item = obtener_item(item_identifier)
+        for f in item.files:
+            if f.get('name') in tamanos:
+                tamanos[f['name']] = int(f.get('size') or 0)
+    except Exception as e:
+        ps3_log.error(item_identifier, "metadatos", f"No se pudieron leer tamaños: {e}")
+    for nombre, size in tamanos.items():
+        if size:
+            continue
+        try:
+            r = sesion_http().head(f"https://archive.org/download/{item_identifier}/{nombre}",
+                                   allow_redirects=True, timeout=30)
+            tamanos[nombre] = int(r.headers.get('Content-Length') or 0) if r.ok else 0
+        except requests.RequestException:
+            pass
+    return tamanos
+
+
+def ejecutar_lote_ia(item_identifier: str, nombres: List[str], dest_dir: Path, final_dir: Path,
+                     confirmar: Optional[Callable[[str], bool]] = None,
+                     informar: Callable[[str], None] = print,
+                     progreso: Optional[Callable[[str], Callable[[int, int], None]]] = None,
+                     formato: Optional[str] = None, tam_parte: Optional[int] = None,
+                     cancelar: Optional[threading.Event] = None) -> List[str]:
+    """Descarga y desencripta un lote respetando el espacio libre de ambas carpetas.
+
+    - Planifica antes de empezar e informa de si el lote completo cabe.
+    - `confirmar(resumen)` decide si seguir cuando algo no cabe (por defecto se sigue
+      solo con lo que cabe).
+    - libray trabaja en un hilo aparte mientras se descarga el siguiente archivo, pero
+      una descarga solo empieza si su pico (cifrada + desencriptada) cabe en disco.
+    - `progreso(nombre)` devuelve el callback de bytes para cada descarga.
+    - `formato` ("iso" o "cso") elige la salida de libray (por defecto PS3_FORMATO_SALIDA).
+    - `tam_parte` parte las ISO para FAT32 según se escriben (por defecto PS3_PARTES).
+    - `cancelar`: si se activa no empieza ninguna descarga más (lo ya descargado sigue
+      por libray).
+    Devuelve la lista de archivos que terminaron bien.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    tamanos = tamanos_archivos_ia(item_identifier, nombres)
+    plan = ps3_planificador.planificar(
+        [ps3_planificador.Trabajo(n, tamanos[n]) for n in nombres], dest_dir, final_dir)
+    informar(plan.resumen())
+    if not plan.factible and confirmar is not None and not confirmar(plan.resumen()):
+        informar("Lote cancelado por falta de espacio.")
+        return []
+
+    presupuesto = ps3_planificador.PresupuestoDisco(dest_dir, final_dir)
+    completados: List[str] = []
+
+    def procesar(t: ps3_planificador.Trabajo, entrada: Path, salida: Path, encolado: float) -> None:
+        # Tiempo que la ISO cifrada esperó a que libray terminase con la anterior
+        ps3_perfil.registrar(f"{item_identifier}/{t.nombre}", "cola_libray", encolado)
+        ok = procesar_archivo_con_libray(entrada, salida, formato=formato, tam_parte=tam_parte)
+        if t.size:
+            presupuesto.confirmar(t.size, ok)
+        if ok:
+            completados.append(t.nombre)
+
+    # Un solo hilo de libray: el desencriptado sigue siendo de uno en uno
+    with ThreadPoolExecutor(max_workers=1) as libray_pool:
+        for t in plan.orden:
+            if cancelar is not None and cancelar.is_set():
+                informar("⏹️ Lote cancelado: no se inician más descargas.")
+                break
+            inicio = ps3_perfil.ahora()
+            reservado = not t.size or presupuesto.reservar(t.size, abandonar=cancelar)
+            if ps3_perfil.ahora() - inicio > 0.01:
+                ps3_perfil.registrar(f"{item_identifier}/{t.nombre}", "espera_disco", inicio)
+            if not reservado and cancelar is not None and cancelar.is_set():
+                informar("⏹️ Lote cancelado: no se inician más descargas.")
+                break
+            if not reservado:
+                informar(f"❌ Sin espacio para {t.nombre} ({ps3_planificador.formato_bytes(t.size)}), se omite.")
+                continue
+            informar(f"📥 Iniciando descarga de: {t.nombre}")
+            ok = descargar_archivo(item_identifier, t.nombre, dest_dir,
+                                   progreso=progreso(t.nombre) if progreso else None)
+            # Ruta esperada de descarga: dest_dir / item / fname
+            pending_input = dest_dir / item_identifier / t.nombre
+            pending_output = final_dir / f"{sanitize_filename(t.nombre)}.decrypted.iso"
+            if ok and pending_input.exists():
+                libray_pool.submit(procesar, t, pending_input, pending_output, ps3_perfil.ahora())
+            elif t.size:
+                presupuesto.cancelar(t.size)
+    return completados
+
+
+def preguntar_partes() -> int:
+    """Pregunta si partir la salida para FAT32. Devuelve el tamaño de parte (0 = no partir)."""
+    defecto = 's' if TAM_PARTE else 'n'
+    resp = input(f"¿Partir los archivos en trozos para FAT32/USB? (s/n) [{defecto}]: ").strip().lower()
+    if resp == 'n' or (not resp and not TAM_PARTE):
+        return 0
+    tam = input("Tamaño de cada parte (fat32, 4G, 700M...) [fat32]: ").strip()
+    try:
+        return ps3_salida.tamano_parte(tam or "fat32") or ps3_salida.TAM_PARTE_FAT32
+    except ValueError:
+        print(f"{amarillo}⚠️ Tamaño no válido, se usa el límite de FAT32.{reset}")
+        return ps3_salida.TAM_PARTE_FAT32
+
+
 def descargar_desde_ia() -> None:
     # Cache de items
     use_cache = False
@@ -408,7 +705,7 @@ def descargar_desde_ia() -> None:
     def actualizar_cache_files() -> bool:
         print(f"{rojo}[{hora()}] {cyan}🔄 Actualizando lista de archivos para{reset} '{selected_item}'...")
         try:
-            item = ia.get_item(selected_item)
+            item = obtener_item(selected_item, refrescar=True)
             # Crear lista de nombres de archivo visibles
             names = [f.get('name') for f in item.files if f.get('name')]
             names = [n for n in names if n.strip()]
@@ -453,24 +750,41 @@ def descargar_desde_ia() -> None:
     dest_dir.mkdir(parents=True, exist_ok=True)
     final_dir.mkdir(parents=True, exist_ok=True)
 
-    print("\n🔁 Iniciando proceso encadenado (Descarga y Procesamiento)...")
+    resp = input(f"¿Guardar las ISO desencriptadas comprimidas en CSO? (s/n) [{'s' if FORMATO_SALIDA == 'cso' else 'n'}]: ").strip().lower()
+    formato = "cso" if resp == 's' or (not resp and FORMATO_SALIDA == "cso") else "iso"
+    tam_parte = 0
+    if formato == "iso":
+        tam_parte = preguntar_partes()
+
+    demonio = ps3_demonio.cliente()
+    if demonio is not None:
+        encolar_en_demonio(demonio, [
+            {"tipo": "ia", "item": selected_item, "fichero": f, "dest_dir": str(dest_dir),
+             "final_dir": str(final_dir), "formato": formato, "tam_parte": tam_parte}
+            for f in selected_files])
+        return
+
+    print(f"\n{cyan}💽 Comprobando espacio en disco para el lote...{reset}")
+
+    def confirmar(resumen: str) -> bool:
+        resp = input("El lote completo no cabe. ¿Continuar con los que caben? (s/n): ").strip().lower()
+        return resp == 's'
 
-    for fname in selected_files:
-        print(f"{rojo}[{hora()}] {cyan}📥 Iniciando descarga de: {reset}{fname}")
-        ok = descargar_archivo(selected_item, fname, dest_dir)
-        # Ruta esperada de descarga: dest_dir / selected_item / fname
-        pending_input = dest_dir / selected_item / fname
-        sanitized = sanitize_filename(fname)
-        pending_output = final_dir / f"{sanitized}.decrypted.iso"
-        if ok and pending_input.exists():
-            # Procesamiento secuencial (una a la vez) para emular la cola del original
-            procesar_archivo_con_libray(pending_input, pending_output)
+    print("\n🔁 Iniciando proceso encadenado (Descarga y Procesamiento)...")
+    completados = ejecutar_lote_ia(selected_item, selected_files, dest_dir, final_dir,
+                                   confirmar=confirmar, formato=formato, tam_parte=tam_parte)
 
-    print(f"{verde}[{hora()}] ✅ Todos los archivos han sido descargados y procesados con éxito. {reset}")
+    if len(completados) == len(selected_files):
+        print(f"{verde}[{hora()}] ✅ Todos los archivos han sido descargados y procesados con éxito. {reset}")
+    else:
+        print(f"{amarillo}[{hora()}] ⚠️ Completados {len(completados)} de {len(selected_files)} archivos. {reset}")
 
 
 # --- Lado PKG ---
 
+RE_TITLE_ID = re.compile(r" - [A-Z]{4}\d{5}.*")
+
+
 def parse_pkg_txt(file_path: Path) -> List[Tuple[str, str]]:
     """Cada bloque está separado por una línea en blanco. 1ª línea = nombre, 2ª = URL.
        Se devuelve lista de pares (nombre_limpio, url)."""
@@ -481,12 +795,23 @@ def parse_pkg_txt(file_path: Path) -> List[Tuple[str, str]]:
         lines = [ln.strip() for ln in block.splitlines() if ln.strip()]
         if len(lines) >= 2:
             name, url = lines[0], lines[1]
-            # Limpieza del nombre: elimina sufijos " - (BCES|BLES)xxxxx..."
-            name_clean = re.sub(r" - (BCES|BLES)\d{5}.*", "", name)
+            # Limpieza del nombre: elimina el sufijo " - <TITLE ID>..." de cualquier región
+            # (BLUS, BCES, BLJM, NPUB, NPEB, NPJA...)
+            name_clean = RE_TITLE_ID.sub("", name)
             entries.append((name_clean, url))
     return entries
 
 
+def etiqueta_pkg(nombre: str, url: str, meta: Dict[str, Dict]) -> str:
+    """Nombre para mostrar con el tamaño o el estado del enlace si se conoce."""
+    extra = ps3_crawler.formato_tamano(meta.get(url))
+    return f"{nombre}  [{extra}]" if extra else nombre
+
+
+def tamano_pkg(url: str, meta: Dict[str, Dict]) -> int:
+    return (meta.get(url) or {}).get('size') or 0
+
+
 def seleccionar_pkg_desde_txt(files: List[Path]) -> List[Tuple[str, str]]:
     print(f"{cyan}🔍 Buscando ficheros .txt en {PKG_DIR}{reset}")
     if not files:
@@ -511,8 +836,18 @@ def seleccionar_pkg_desde_txt(files: List[Path]) -> List[Tuple[str, str]]:
         print("No se encontraron entradas válidas en los ficheros seleccionados.")
         return []
 
+    # Tamaños y enlaces caídos conocidos; lo que falte o esté caducado se comprueba
+    # en segundo plano y estará disponible la próxima vez
+    meta = ps3_crawler.obtener_meta()
+    pendientes = [url for _, url in temp_entries if ps3_crawler.caducada(meta.get(url))]
+    if pendientes:
+        print(f"{cyan}🔎 Comprobando {len(pendientes)} enlaces en segundo plano...{reset}")
+        ps3_crawler.rastrear_en_segundo_plano(pendientes)
+    elif input("¿Ordenar por tamaño? (s/n): ").strip().lower() == 's':
+        temp_entries.sort(key=lambda e: tamano_pkg(e[1], meta), reverse=True)
+
     # Mapa nombre->url (puede haber duplicados)
-    names = [e[0] for e in temp_entries]
+    names = [etiqueta_pkg(n, u, meta) for n, u in temp_entries]
     idxs = elegir_multi(names, "Selecciona juegos PKG")
     if not idxs:
         print("No se seleccionó ningún juego.")
@@ -521,19 +856,68 @@ def seleccionar_pkg_desde_txt(files: List[Path]) -> List[Tuple[str, str]]:
     return [temp_entries[i] for i in idxs]
 
 
-def descargar_pkg(url: str, destino: Path) -> bool:
+def descargar_pkg(url: str, destino: Path,
+                  progreso: Optional[Callable[[int, int], None]] = None,
+                  tam_parte: Optional[int] = None, extraer: Optional[Path] = None,
+                  conservar_pkg: bool = True) -> bool:
+    """Descarga un PKG. `progreso(bytes_hechos, bytes_totales)` es opcional.
+
+    Con `tam_parte` (o PS3_PARTES) el PKG se escribe directamente en partes para FAT32
+    según llegan los bytes; si cabe en una parte queda como un fichero normal.
+    Con `extraer` el contenido se descifra y extrae en `<extraer>/<Content ID>` a la
+    vez que se descarga; con `conservar_pkg=False` el .pkg no llega a escribirse.
+    """
+    tam_parte = TAM_PARTE if tam_parte is None else tam_parte
+    conservar_pkg = conservar_pkg or not extraer
     destino.parent.mkdir(parents=True, exist_ok=True)
     print(f"\n{rojo}[{hora()}] {cyan}📥 Descargando:{reset} {destino.name}")
     print(f"{rojo}[{hora()}] {cyan}🔗 URL:{reset} {url}")
     print(f"{rojo}[{hora()}] {cyan}📁 Destino:{reset} {destino}\n")
+    pkg = extractor = None
     try:
-        with requests.get(url, stream=True, timeout=60) as r:
-            r.raise_for_status()
-            with open(destino, 'wb') as f:
-                for chunk in r.iter_content(chunk_size=1024 * 1024):
-                    if chunk:
-                        f.write(chunk)
-        print(f"\n{verde}[{hora()}] ✅ Descarga completada: {destino}{reset}")
+        with ps3_log.fase(destino.name, "pkg", url=url, destino=str(destino)) as info:
+            cache = ps3_cache.obtener_cache()
+            if cache is not None and not tam_parte and not extraer:
+                # Fichero entero: la caché lo entrega con reflink/hardlink si puede
+                resultado = cache.descargar(url, destino, session=sesion_http(), progreso=progreso)
+                info["cache"] = resultado
+                print(f"{rojo}[{hora()}] {cyan}🗄️ Caché:{reset} {resultado}")
+            else:
+                salida = None
+                if conservar_pkg:
+                    salida = pkg = (ps3_salida.SalidaPartes(destino, tam_parte, ESTILO_PARTES) if tam_parte
+                                    else ps3_salida.SalidaFichero(destino))
+                if extraer:
+                    # El SHA-256 del volcado TSV (si se importó) valida el PKG completo
+                    sha256 = ps3_crawler.obtener_meta().get(url, {}).get('sha256')
+                    extractor = ps3_pkg.ExtractorPKG(extraer, sha256=sha256)
+                    salida = ps3_pkg.SalidaDoble(pkg, extractor) if pkg else extractor
+                with salida:
+                    if cache is not None:
+                        resultado = cache.descargar(url, destino, session=sesion_http(), progreso=progreso,
+                                                    salida=salida)
+                        info["cache"] = resultado
+                        print(f"{rojo}[{hora()}] {cyan}🗄️ Caché:{reset} {resultado}")
+                    else:
+                        with sesion_http().get(url, stream=True, timeout=60) as r:
+                            r.raise_for_status()
+                            total = int(r.headers.get('Content-Length') or 0)
+                            info["bytes"] = ps3_perfil.transferir(r.iter_content(chunk_size=1024 * 1024),
+                                                                  salida.write, total, progreso,
+                                                                  destino.name, info)
+                if tam_parte and pkg:
+                    info["partes"] = len(pkg.partes)
+                if extractor:
+                    info.update(extraido=str(extractor.carpeta), ficheros=len(extractor.entradas))
+        if extractor:
+            print(f"\n{verde}[{hora()}] 📦 Extraído en: {extractor.carpeta}{reset}")
+        if not conservar_pkg:
+            return True
+        if tam_parte and len(pkg.partes) > 1:
+            print(f"\n{verde}[{hora()}] ✅ Descarga completada en {len(pkg.partes)} partes: "
+                  f"{ps3_salida.ruta_manifiesto(destino)}{reset}")
+        else:
+            print(f"\n{verde}[{hora()}] ✅ Descarga completada: {destino}{reset}")
         return True
     except Exception as e:
         print(f"\n{rojo}[{hora()}] ❌ Error en la descarga: {e}{reset}")
@@ -546,29 +930,126 @@ def descargar_desde_pkg() -> None:
     seleccion = seleccionar_pkg_desde_txt(txt_files)
     if not seleccion:
         return
+    descargar_seleccion_pkg(seleccion)
+
+
+def seleccionar_pack() -> List[Tuple[str, str]]:
+    """Juego, DLC, temas y avatares de un Title ID (o de un juego buscado por nombre)."""
+    print(f"{cyan}📇 Cargando índice del catálogo...{reset}")
+    indice = ps3_indice.obtener_indice()
+    texto = input("Introduce el Title ID, Content ID o parte del nombre del juego: ").strip()
+    if not texto:
+        return []
+    clave = ps3_indice.normalizar_clave(texto)
+    if clave is None:
+        juegos = indice.buscar_nombre(texto) or indice.buscar_nombre(texto, categoria=None)
+        i = elegir_uno([f"{e.title_id}  {e.etiqueta}" for e in juegos], "Selecciona el juego")
+        if i < 0:
+            print(f"{rojo}❌ No se encontró ningún juego con ese nombre.{reset}")
+            return []
+        clave = juegos[i].title_id
+
+    pack = indice.pack(clave)
+    if not pack:
+        print(f"{rojo}❌ No hay entradas para {clave} en el catálogo.{reset}")
+        return []
+    meta = ps3_crawler.obtener_meta()
+    total = ps3_crawler.formato_tamano({'size': sum(tamano_pkg(e.url, meta) for e in pack)})
+    print(f"\n{verde}📦 Pack {clave}: {len(pack)} entradas{f' ({total})' if total else ''}{reset}")
+    if input("¿Descargar el pack completo? (s/n): ").strip().lower() == 's':
+        return [(e.nombre, e.url) for e in pack]
+    idxs = elegir_multi([etiqueta_pkg(e.etiqueta, e.url, meta) for e in pack], "Selecciona las entradas del pack")
+    return [(pack[i].nombre, pack[i].url) for i in idxs]
+
+
+def descargar_pack() -> None:
+    seleccion = seleccionar_pack()
+    if not seleccion:
+        print("No se seleccionó ninguna entrada.")
+        return
+    descargar_seleccion_pkg(seleccion)
 
+
+def descargar_seleccion_pkg(seleccion: List[Tuple[str, str]]) -> None:
     dest_dir_in = input("Introduce el directorio de destino (deja vacío para el actual): ").strip()
     dest_dir = Path(dest_dir_in or ".").expanduser().resolve()
     dest_dir.mkdir(parents=True, exist_ok=True)
+    extraer = input("¿Extraer el contenido de los PKG mientras se descargan? (s/n): ").strip().lower() == 's'
+    conservar_pkg = True
+    if extraer:
+        conservar_pkg = input("¿Guardar también el archivo .pkg? (s/n): ").strip().lower() == 's'
+    tam_parte = preguntar_partes() if conservar_pkg else 0
+
+    # Espejo de una lista: solo lo que falta o ha cambiado desde la última vez
+    if not extraer and not tam_parte and \
+            input("¿Sincronizar con el destino (solo lo que falta o ha cambiado)? (s/n): ").strip().lower() == 's':
+        ps3_sync.sincronizar(ps3_sync.deseados_pkg(seleccion), dest_dir, ps3_sync.descargar_pkg)
+        return
+
+    demonio = ps3_demonio.cliente()
+    if demonio is not None:
+        encolar_en_demonio(demonio, [
+            {"tipo": "pkg", "url": url, "destino": str(dest_dir), "tam_parte": tam_parte,
+             "extraer": extraer, "conservar_pkg": conservar_pkg} for _, url in seleccion])
+        return
 
     for name, url in seleccion:
         nombre_archivo = os.path.basename(url)
         destino = dest_dir / nombre_archivo
-        descargar_pkg(url, destino)
+        descargar_pkg(url, destino, tam_parte=tam_parte, extraer=dest_dir if extraer else None,
+                      conservar_pkg=conservar_pkg)
+
+def encolar_en_demonio(demonio: "ps3_demonio.Cliente", lote: List[Dict]) -> None:
+    """Envía los trabajos al demonio y muestra su progreso hasta que terminan.
+    Si se sale antes (Ctrl+C), el demonio sigue con ellos."""
+    enviados = demonio.enviar(lote)
+    print(f"\n{cyan}👾 {len(enviados)} trabajo(s) enviados al demonio {demonio.url}{reset}")
+
+    def al_evento(e: Dict) -> None:
+        t = e["trabajo"]
+        if e["evento"] == "progreso":
+            pct = f"{t['hechos'] * 100 // t['total']}%" if t["total"] else f"{t['hechos'] / 1024 ** 2:.0f} MB"
+            print(f"\r  [{t['id']}] {t['nombre']}: {pct}   ", end="", flush=True)
+        else:
+            color = verde if t["estado"] == "completado" else rojo if t["estado"] in ("error", "cancelado") else cyan
+            print(f"\n{rojo}[{hora()}] {color}[{t['id']}] {t['estado']}{reset} {t['nombre']} {t['mensaje']}")
+
+    finales = demonio.seguir([t["id"] for t in enviados], al_evento)
+    ok = sum(1 for t in finales.values() if t["estado"] == "completado")
+    print(f"\n{verde if ok == len(enviados) else amarillo}[{hora()}] Completados {ok} de {len(enviados)} trabajos.{reset}")
 
 # --- Main loop ---
 
+def activar_perfil(argv: Optional[List[str]] = None) -> None:
+    """--profile [RUTA] (o PS3_PERFIL=1): guarda una traza de todas las fases al salir."""
+    import argparse
+    parser = argparse.ArgumentParser(description="Descargador y procesador en cola de PS3")
+    parser.add_argument("--profile", nargs="?", const="", default=None, metavar="RUTA",
+                        help="Guarda una traza Chrome/Perfetto de las fases (por defecto en ~/.iaPS3/logs)")
+    parser.add_argument("--profile-muestreo", type=int, default=None, metavar="N",
+                        help="Pasa cProfile por 1 de cada N fases pesadas (PS3_PERFIL_MUESTREO)")
+    args = parser.parse_args(argv)
+    if args.profile is None and os.environ.get("PS3_PERFIL", "") in ("", "0"):
+        return
+    destino = ps3_perfil.activar(Path(args.profile).expanduser() if args.profile else None,
+                                 args.profile_muestreo)
+    print(f"{cyan}⏱️ Perfilado activo. Traza al salir: {destino}{reset}")
+
+
 def main() -> None:
+    activar_perfil()
     while RUNNING:
         mostrar_menu_principal()
-        opcion = input("Elige una opción (1-4): ").strip()
+        opcion = input("Elige una opción (1-5): ").strip()
         if opcion == '1':
             descargar_desde_ia()
         elif opcion == '2':
             descargar_desde_pkg()
         elif opcion == '3':
-            configurar_cuenta_ia()
+            descargar_pack()
         elif opcion == '4':
+            configurar_cuenta_ia()
+        elif opcion == '5':
             finalizar()
         else:
             print(f"{rojo}Opción no válida. Inténtalo de nuevo.{reset}")
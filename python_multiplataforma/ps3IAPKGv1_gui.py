@@ -11,7 +11,9 @@ import threading
 import queue
 import sys
 import os
+import logging.handlers
 from pathlib import Path
+from collections import OrderedDict
 
 # Importar el script original
 import ps3IAPKGv1 as logic
@@ -25,6 +27,82 @@ COLORS = {
     "reset": "#000000"
 }
 
+# Líneas que se mantienen en el área de mensajes (el historial completo va a disco)
+MAX_LOG_LINES = 2000
+# Mensajes máximos que se vuelcan al widget en cada tick del poll
+MAX_MSGS_POR_TICK = 1000
+LOG_HISTORY_FILE = logic.LOGS_DIR / "gui_historial.log"
+# El historial rota como el log estructurado: 5 MB por fichero y 3 copias
+LOG_HISTORY_MAX_BYTES = 5 * 1024 * 1024
+LOG_HISTORY_BACKUPS = 3
+# Hilos para las peticiones interactivas de la GUI (listas de archivos, packs, conexión...)
+GUI_HILOS = 6
+# Carril aparte para lo largo (lotes de descarga, comprobación de enlaces): hilos y
+# trabajos como mucho entre los que corren y los que esperan; más clics se rechazan
+GUI_HILOS_LARGOS = 2
+GUI_LARGOS_MAX = 4
+# Listas de archivos de ítems vistos que se guardan en memoria
+ITEM_LRU = 32
+# Ítems vecinos del combobox cuya lista se pide por adelantado
+PREFETCH_VECINOS = 2
+
+
+class TareaGUI:
+    def __init__(self, fn):
+        self.fn = fn
+        self.cancelada = False
+
+    def cancel(self):
+        """Si aún no ha empezado, no llegará a ejecutarse"""
+        self.cancelada = True
+
+
+class EjecutorGUI:
+    """Pool acotado de hilos para el trabajo en segundo plano de la GUI. Con `limite`,
+    submit devuelve None si ya hay tantas tareas entre las que corren y las que esperan.
+    Los hilos son daemon: cerrar la ventana no los espera."""
+
+    def __init__(self, hilos, nombre="gui", limite=None):
+        self.hilos = hilos
+        self.limite = limite
+        self.cola = queue.Queue()
+        self.ocupados = 0
+        self.pendientes = 0
+        self.lock = threading.Lock()
+        for i in range(hilos):
+            threading.Thread(target=self._bucle, name=f"{nombre}-{i + 1}", daemon=True).start()
+
+    def submit(self, fn):
+        with self.lock:
+            if self.limite is not None and self.pendientes >= self.limite:
+                return None
+            self.pendientes += 1
+        tarea = TareaGUI(fn)
+        self.cola.put(tarea)
+        return tarea
+
+    def libres(self):
+        """Hilos sin trabajo ni nada esperando en la cola"""
+        with self.lock:
+            return self.hilos - self.ocupados - self.cola.qsize()
+
+    def _bucle(self):
+        while True:
+            tarea = self.cola.get()
+            if tarea.cancelada:
+                with self.lock:
+                    self.pendientes -= 1
+                continue
+            with self.lock:
+                self.ocupados += 1
+            try:
+                tarea.fn()
+            finally:
+                with self.lock:
+                    self.ocupados -= 1
+                    self.pendientes -= 1
+
+
 class PS3DownloaderGUI:
     def __init__(self, root):
         self.root = root
@@ -33,6 +111,33 @@ class PS3DownloaderGUI:
         
         # Cola para comunicación entre hilos
         self.log_queue = queue.Queue()
+        # Historial completo de mensajes (el widget solo guarda las últimas MAX_LOG_LINES)
+        LOG_HISTORY_FILE.parent.mkdir(parents=True, exist_ok=True)
+        self.log_history = logging.handlers.RotatingFileHandler(
+            LOG_HISTORY_FILE, maxBytes=LOG_HISTORY_MAX_BYTES, backupCount=LOG_HISTORY_BACKUPS, encoding='utf-8')
+        self.log_history.terminator = ""
+        # Progreso por trabajo: {job_id: (bytes_hechos, bytes_totales)}; los hilos solo
+        # sobrescriben el último valor y el poll lo pinta, así no se inunda el log
+        self.progress_state = {}
+        self.progress_lock = threading.Lock()
+        self.progress_widgets = {}
+        # Entradas (nombre, url) mostradas en la lista de juegos, en el mismo orden
+        self.pkg_entries_list = []
+        self.crawl_running = False
+        # Peticiones interactivas (listas de archivos, packs, conexión, cancelaciones)
+        self.executor = EjecutorGUI(GUI_HILOS)
+        # Lotes de descarga y rastreos, aparte para que no dejen sin hilos a lo anterior
+        self.long_executor = EjecutorGUI(GUI_HILOS_LARGOS, "gui-largo", GUI_LARGOS_MAX)
+        # Peticiones "solo vale la última" (selección de ítem, pack...): {clave: generación}
+        self.request_lock = threading.Lock()
+        self.request_gen = {}
+        self.request_tasks = {}
+        # Listas de archivos por ítem (LRU) y peticiones en vuelo para no repetirlas
+        self.item_files_lru = OrderedDict()
+        self.item_fetches = {}
+        # Descargas en marcha: un Event de cancelación por lote y los trabajos del demonio
+        self.active_runs = set()
+        self.daemon_jobs = {}
         
         # Configurar estilo
         self.setup_styles()
@@ -131,12 +236,23 @@ class PS3DownloaderGUI:
         ttk.Entry(dirs_frame, textvariable=self.final_dir_var).grid(row=1, column=1, padx=5, pady=5, sticky=tk.EW)
         ttk.Button(dirs_frame, text="Examinar", command=self.browse_final_dir).grid(row=1, column=2, padx=5, pady=5)
         
+        self.cso_var = tk.BooleanVar(value=logic.FORMATO_SALIDA == "cso")
+        ttk.Checkbutton(dirs_frame, text="Comprimir ISO desencriptadas (CSO)",
+                        variable=self.cso_var).grid(row=2, column=1, padx=5, pady=5, sticky=tk.W)
+        # Compartida con la pestaña PKG
+        self.split_var = tk.BooleanVar(value=bool(logic.TAM_PARTE))
+        ttk.Checkbutton(dirs_frame, text="Partir para FAT32/USB (no aplica a CSO)",
+                        variable=self.split_var).grid(row=3, column=1, padx=5, pady=5, sticky=tk.W)
+        
         dirs_frame.columnconfigure(1, weight=1)
         
         # Botón de descarga
-        download_btn = ttk.Button(main_frame, text="Iniciar Descarga y Procesamiento", 
-                                 command=self.start_archive_download)
-        download_btn.pack(pady=10)
+        btns_frame = ttk.Frame(main_frame)
+        btns_frame.pack(pady=10)
+        ttk.Button(btns_frame, text="Iniciar Descarga y Procesamiento", 
+                   command=self.start_archive_download).pack(side=tk.LEFT, padx=5)
+        ttk.Button(btns_frame, text="Cancelar Descargas", 
+                   command=self.cancel_downloads).pack(side=tk.LEFT, padx=5)
     
     def setup_pkg_tab(self):
         # Frame principal
@@ -168,6 +284,22 @@ class PS3DownloaderGUI:
         
         ttk.Button(btn_frame, text="Cargar Contenido del Fichero", 
                   command=self.load_pkg_content).pack(side=tk.LEFT, padx=5)
+        ttk.Button(btn_frame, text="Ordenar por Tamaño", 
+                  command=self.sort_pkg_by_size).pack(side=tk.LEFT, padx=5)
+        ttk.Button(btn_frame, text="Comprobar Enlaces", 
+                  command=self.check_pkg_links).pack(side=tk.LEFT, padx=5)
+        
+        # Pack por Title ID: juego, DLC, temas y avatares de todas las listas
+        pack_frame = ttk.Frame(pkg_files_frame)
+        pack_frame.pack(fill=tk.X, padx=5, pady=5)
+        
+        ttk.Label(pack_frame, text="Title ID / nombre:").pack(side=tk.LEFT, padx=5)
+        self.pack_var = tk.StringVar()
+        pack_entry = ttk.Entry(pack_frame, textvariable=self.pack_var, width=30)
+        pack_entry.pack(side=tk.LEFT, padx=5)
+        pack_entry.bind('<Return>', lambda e: self.search_pack())
+        ttk.Button(pack_frame, text="Buscar Pack", 
+                  command=self.search_pack).pack(side=tk.LEFT, padx=5)
         
         # Frame para juegos disponibles
         games_frame = ttk.LabelFrame(main_frame, text="Juegos Disponibles")
@@ -192,12 +324,25 @@ class PS3DownloaderGUI:
         ttk.Entry(dest_frame, textvariable=self.pkg_dest_var).grid(row=0, column=1, padx=5, pady=5, sticky=tk.EW)
         ttk.Button(dest_frame, text="Examinar", command=self.browse_pkg_dest).grid(row=0, column=2, padx=5, pady=5)
         
+        ttk.Checkbutton(dest_frame, text="Partir para FAT32/USB",
+                        variable=self.split_var).grid(row=1, column=1, padx=5, pady=5, sticky=tk.W)
+        
+        self.extract_var = tk.BooleanVar(value=False)
+        self.keep_pkg_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(dest_frame, text="Extraer el contenido mientras se descarga",
+                        variable=self.extract_var).grid(row=2, column=1, padx=5, pady=5, sticky=tk.W)
+        ttk.Checkbutton(dest_frame, text="Guardar también el .pkg",
+                        variable=self.keep_pkg_var).grid(row=3, column=1, padx=5, pady=5, sticky=tk.W)
+        
         dest_frame.columnconfigure(1, weight=1)
         
         # Botón de descarga
-        download_btn = ttk.Button(main_frame, text="Iniciar Descarga PKG", 
-                                 command=self.start_pkg_download)
-        download_btn.pack(pady=10)
+        btns_frame = ttk.Frame(main_frame)
+        btns_frame.pack(pady=10)
+        ttk.Button(btns_frame, text="Iniciar Descarga PKG", 
+                   command=self.start_pkg_download).pack(side=tk.LEFT, padx=5)
+        ttk.Button(btns_frame, text="Cancelar Descargas", 
+                   command=self.cancel_downloads).pack(side=tk.LEFT, padx=5)
     
     def setup_config_tab(self):
         # Frame principal
@@ -235,6 +380,10 @@ class PS3DownloaderGUI:
         main_frame = ttk.Frame(self.log_frame, style="Log.TFrame")
         main_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
         
+        # Barras de progreso por trabajo
+        self.progress_frame = ttk.LabelFrame(main_frame, text="Progreso")
+        self.progress_frame.pack(fill=tk.X, pady=5)
+
         # Área de texto para logs
         self.log_text = scrolledtext.ScrolledText(main_frame, wrap=tk.WORD, width=80, height=25)
         self.log_text.pack(fill=tk.BOTH, expand=True)
@@ -283,32 +432,106 @@ class PS3DownloaderGUI:
             # Parsear el archivo PKG
             entries = logic.parse_pkg_txt(file_path)
             
-            # Limpiar lista y mapping
-            self.games_listbox.delete(0, tk.END)
-            self.pkg_entries = {}
-            
-            # Agregar juegos a la lista y guardar mapping
-            for name, url in entries:
-                self.games_listbox.insert(tk.END, name)
-                self.pkg_entries[name] = url
-            
+            self.show_pkg_entries(entries)
             self.log_message(f"✅ Cargados {len(entries)} juegos desde {file_path.name}")
             
+            # Comprobar en segundo plano los enlaces nuevos o caducados de este fichero
+            meta = logic.ps3_crawler.obtener_meta()
+            if any(logic.ps3_crawler.caducada(meta.get(url)) for _, url in entries):
+                self.check_pkg_links()
+            
         except Exception as e:
             self.log_message(f"❌ Error al cargar el contenido del archivo: {e}")
             messagebox.showerror("Error", f"No se pudo cargar el archivo: {e}")
     
-    def update_items_cache(self):
+    def show_pkg_entries(self, entries):
+        """Rellena la lista de juegos con su tamaño/estado y guarda el mapping por índice"""
+        meta = logic.ps3_crawler.obtener_meta()
+        self.pkg_entries_list = list(entries)
+        self.pkg_entries = {name: url for name, url in entries}
+        self.games_listbox.delete(0, tk.END)
+        self.games_listbox.insert(tk.END, *[logic.etiqueta_pkg(n, u, meta) for n, u in entries])
+    
+    def sort_pkg_by_size(self):
+        entries = self.pkg_entries_list
+        if not entries:
+            return
+        meta = logic.ps3_crawler.obtener_meta()
+        self.show_pkg_entries(sorted(entries, key=lambda e: logic.tamano_pkg(e[1], meta), reverse=True))
+    
+    def search_pack(self):
+        """Carga el juego y todos sus extras (por Title ID o nombre) ya seleccionados"""
+        texto = self.pack_var.get().strip()
+        if not texto:
+            messagebox.showwarning("Advertencia", "Introduce un Title ID, Content ID o nombre")
+            return
+        
         def worker():
-            self.log_message("Actualizando lista de ítems desde archive.org...")
-            success = logic.actualizar_cache_items()
+            try:
+                indice = logic.ps3_indice.obtener_indice()
+                clave = logic.ps3_indice.normalizar_clave(texto)
+                if clave is None:
+                    juegos = (indice.buscar_nombre(texto)
+                              or indice.buscar_nombre(texto, categoria=None))
+                    if not juegos:
+                        self.log_message(f"❌ No se encontró ningún juego con «{texto}»")
+                        return None
+                    clave = juegos[0].title_id
+                    if len({e.title_id for e in juegos}) > 1:
+                        self.log_message("ℹ️ Varios juegos coinciden: "
+                                         + ", ".join(f"{e.title_id} {e.nombre}" for e in juegos[:5]))
+                pack = indice.pack(clave)
+                if not pack:
+                    self.log_message(f"❌ No hay entradas para {clave} en el catálogo")
+                    return None
+                self.log_message(f"📦 Pack {clave}: {len(pack)} entradas")
+                return pack
+            except Exception as e:
+                self.log_message(f"❌ Error buscando el pack: {e}")
+                return None
+        
+        # Una búsqueda nueva deja sin efecto la anterior
+        self.run_latest("pack", worker, lambda pack: pack and self.show_pack(pack))
+    
+    def show_pack(self, pack):
+        self.show_pkg_entries([(e.etiqueta, e.url) for e in pack])
+        self.games_listbox.selection_set(0, tk.END)
+    
+    def check_pkg_links(self):
+        """Lanza el rastreo HEAD de los enlaces cargados y refresca la lista al terminar"""
+        entries = self.pkg_entries_list
+        if not entries or self.crawl_running:
+            return
+        self.crawl_running = True
+        urls = [url for _, url in entries]
+        
+        def worker():
+            try:
+                self.log_message(f"🔎 Comprobando {len(urls)} enlaces...")
+                logic.ps3_crawler.rastrear(urls, progreso=self.progress_callback("Comprobando enlaces"))
+                meta = logic.ps3_crawler.obtener_meta()
+                dead = sum(1 for u in urls if (meta.get(u) or {}).get('status') not in (None, 200))
+                self.log_message(f"✅ Enlaces comprobados ({dead} caídos)")
+                self.root.after(0, self.show_pkg_entries, self.pkg_entries_list)
+            except Exception as e:
+                self.log_message(f"❌ Error comprobando enlaces: {e}")
+            finally:
+                self.finish_progress("Comprobando enlaces")
+                self.crawl_running = False
+        
+        if self.run_long(worker) is None:
+            self.crawl_running = False
+    
+    def update_items_cache(self):
+        def done(success):
             if success:
                 self.load_items_list()
                 self.log_message("✅ Lista de ítems actualizada correctamente")
             else:
                 self.log_message("❌ Error al actualizar la lista de ítems")
         
-        threading.Thread(target=worker, daemon=True).start()
+        self.log_message("Actualizando lista de ítems desde archive.org...")
+        self.run_latest("items", logic.actualizar_cache_items, done)
     
     def load_items_list(self):
         if logic.CACHE_FILE.exists():
@@ -323,30 +546,86 @@ class PS3DownloaderGUI:
             return
         
         def worker():
-            self.log_message(f"Obteniendo archivos para: {selected_item}")
             try:
-                # Actualizar cache de archivos del item
-                item_files_cache = logic.IA_PS3_DIR / f"{selected_item}_files_cache.txt"
-                
-                if not item_files_cache.exists():
-                    self.log_message("Actualizando lista de archivos...")
-                    item = logic.ia.get_item(selected_item)
-                    names = [f.get('name') for f in item.files if f.get('name')]
-                    names = [n for n in names if n.strip()]
-                    if names:
-                        item_files_cache.write_text("\n".join(names), encoding='utf-8')
-                
-                # Cargar archivos en la lista
-                file_list = [line.strip() for line in item_files_cache.read_text(encoding='utf-8').splitlines() if line.strip()]
-                
-                # Actualizar UI en el hilo principal
-                self.root.after(0, self.update_files_list, file_list)
-                self.log_message(f"✅ {len(file_list)} archivos encontrados")
-                
+                return self.fetch_item_files(selected_item)
             except Exception as e:
                 self.log_message(f"❌ Error: {e}")
+                return None
+        
+        def done(file_list):
+            if file_list is not None:
+                self.update_files_list(file_list)
+                self.log_message(f"✅ {len(file_list)} archivos encontrados")
         
-        threading.Thread(target=worker, daemon=True).start()
+        with self.request_lock:
+            cached = self.item_files_lru.get(selected_item)
+        self.files_listbox.delete(0, tk.END)
+        if cached is not None:
+            # Ya visto o precargado: sin esperar; cualquier petición anterior queda obsoleta
+            self.run_latest("item", None)
+            done(cached)
+        else:
+            self.log_message(f"Obteniendo archivos para: {selected_item}")
+            self.run_latest("item", worker, done)
+        self.prefetch_neighbours(selected_item)
+    
+    def fetch_item_files(self, item_id):
+        """Lista de archivos de un ítem: LRU en memoria, caché en disco o archive.org.
+        Si otro hilo ya la está pidiendo, se espera a su resultado en vez de repetirla."""
+        while True:
+            with self.request_lock:
+                if item_id in self.item_files_lru:
+                    self.item_files_lru.move_to_end(item_id)
+                    return self.item_files_lru[item_id]
+                en_vuelo = self.item_fetches.get(item_id)
+                if en_vuelo is None:
+                    en_vuelo = self.item_fetches[item_id] = threading.Event()
+                    break
+            # Si la petición de ese hilo falla, la siguiente vuelta la repite desde aquí
+            en_vuelo.wait()
+        try:
+            item_files_cache = logic.IA_PS3_DIR / f"{item_id}_files_cache.txt"
+            if not item_files_cache.exists():
+                item = logic.obtener_item(item_id)
+                names = [f.get('name') for f in item.files if f.get('name')]
+                names = [n for n in names if n.strip()]
+                if names:
+                    item_files_cache.write_text("\n".join(names), encoding='utf-8')
+            file_list = [line.strip() for line in item_files_cache.read_text(encoding='utf-8').splitlines() if line.strip()]
+            with self.request_lock:
+                self.item_files_lru[item_id] = file_list
+                self.item_files_lru.move_to_end(item_id)
+                while len(self.item_files_lru) > ITEM_LRU:
+                    self.item_files_lru.popitem(last=False)
+            return file_list
+        finally:
+            with self.request_lock:
+                self.item_fetches.pop(item_id, None)
+            en_vuelo.set()
+    
+    def prefetch_neighbours(self, item_id):
+        """Pide por adelantado las listas de los ítems de al lado en el combobox,
+        solo con hilos libres (siempre queda uno para lo que pida el usuario)"""
+        items = list(self.item_combo['values'])
+        if item_id not in items:
+            return
+        i = items.index(item_id)
+        vecinos = []
+        for d in range(1, PREFETCH_VECINOS + 1):
+            vecinos += [items[j] for j in (i + d, i - d) if 0 <= j < len(items)]
+        for vecino in vecinos:
+            if self.executor.libres() <= 1:
+                break
+            with self.request_lock:
+                if vecino in self.item_files_lru or vecino in self.item_fetches:
+                    continue
+            self.executor.submit(lambda v=vecino: self.prefetch_item(v))
+    
+    def prefetch_item(self, item_id):
+        try:
+            self.fetch_item_files(item_id)
+        except Exception:
+            pass  # se reintentará si llega a seleccionarse
     
     def update_files_list(self, file_list):
         self.files_listbox.delete(0, tk.END)
@@ -385,30 +664,193 @@ class PS3DownloaderGUI:
             messagebox.showerror("Error", "Debe especificar un directorio final")
             return
         
-        # Ejecutar en hilo separado
+        formato = "cso" if self.cso_var.get() else "iso"
+        tam_parte = self.split_size()
+        cancel = self.start_download_run()
+        
         def worker():
             try:
-                for fname in selected_files:
-                    self.log_message(f"Iniciando descarga de: {fname}")
-                    ok = logic.descargar_archivo(selected_item, fname, Path(temp_dir))
-                    
-                    if ok:
-                        pending_input = Path(temp_dir) / selected_item / fname
-                        sanitized = logic.sanitize_filename(fname)
-                        pending_output = Path(final_dir) / f"{sanitized}.decrypted.iso"
-                        
-                        if pending_input.exists():
-                            self.log_message(f"Procesando: {fname}")
-                            logic.procesar_archivo_con_libray(pending_input, pending_output)
-                    else:
-                        self.log_message(f"Error en la descarga de: {fname}")
+                dest = Path(temp_dir).expanduser().resolve()
+                final = Path(final_dir).expanduser().resolve()
+                dest.mkdir(parents=True, exist_ok=True)
+                final.mkdir(parents=True, exist_ok=True)
+                demonio = logic.ps3_demonio.cliente()
+                if demonio is not None:
+                    self.run_in_daemon(demonio, [
+                        {"tipo": "ia", "item": selected_item, "fichero": f, "dest_dir": str(dest),
+                         "final_dir": str(final), "formato": formato, "tam_parte": tam_parte}
+                        for f in selected_files])
+                    return
+                self.log_message("Comprobando espacio en disco para el lote...")
+                cancelled = set()
+                completed = logic.ejecutar_lote_ia(
+                    selected_item, selected_files, dest, final,
+                    confirmar=self.ask_yes_no_from_thread,
+                    informar=self.log_message,
+                    progreso=lambda fname: self.progress_tracker(fname, cancel, cancelled),
+                    formato=formato,
+                    tam_parte=tam_parte,
+                    cancelar=cancel)
                 
-                self.log_message("✅ Todos los archivos han sido procesados")
+                for fname in selected_files:
+                    self.finish_progress(fname)
+                # Las descargas cortadas a medias no sirven para nada
+                for fname in cancelled:
+                    (dest / selected_item / fname).unlink(missing_ok=True)
+                self.log_message(f"✅ Procesados {len(completed)} de {len(selected_files)} archivos")
                 
             except Exception as e:
                 self.log_message(f"❌ Error durante el proceso: {e}")
+            finally:
+                self.end_download_run(cancel)
         
-        threading.Thread(target=worker, daemon=True).start()
+        if self.run_long(worker) is None:
+            self.end_download_run(cancel)
+    
+    def split_size(self):
+        """Tamaño de parte elegido (PS3_PARTES o el límite de FAT32); 0 si no se parte"""
+        if not self.split_var.get():
+            return 0
+        return logic.TAM_PARTE or logic.ps3_salida.TAM_PARTE_FAT32
+    
+    def progress_tracker(self, job_id, cancel=None, cancelled=None):
+        """Callback de progreso que además retira la barra al completarse.
+        Si se cancela, anota el trabajo en `cancelled`"""
+        callback = self.progress_callback(job_id, cancel)
+        def tracker(done, total):
+            try:
+                callback(done, total)
+            except logic.ps3_demonio.Cancelado:
+                if cancelled is not None:
+                    cancelled.add(job_id)
+                raise
+            if total and done >= total:
+                self.finish_progress(job_id)
+        return tracker
+    
+    def start_download_run(self):
+        """Registra un lote de descargas; el Event devuelto se activa al cancelar"""
+        cancel = threading.Event()
+        with self.request_lock:
+            self.active_runs.add(cancel)
+        return cancel
+    
+    def end_download_run(self, cancel):
+        with self.request_lock:
+            self.active_runs.discard(cancel)
+    
+    def cancel_downloads(self):
+        """Corta las descargas en curso y no empieza las pendientes (libray termina el
+        archivo que esté procesando)"""
+        with self.request_lock:
+            runs = list(self.active_runs)
+            jobs = dict(self.daemon_jobs)
+        if not runs:
+            self.log_message("ℹ️ No hay descargas en curso")
+            return
+        self.log_message("⏹️ Cancelando descargas...")
+        for cancel in runs:
+            cancel.set()
+        
+        def cancel_in_daemon():
+            for job_id, demonio in jobs.items():
+                try:
+                    demonio.cancelar(job_id)
+                except Exception as e:
+                    self.log_message(f"❌ No se pudo cancelar el trabajo {job_id} del demonio: {e}")
+        
+        # Por el pool interactivo: las descargas van en su carril y no lo ocupan
+        if jobs:
+            self.run_background(cancel_in_daemon)
+    
+    def run_background(self, fn):
+        """Ejecuta `fn` en el pool de la GUI; los errores van al log"""
+        return self.executor.submit(self.logged(fn))
+    
+    def run_long(self, fn):
+        """Ejecuta `fn` en el carril de trabajos largos (descargas, rastreos, seguimiento
+        del demonio); si está lleno lo avisa y devuelve None. Los errores van al log"""
+        tarea = self.long_executor.submit(self.logged(fn))
+        if tarea is None:
+            self.log_message(f"⏳ Ya hay {GUI_LARGOS_MAX} descargas o comprobaciones en marcha o en espera; "
+                             "espera a que terminen o cancélalas")
+        elif self.long_executor.libres() < 0:
+            self.log_message("⏳ En espera: empezará cuando termine una de las que están en marcha")
+        return tarea
+    
+    def logged(self, fn):
+        def task():
+            try:
+                fn()
+            except Exception as e:
+                self.log_message(f"❌ Error: {e}")
+        return task
+    
+    def run_latest(self, key, fn, on_result=None):
+        """Petición de la que solo interesa la más reciente para `key`: las anteriores que
+        sigan en cola se descartan y, si ya estaban en marcha, su resultado se ignora.
+        `on_result(resultado)` se llama en el hilo de Tk. Con fn=None solo invalida."""
+        with self.request_lock:
+            gen = self.request_gen[key] = self.request_gen.get(key, 0) + 1
+            previous = self.request_tasks.pop(key, None)
+        if previous is not None:
+            previous.cancel()
+        if fn is None:
+            return
+        
+        def is_current():
+            return self.request_gen.get(key) == gen
+        
+        def task():
+            if not is_current():
+                return
+            result = fn()
+            if on_result is not None and is_current():
+                self.root.after(0, lambda: on_result(result) if is_current() else None)
+        
+        tarea = self.run_background(task)
+        with self.request_lock:
+            if self.request_gen.get(key) == gen:
+                self.request_tasks[key] = tarea
+    
+    def run_in_daemon(self, demonio, lote):
+        """Envía el lote al demonio y refleja su progreso (se llama desde el carril de run_long)"""
+        enviados = demonio.enviar(lote)
+        self.log_message(f"👾 {len(enviados)} trabajo(s) enviados al demonio {demonio.url}")
+        with self.request_lock:
+            for t in enviados:
+                self.daemon_jobs[t["id"]] = demonio
+        
+        def al_evento(e):
+            t = e["trabajo"]
+            if e["evento"] == "progreso":
+                self.progress_callback(t["nombre"])(t["hechos"], t["total"])
+                return
+            if t["estado"] in logic.ps3_demonio.ESTADOS_FINALES:
+                self.finish_progress(t["nombre"])
+            self.log_message(f"[{t['id']}] {t['estado']}: {t['nombre']} {t['mensaje']}".rstrip())
+        
+        try:
+            finales = demonio.seguir([t["id"] for t in enviados], al_evento)
+        finally:
+            with self.request_lock:
+                for t in enviados:
+                    self.daemon_jobs.pop(t["id"], None)
+        ok = sum(1 for t in finales.values() if t["estado"] == "completado")
+        self.log_message(f"✅ Completados {ok} de {len(enviados)} trabajos en el demonio")
+    
+    def ask_yes_no_from_thread(self, summary):
+        """Muestra una pregunta en el hilo de Tk y espera la respuesta desde un hilo de trabajo"""
+        answer = {}
+        done = threading.Event()
+        def ask():
+            answer['value'] = messagebox.askyesno(
+                "Espacio insuficiente",
+                f"{summary}\n\n¿Continuar con los archivos que caben?")
+            done.set()
+        self.root.after(0, ask)
+        done.wait()
+        return answer.get('value', False)
     
     def browse_pkg_dest(self):
         directory = filedialog.askdirectory(title="Seleccionar directorio de destino")
@@ -416,7 +858,7 @@ class PS3DownloaderGUI:
             self.pkg_dest_var.set(directory)
     
     def start_pkg_download(self):
-        selected_games = [self.games_listbox.get(i) for i in self.games_listbox.curselection()]
+        selected_games = [self.pkg_entries_list[i] for i in self.games_listbox.curselection()]
         if not selected_games:
             messagebox.showerror("Error", "Debe seleccionar al menos un juego")
             return
@@ -426,26 +868,46 @@ class PS3DownloaderGUI:
             messagebox.showerror("Error", "Debe especificar un directorio de destino")
             return
         
-        # Ejecutar en hilo separado
+        tam_parte = self.split_size()
+        extraer = Path(dest_dir) if self.extract_var.get() else None
+        conservar_pkg = self.keep_pkg_var.get() or not extraer
+        cancel = self.start_download_run()
+        
         def worker():
             try:
+                demonio = logic.ps3_demonio.cliente()
+                if demonio is not None:
+                    self.run_in_daemon(demonio, [
+                        {"tipo": "pkg", "url": url, "destino": str(Path(dest_dir).expanduser().resolve()),
+                         "tam_parte": tam_parte, "extraer": bool(extraer), "conservar_pkg": conservar_pkg}
+                        for _, url in selected_games if url])
+                    return
                 downloaded_count = 0
                 
-                for name in selected_games:
-                    url = self.pkg_entries.get(name)
+                for name, url in selected_games:
+                    if cancel.is_set():
+                        self.log_message("⏹️ Descargas PKG canceladas")
+                        break
                     if url:
                         self.log_message(f"Descargando: {name}")
                         nombre_archivo = os.path.basename(url)
                         destino = Path(dest_dir) / nombre_archivo
-                        if logic.descargar_pkg(url, destino):
+                        ok = logic.descargar_pkg(url, destino, progreso=self.progress_callback(name, cancel),
+                                                 tam_parte=tam_parte, extraer=extraer,
+                                                 conservar_pkg=conservar_pkg)
+                        self.finish_progress(name)
+                        if ok:
                             downloaded_count += 1
                 
                 self.log_message(f"✅ Descargas completadas: {downloaded_count} de {len(selected_games)} juegos")
                 
             except Exception as e:
                 self.log_message(f"❌ Error durante la descarga PKG: {e}")
+            finally:
+                self.end_download_run(cancel)
         
-        threading.Thread(target=worker, daemon=True).start()
+        if self.run_long(worker) is None:
+            self.end_download_run(cancel)
     
     def load_config(self):
         config_text = logic.leer_config_ia()
@@ -486,30 +948,93 @@ class PS3DownloaderGUI:
             except Exception as e:
                 self.log_message(f"❌ Error de conexión: {e}")
         
-        threading.Thread(target=worker, daemon=True).start()
+        self.run_latest("conexion", worker)
     
     def log_message(self, message):
         """Agrega un mensaje a la cola para ser mostrado en el log"""
         self.log_queue.put(message)
     
+    def progress_callback(self, job_id, cancel=None):
+        """Devuelve un callback progreso(hechos, total) para las funciones de descarga.
+        Con `cancel` activado lanza Cancelado, que corta la descarga en curso"""
+        def callback(done, total):
+            if cancel is not None and cancel.is_set():
+                raise logic.ps3_demonio.Cancelado()
+            with self.progress_lock:
+                self.progress_state[job_id] = (done, total)
+        return callback
+    
+    def finish_progress(self, job_id):
+        """Marca un trabajo como terminado; su barra se retira en el siguiente tick"""
+        with self.progress_lock:
+            self.progress_state[job_id] = None
+    
     def poll_log_queue(self):
         """Verifica periódicamente la cola de mensajes y los muestra en el log"""
         try:
-            while True:
-                message = self.log_queue.get_nowait()
-                self.append_to_log(message)
-        except queue.Empty:
-            pass
+            messages = []
+            try:
+                while len(messages) < MAX_MSGS_POR_TICK:
+                    messages.append(self.log_queue.get_nowait())
+            except queue.Empty:
+                pass
+            if messages:
+                self.append_to_log(messages)
+            self.update_progress_widgets()
         finally:
             self.root.after(100, self.poll_log_queue)
     
-    def append_to_log(self, message):
-        """Agrega un mensaje al área de texto de logs"""
+    def append_to_log(self, messages):
+        """Agrega un lote de mensajes al área de texto de logs en una sola inserción"""
+        if isinstance(messages, str):
+            messages = [messages]
+        text = "\n".join(messages) + "\n"
+        self.log_history.emit(logging.makeLogRecord({"msg": text}))
         self.log_text.config(state=tk.NORMAL)
-        self.log_text.insert(tk.END, message + "\n")
+        self.log_text.insert(tk.END, text)
+        # Recorta al búfer circular de las últimas MAX_LOG_LINES líneas
+        lines = int(self.log_text.index('end-1c').split('.')[0]) - 1
+        if lines > MAX_LOG_LINES:
+            self.log_text.delete('1.0', f'{lines - MAX_LOG_LINES + 1}.0')
         self.log_text.see(tk.END)
         self.log_text.config(state=tk.DISABLED)
     
+    def update_progress_widgets(self):
+        """Sincroniza las barras de progreso con el último estado de cada trabajo"""
+        with self.progress_lock:
+            state = dict(self.progress_state)
+            for job_id, value in state.items():
+                if value is None:
+                    del self.progress_state[job_id]
+        
+        for job_id, value in state.items():
+            widgets = self.progress_widgets.get(job_id)
+            if value is None:
+                if widgets:
+                    widgets[0].destroy()
+                    del self.progress_widgets[job_id]
+                continue
+            
+            if widgets is None:
+                row = ttk.Frame(self.progress_frame)
+                row.pack(fill=tk.X, padx=5, pady=2)
+                label = ttk.Label(row, width=45, anchor=tk.W)
+                label.pack(side=tk.LEFT)
+                bar = ttk.Progressbar(row, orient=tk.HORIZONTAL, mode='determinate', maximum=100)
+                bar.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+                widgets = self.progress_widgets[job_id] = (row, label, bar)
+            
+            row, label, bar = widgets
+            done, total = value
+            name = job_id if len(job_id) <= 40 else job_id[:37] + "..."
+            if total:
+                bar.config(mode='determinate', value=min(100, done * 100 / total))
+                label.config(text=f"{name}  {done / 1024 ** 2:.0f}/{total / 1024 ** 2:.0f} MB")
+            else:
+                bar.config(mode='indeterminate')
+                bar.step(5)
+                label.config(text=f"{name}  {done / 1024 ** 2:.0f} MB")
+    
     def clear_log(self):
         """Limpia el área de texto de logs"""
         self.log_text.config(state=tk.NORMAL)
@@ -517,7 +1042,7 @@ class PS3DownloaderGUI:
         self.log_text.config(state=tk.DISABLED)
     
     def save_log(self):
-        """Guarda el log en un archivo"""
+        """Guarda el historial completo de mensajes en un archivo"""
         filename = filedialog.asksaveasfilename(
             title="Guardar log",
             defaultextension=".txt",
@@ -526,16 +1051,28 @@ class PS3DownloaderGUI:
         
         if filename:
             try:
-                with open(filename, 'w', encoding='utf-8') as f:
-                    f.write(self.log_text.get(1.0, tk.END))
+                self.log_history.flush()
+                # Copias rotadas (de la más antigua a la más reciente) y el fichero actual
+                rotated = [Path(f"{LOG_HISTORY_FILE}.{i}") for i in range(LOG_HISTORY_BACKUPS, 0, -1)]
+                with open(filename, 'wb') as out:
+                    for path in rotated + [LOG_HISTORY_FILE]:
+                        if path.exists():
+                            out.write(path.read_bytes())
                 self.log_message(f"✅ Log guardado en: {filename}")
             except Exception as e:
                 self.log_message(f"❌ Error al guardar el log: {e}")
 
 def main():
+    # --profile: la traza de todas las fases se escribe al cerrar la ventana
+    logic.activar_perfil()
     root = tk.Tk()
     app = PS3DownloaderGUI(root)
-    root.mainloop()
+    if logic.ps3_perfil.ACTIVO:
+        app.log_message(f"⏱️ Perfilado activo. Traza al cerrar: {logic.ps3_perfil.activar()}")
+    try:
+        root.mainloop()
+    finally:
+        app.log_history.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmarks del manejo del catálogo PKG y de la selección
+
+Mide las rutas calientes locales que crecen con el catálogo:
+
+- parse_pkg_txt:  la lista más grande (DLC´S/US.txt, ~18k líneas)
+- carga_rglob:    buscar todas las listas con rglob y leerlas (menú PKG)
+- indice:         construir el índice por Title ID (ps3_indice)
+- regex:          limpiar los nombres con RE_TITLE_ID
+- elegir_multi:   pintar las opciones y expandir un rango "1-N"
+- etiquetas:      nombres con tamaño/estado para la lista de la GUI
+- listbox:        rellenar y vaciar un Listbox de Tk (solo con pantalla)
+
+Se ejecutan sobre el catálogo que trae el repositorio (x1) y sobre copias sintéticas
+con cada lista repetida 10 y 100 veces (nombres y URL distintos en cada copia, para
+que no se descarten como duplicados). Las copias se generan en una carpeta temporal
+que se borra al terminar.
+
+De cada operación se da la mediana y el mínimo de varias repeticiones y, en una
+pasada aparte con tracemalloc, el pico de memoria. Con --guardar los resultados
+quedan como referencia en `~/.iaPS3/bench_referencia.json` y las siguientes
+ejecuciones se comparan con ella: lo que empeore más de la tolerancia se marca y el
+script sale con código 1. La referencia solo vale para la misma máquina.
+
+Uso:
+    python3 ps3_bench.py --guardar                 # mide y guarda la referencia
+    python3 ps3_bench.py                           # mide y compara
+    python3 ps3_bench.py --escalas 1,10 --solo parse_pkg_txt,regex
+"""
+
+from __future__ import annotations
+import gc
+import os
+import sys
+import json
+import time
+import shutil
+import builtins
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import contextlib
+from pathlib import Path
+from statistics import median
+from typing import Callable, Dict, List, Optional
+
+import ps3IAPKGv1 as logic
+import ps3_indice
+
+IA_PS3_DIR = Path.home() / ".iaPS3"
+REFERENCIA_FILE = IA_PS3_DIR / "bench_referencia.json"
+# El catálogo del repositorio o, una vez instalado, el de ~/.iaPS3/pkg
+PKG_REPO = Path(__file__).resolve().parent / "pkg"
+PKG_REPO = PKG_REPO if PKG_REPO.is_dir() else logic.PKG_DIR
+VERSION = 1
+ESCALAS = (1, 10, 100)
+REPETICIONES = 5
+# Cuánto puede empeorar una medida (tiempo o memoria) respecto a la referencia
+TOLERANCIA = 0.25
+
+
+class _Nulo:
+    """stdout que lo descarta todo (elegir_multi imprime cada opción)."""
+
+    def write(self, s):
+        return len(s)
+
+    def flush(self):
+        pass
+
+
+def generar_catalogo(origen: Path, destino: Path, factor: int) -> Path:
+    """Copia el árbol de listas repitiendo cada bloque `factor` veces."""
+    for txt in sorted(origen.rglob("*.txt")):
+        salida = destino / txt.relative_to(origen)
+        salida.parent.mkdir(parents=True, exist_ok=True)
+        bloques = [b.strip().splitlines() for b in
+                   txt.read_text(encoding="utf-8", errors="ignore").split("\n\n") if b.strip()]
+        with open(salida, "w", encoding="utf-8") as f:
+            for copia in range(factor):
+                for lineas in bloques:
+                    if copia and len(lineas) >= 2:
+                        lineas = [f"{lineas[0]} #{copia}" if " - " not in lineas[0]
+                                  else lineas[0].replace(" - ", f" #{copia} - ", 1),
+                                  f"{lineas[1]}?copia={copia}"] + lineas[2:]
+                    f.write("\n".join(lineas) + "\n\n")
+    return destino
+
+
+def _operaciones(pkg_dir: Path) -> Dict[str, Callable[[], object]]:
+    txts = sorted(p for p in pkg_dir.rglob("*.txt") if p.is_file())
+    mayor = max(txts, key=lambda p: p.stat().st_size)
+    entradas = logic.parse_pkg_txt(mayor)
+    nombres = [b.strip().splitlines()[0] for b in
+               mayor.read_text(encoding="utf-8", errors="ignore").split("\n\n") if b.strip()]
+    etiquetas = [n for n, _ in entradas]
+
+    def carga_rglob():
+        return [e for p in sorted(p for p in pkg_dir.rglob("*.txt") if p.is_file())
+                for e in logic.parse_pkg_txt(p)]
+
+    def elegir_multi():
+        entrada = builtins.input
+        builtins.input = lambda prompt="": f"1-{len(etiquetas)}"
+        try:
+            with contextlib.redirect_stdout(_Nulo()):
+                return logic.elegir_multi(etiquetas, "Selecciona juegos PKG")
+        finally:
+            builtins.input = entrada
+
+    ops = {
+        "parse_pkg_txt": lambda: logic.parse_pkg_txt(mayor),
+        "carga_rglob": carga_rglob,
+        "indice": lambda: ps3_indice.IndiceCatalogo.construir(pkg_dir, meta={}),
+        "regex": lambda: [logic.RE_TITLE_ID.sub("", n) for n in nombres],
+        "elegir_multi": elegir_multi,
+        "etiquetas": lambda: [logic.etiqueta_pkg(n, u, {}) for n, u in entradas],
+    }
+    lista = _listbox()
+    if lista is not None:
+        def listbox():
+            lista.insert("end", *etiquetas)
+            lista.update_idletasks()
+            lista.delete(0, "end")
+        ops["listbox"] = listbox
+    return ops
+
+
+def _listbox():
+    """Listbox de Tk oculto, o None si no hay tkinter o pantalla."""
+    try:
+        import tkinter as tk
+        raiz = tk.Tk()
+    except Exception:
+        return None
+    raiz.withdraw()
+    return tk.Listbox(raiz)
+
+
+def medir(fn: Callable[[], object], repeticiones: int) -> Dict[str, float]:
+    """Mediana y mínimo de `repeticiones` ejecuciones y pico de memoria de una más."""
+    tiempos = []
+    for _ in range(repeticiones):
+        gc.collect()
+        t0 = time.perf_counter()
+        fn()
+        tiempos.append(time.perf_counter() - t0)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"tiempo": median(tiempos), "minimo": min(tiempos), "pico": pico}
+
+
+def _formato_bytes(n: float) -> str:
+    for unidad in ("B", "KiB", "MiB"):
+        if n < 1024:
+            return f"{n:.0f} {unidad}"
+        n /= 1024
+    return f"{n:.1f} GiB"
+
+
+def _comparar(actual: Dict[str, float], base: Optional[Dict[str, float]], tolerancia: float) -> str:
+    if not base:
+        return ""
+    partes = []
+    for campo in ("tiempo", "pico"):
+        if base.get(campo):
+            cambio = actual[campo] / base[campo] - 1
+            marca = "⚠️ " if cambio > tolerancia else ""
+            partes.append(f"{marca}{campo} {cambio:+.0%}")
+    return "  ".join(partes)
+
+
+def cargar_referencia(path: Path = REFERENCIA_FILE) -> Dict[str, Dict[str, float]]:
+    try:
+        datos = json.loads(path.read_text(encoding="utf-8"))
+        if datos.get("version") == VERSION:
+            return datos["resultados"]
+    except (OSError, ValueError, KeyError):
+        pass
+    return {}
+
+
+def guardar_referencia(resultados: Dict[str, Dict[str, float]], path: Path = REFERENCIA_FILE) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps({"version": VERSION, "python": platform.python_version(),
+                               "maquina": platform.node(), "fecha": time.strftime("%Y-%m-%d %H:%M:%S"),
+                               "resultados": resultados}, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Micro-benchmarks del catálogo PKG y de la selección")
+    parser.add_argument("--pkg", type=Path, default=PKG_REPO, help="Catálogo de partida (pkg/ del repositorio o ~/.iaPS3/pkg)")
+    parser.add_argument("--escalas", default=",".join(map(str, ESCALAS)),
+                        help="Factores del catálogo sintético (por defecto 1,10,100)")
+    parser.add_argument("--solo", default="", help="Operaciones a medir, separadas por comas")
+    parser.add_argument("--repeticiones", type=int, default=REPETICIONES)
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA,
+                        help="Empeoramiento permitido respecto a la referencia (0.25 = 25%%)")
+    parser.add_argument("--referencia", type=Path, default=REFERENCIA_FILE)
+    parser.add_argument("--guardar", action="store_true", help="Guarda los resultados como referencia")
+    args = parser.parse_args(argv)
+
+    if not any(args.pkg.rglob("*.txt")):
+        print(f"[ERROR] No hay listas .txt en {args.pkg}")
+        return 1
+    escalas = [int(e) for e in args.escalas.split(",") if e.strip()]
+    solo = {s.strip() for s in args.solo.split(",") if s.strip()}
+    referencia = {} if args.guardar else cargar_referencia(args.referencia)
+    resultados: Dict[str, Dict[str, float]] = {}
+    regresiones: List[str] = []
+    comparadas = 0
+
+    tmp = Path(tempfile.mkdtemp(prefix="ps3_bench_"))
+    try:
+        for factor in escalas:
+            pkg_dir = args.pkg if factor == 1 else generar_catalogo(args.pkg, tmp / f"x{factor}", factor)
+            print(f"\n📚 Catálogo x{factor} ({pkg_dir})")
+            for nombre, fn in _operaciones(pkg_dir).items():
+                if solo and nombre not in solo:
+                    continue
+                clave = f"x{factor}/{nombre}"
+                r = resultados[clave] = medir(fn, args.repeticiones)
+                base = referencia.get(clave)
+                comparadas += base is not None
+                comparacion = _comparar(r, base, args.tolerancia)
+                if "⚠️" in comparacion:
+                    regresiones.append(clave)
+                print(f"  {nombre:<14} {r['tiempo'] * 1000:>10.2f} ms  (mín {r['minimo'] * 1000:.2f})"
+                      f"  pico {_formato_bytes(r['pico']):>10}  {comparacion}".rstrip())
+            if factor != 1:
+                shutil.rmtree(pkg_dir, ignore_errors=True)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    if args.guardar:
+        # Las medidas que no se han repetido ahora se conservan
+        guardar_referencia({**cargar_referencia(args.referencia), **resultados}, args.referencia)
+        print(f"\n💾 Referencia guardada en {args.referencia}")
+    elif not comparadas:
+        print(f"\nℹ️ Sin referencia para estas medidas en {args.referencia}: guárdala con --guardar")
+    elif regresiones:
+        print(f"\n❌ Empeoran más de un {args.tolerancia:.0%}: {', '.join(regresiones)}")
+        return 1
+    else:
+        print("\n✅ Sin regresiones respecto a la referencia")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
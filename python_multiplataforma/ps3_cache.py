@@ -0,0 +1,472 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Caché compartida de descargas (direccionada por contenido)
+
+- Los ficheros se guardan una sola vez en `objects/` con su SHA-256 como nombre.
+- Se indexan por URL + validador (ETag / Last-Modified / tamaño) y, en cuanto se
+  conoce, por hash (SHA-1 de los metadatos de archive.org o SHA-256 propio).
+- Pensada para montajes compartidos entre procesos y hosts: escrituras atómicas
+  (fichero temporal + rename) y un lock por clave para no descargar dos veces lo mismo.
+- Expulsión LRU cuando se supera el tamaño configurado.
+- Entrega al destino por reflink, hardlink o copia (lo primero que funcione).
+- Modo proxy HTTP local opcional (para la imagen Docker):
+      python3 ps3_cache.py proxy --puerto 8118
+
+Configuración por variables de entorno:
+    PS3_CACHE_DIR     carpeta de la caché (si no está definida, la caché está desactivada)
+    PS3_CACHE_MAX_GB  tamaño máximo de la caché en GB (por defecto 100)
+"""
+
+from __future__ import annotations
+import os
+import sys
+import json
+import time
+import shutil
+import contextlib
+import socket
+import hashlib
+import argparse
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+import requests
+
+CHUNK = 1024 * 1024
+# Un lock cuyo fichero no se ha tocado en este tiempo se considera abandonado
+LOCK_CADUCIDAD = 120
+MAX_GB_DEFECTO = 100
+
+
+def validador_de_cabeceras(headers) -> str:
+    """Construye el validador de una respuesta HTTP (ETag, Last-Modified y tamaño)."""
+    partes = [headers.get(h) for h in ('ETag', 'Last-Modified', 'Content-Length')]
+    return "|".join(p for p in partes if p)
+
+
+def _sufijo_tmp() -> str:
+    """Sufijo único por host, proceso e hilo para los ficheros temporales."""
+    return f"{socket.gethostname()}.{os.getpid()}.{threading.get_ident()}"
+
+
+class _Lock:
+    """Lock por fichero (O_EXCL) válido en discos locales y montajes compartidos."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._ultimo_toque = 0.0
+
+    def __enter__(self) -> "_Lock":
+        while True:
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.write(fd, f"{socket.gethostname()}:{os.getpid()}".encode())
+                os.close(fd)
+                self._ultimo_toque = time.time()
+                return self
+            except FileExistsError:
+                try:
+                    if time.time() - self.path.stat().st_mtime > LOCK_CADUCIDAD:
+                        self.path.unlink(missing_ok=True)
+                        continue
+                except FileNotFoundError:
+                    continue
+                time.sleep(1)
+
+    def tocar(self) -> None:
+        """Renueva el lock durante descargas largas para que no se dé por abandonado."""
+        ahora = time.time()
+        if ahora - self._ultimo_toque > LOCK_CADUCIDAD / 4:
+            try:
+                os.utime(self.path)
+            except OSError:
+                pass
+            self._ultimo_toque = ahora
+
+    def __exit__(self, *exc) -> None:
+        try:
+            self.path.unlink(missing_ok=True)
+        except OSError:
+            pass
+
+
+def _reflink(origen: Path, destino: Path) -> bool:
+    """Intenta un clon copy-on-write (btrfs/XFS). Devuelve False si no es posible."""
+    if not sys.platform.startswith('linux'):
+        return False
+    try:
+        import fcntl
+        FICLONE = 0x40049409
+        with open(origen, 'rb') as src, open(destino, 'wb') as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        return True
+    except (OSError, ImportError):
+        try:
+            destino.unlink(missing_ok=True)
+        except OSError:
+            pass
+        return False
+
+
+class CacheDescargas:
+    def __init__(self, raiz: Path, max_bytes: int):
+        self.raiz = Path(raiz)
+        self.max_bytes = max_bytes
+        self.objetos = self.raiz / "objects"
+        self.claves = self.raiz / "keys"
+        self.hashes = self.raiz / "hashes"
+        self.tmp = self.raiz / "tmp"
+        self.locks = self.raiz / "locks"
+        for d in (self.objetos, self.claves, self.hashes, self.tmp, self.locks):
+            d.mkdir(parents=True, exist_ok=True)
+
+    # --- Índices ---
+
+    @staticmethod
+    def _clave(url: str, validador: str) -> str:
+        return hashlib.sha1(f"{url}\n{validador}".encode('utf-8')).hexdigest()
+
+    def _ruta_objeto(self, sha256: str) -> Path:
+        return self.objetos / sha256[:2] / sha256
+
+    def _escribir_atomico(self, path: Path, contenido: str) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.tmp / f"{path.name}.{_sufijo_tmp()}"
+        tmp.write_text(contenido, encoding='utf-8')
+        os.replace(tmp, path)
+
+    def _objeto_valido(self, sha256: Optional[str]) -> Optional[Path]:
+        if not sha256:
+            return None
+        obj = self._ruta_objeto(sha256)
+        if not obj.exists():
+            return None
+        try:
+            # Marca de uso para la LRU (no dependemos de atime, que suele estar desactivado)
+            os.utime(obj)
+        except OSError:
+            pass
+        return obj
+
+    def info(self, url: str, validador: str) -> Optional[Dict]:
+        """Entrada del índice para URL + validador, o None si no está en caché."""
+        entrada = self.claves / f"{self._clave(url, validador)}.json"
+        try:
+            return json.loads(entrada.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return None
+
+    def buscar(self, url: str, validador: str) -> Optional[Path]:
+        datos = self.info(url, validador)
+        return self._objeto_valido(datos.get('sha256') if datos else None)
+
+    def buscar_hash(self, algoritmo: str, valor: str) -> Optional[Path]:
+        """Busca por hash conocido de antemano (sha256, sha1 o md5)."""
+        valor = (valor or "").lower()
+        if not valor:
+            return None
+        if algoritmo == 'sha256':
+            return self._objeto_valido(valor)
+        alias = self.hashes / algoritmo / valor
+        try:
+            return self._objeto_valido(alias.read_text(encoding='utf-8').strip())
+        except OSError:
+            return None
+
+    # --- Escritura ---
+
+    def guardar_stream(self, url: str, validador: str, chunks,
+                       sink: Optional[Callable[[bytes], None]] = None) -> Path:
+        """Vuelca un iterable de bloques a la caché y devuelve la ruta del objeto.
+
+        `sink` recibe cada bloque a la vez que se guarda (lo usa el modo proxy).
+        """
+        tmp = self.tmp / f"{self._clave(url, validador)}.{_sufijo_tmp()}.part"
+        h256, h1, hmd5 = hashlib.sha256(), hashlib.sha1(), hashlib.md5()
+        size = 0
+        try:
+            with open(tmp, 'wb') as f:
+                for chunk in chunks:
+                    if not chunk:
+                        continue
+                    f.write(chunk)
+                    h256.update(chunk)
+                    h1.update(chunk)
+                    hmd5.update(chunk)
+                    size += len(chunk)
+                    if sink is not None:
+                        sink(chunk)
+            return self._registrar(tmp, url, validador, size,
+                                   h256.hexdigest(), h1.hexdigest(), hmd5.hexdigest())
+        finally:
+            tmp.unlink(missing_ok=True)
+
+    def importar(self, url: str, validador: str, origen: Path) -> Path:
+        """Añade a la caché un fichero ya descargado (se copia, el original no se toca)."""
+        def leer():
+            with open(origen, 'rb') as f:
+                while True:
+                    bloque = f.read(CHUNK)
+                    if not bloque:
+                        return
+                    yield bloque
+        return self.guardar_stream(url, validador, leer())
+
+    def _registrar(self, tmp: Path, url: str, validador: str, size: int,
+                   sha256: str, sha1: str, md5: str) -> Path:
+        obj = self._ruta_objeto(sha256)
+        obj.parent.mkdir(parents=True, exist_ok=True)
+        if obj.exists():
+            os.utime(obj)
+        else:
+            os.replace(tmp, obj)
+        self._escribir_atomico(
+            self.claves / f"{self._clave(url, validador)}.json",
+            json.dumps({"url": url, "validador": validador, "size": size,
+                        "sha256": sha256, "sha1": sha1, "md5": md5,
+                        "ts": int(time.time())}))
+        self._escribir_atomico(self.hashes / "sha1" / sha1, sha256)
+        self._escribir_atomico(self.hashes / "md5" / md5, sha256)
+        # El objeto recién escrito aún no se ha entregado: no puede ser el expulsado
+        self.expulsar(conservar=obj)
+        return obj
+
+    # --- Entrega al destino ---
+
+    @staticmethod
+    def entregar(objeto: Path, destino: Path) -> str:
+        """Materializa el objeto en `destino`. Devuelve el método usado."""
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        if destino.exists():
+            destino.unlink()
+        if _reflink(objeto, destino):
+            return "reflink"
+        try:
+            os.link(objeto, destino)
+            return "hardlink"
+        except OSError:
+            pass
+        shutil.copyfile(objeto, destino)
+        return "copia"
+
+    # --- Expulsión LRU ---
+
+    def uso(self) -> int:
+        total = 0
+        for obj in self.objetos.glob("*/*"):
+            try:
+                total += obj.stat().st_size
+            except OSError:
+                pass
+        return total
+
+    def expulsar(self, objetivo: Optional[int] = None, conservar: Optional[Path] = None) -> int:
+        """Borra los objetos menos usados hasta quedar bajo el presupuesto. Devuelve bytes liberados.
+        `conservar` (el objeto que se va a entregar) no se borra aunque sea el más antiguo."""
+        objetivo = self.max_bytes if objetivo is None else objetivo
+        objetos = []
+        total = 0
+        for obj in self.objetos.glob("*/*"):
+            try:
+                st = obj.stat()
+            except OSError:
+                continue
+            total += st.st_size
+            if obj != conservar:
+                objetos.append((st.st_mtime, st.st_size, obj))
+        if total <= objetivo:
+            return 0
+        liberado = 0
+        with _Lock(self.locks / "expulsion.lock"):
+            for _, size, obj in sorted(objetos):
+                if total - liberado <= objetivo:
+                    break
+                try:
+                    obj.unlink()
+                    liberado += size
+                except OSError:
+                    pass
+        # Las entradas de keys/ y hashes/ que apuntan a objetos borrados se ignoran al buscar
+        return liberado
+
+    # --- Flujo completo de descarga ---
+
+    @staticmethod
+    def volcar(objeto: Path, salida) -> str:
+        """Copia el objeto en una salida con `write()` (p. ej. partes para FAT32)."""
+        with open(objeto, 'rb') as f:
+            while True:
+                bloque = f.read(CHUNK)
+                if not bloque:
+                    return "flujo"
+                salida.write(bloque)
+
+    def descargar(self, url: str, destino: Path, session=None, timeout: int = 60,
+                  hashes: Optional[Dict[str, str]] = None,
+                  progreso: Optional[Callable[[int, int], None]] = None,
+                  salida=None) -> str:
+        """Sirve `url` en `destino` desde la caché, descargándolo si hace falta.
+
+        Devuelve una descripción del resultado ("acierto:hardlink", "descargado:copia"...).
+        `progreso(bytes_hechos, bytes_totales)` se llama según avanzan los bytes.
+        Si se pasa `salida` (objeto con `write()`), los bytes van ahí en vez de a `destino`.
+        Los errores de red se propagan como excepciones de `requests`.
+        """
+        def entregar(obj: Path) -> str:
+            return self.volcar(obj, salida) if salida is not None else self.entregar(obj, destino)
+
+        for algoritmo, valor in (hashes or {}).items():
+            obj = self.buscar_hash(algoritmo, valor)
+            if obj is not None:
+                return f"acierto:{entregar(obj)}"
+
+        http = session or requests
+        try:
+            head = http.head(url, allow_redirects=True, timeout=timeout)
+            validador = validador_de_cabeceras(head.headers) if head.ok else ""
+        except requests.RequestException:
+            validador = ""
+
+        obj = self.buscar(url, validador)
+        if obj is not None:
+            return f"acierto:{entregar(obj)}"
+
+        with _Lock(self.locks / f"{self._clave(url, validador)}.lock") as lock:
+            # Otro proceso pudo terminar la misma descarga mientras esperábamos el lock
+            obj = self.buscar(url, validador)
+            if obj is not None:
+                return f"acierto:{entregar(obj)}"
+            with http.get(url, stream=True, timeout=timeout) as r:
+                r.raise_for_status()
+                size = int(r.headers.get('Content-Length') or 0)
+                hechos = 0
+                if size > self.max_bytes:
+                    # No cabe en la caché: descarga directa
+                    with (open(destino, 'wb') if salida is None else contextlib.nullcontext(salida)) as f:
+                        for chunk in r.iter_content(chunk_size=CHUNK):
+                            if chunk:
+                                f.write(chunk)
+                                hechos += len(chunk)
+                                if progreso:
+                                    progreso(hechos, size)
+                    return "sin-cache"
+
+                def chunks():
+                    nonlocal hechos
+                    for chunk in r.iter_content(chunk_size=CHUNK):
+                        lock.tocar()
+                        hechos += len(chunk)
+                        if progreso:
+                            progreso(hechos, size)
+                        yield chunk
+                if salida is not None:
+                    # Se escribe en la salida a la vez que en la caché, sin releer el objeto
+                    self.guardar_stream(url, validador or validador_de_cabeceras(r.headers), chunks(),
+                                        sink=salida.write)
+                    return "descargado:flujo"
+                obj = self.guardar_stream(url, validador or validador_de_cabeceras(r.headers), chunks())
+        return f"descargado:{self.entregar(obj, destino)}"
+
+
+def obtener_cache() -> Optional[CacheDescargas]:
+    """Caché configurada por entorno, o None si PS3_CACHE_DIR no está definida."""
+    raiz = os.environ.get("PS3_CACHE_DIR", "").strip()
+    if not raiz:
+        return None
+    try:
+        max_gb = float(os.environ.get("PS3_CACHE_MAX_GB", MAX_GB_DEFECTO))
+    except ValueError:
+        max_gb = MAX_GB_DEFECTO
+    return CacheDescargas(Path(raiz).expanduser(), int(max_gb * 1024 ** 3))
+
+
+# --- Modo proxy HTTP ---
+
+def servir_proxy(cache: CacheDescargas, host: str = "127.0.0.1", puerto: int = 8118) -> None:
+    """Proxy HTTP de reenvío con caché. Solo URLs http:// (sin CONNECT para https)."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    session = requests.Session()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _enviar_objeto(self, obj: Path) -> None:
+            self.send_response(200)
+            self.send_header("Content-Length", str(obj.stat().st_size))
+            self.send_header("X-Ps3-Cache", "HIT")
+            self.end_headers()
+            with open(obj, 'rb') as f:
+                shutil.copyfileobj(f, self.wfile, CHUNK)
+
+        def do_GET(self):
+            url = self.path
+            if not url.startswith("http://"):
+                self.send_error(400, "Solo se admiten peticiones de proxy http://")
+                return
+            try:
+                head = session.head(url, allow_redirects=True, timeout=60)
+                validador = validador_de_cabeceras(head.headers) if head.ok else ""
+                obj = cache.buscar(url, validador)
+                if obj is not None:
+                    self._enviar_objeto(obj)
+                    return
+                with session.get(url, stream=True, timeout=60) as r:
+                    if not r.ok:
+                        self.send_error(r.status_code)
+                        return
+                    self.send_response(200)
+                    if r.headers.get('Content-Length'):
+                        self.send_header("Content-Length", r.headers['Content-Length'])
+                    else:
+                        self.send_header("Connection", "close")
+                        self.close_connection = True
+                    self.send_header("X-Ps3-Cache", "MISS")
+                    self.end_headers()
+                    cache.guardar_stream(url, validador or validador_de_cabeceras(r.headers),
+                                         r.iter_content(chunk_size=CHUNK), sink=self.wfile.write)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            except requests.RequestException as e:
+                self.send_error(502, str(e))
+
+        def do_CONNECT(self):
+            self.send_error(501, "CONNECT no soportado: usa el proxy solo para http://")
+
+    servidor = ThreadingHTTPServer((host, puerto), Handler)
+    print(f"Proxy de caché escuchando en http://{host}:{puerto} (caché: {cache.raiz})")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Caché compartida de descargas PS3")
+    sub = parser.add_subparsers(dest="orden", required=True)
+    p_proxy = sub.add_parser("proxy", help="Arranca el proxy HTTP local con caché")
+    p_proxy.add_argument("--host", default="127.0.0.1")
+    p_proxy.add_argument("--puerto", type=int, default=8118)
+    sub.add_parser("uso", help="Muestra el tamaño ocupado por la caché")
+    sub.add_parser("expulsar", help="Aplica la expulsión LRU al presupuesto configurado")
+    args = parser.parse_args(argv)
+
+    cache = obtener_cache()
+    if cache is None:
+        print("[ERROR] Define PS3_CACHE_DIR para usar la caché.")
+        return 1
+    if args.orden == "proxy":
+        servir_proxy(cache, args.host, args.puerto)
+    elif args.orden == "uso":
+        print(f"{cache.uso() / 1024 ** 3:.2f} GB de {cache.max_bytes / 1024 ** 3:.2f} GB")
+    elif args.orden == "expulsar":
+        print(f"Liberados {cache.expulsar() / 1024 ** 3:.2f} GB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
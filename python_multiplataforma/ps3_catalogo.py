@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Catálogo PKG compilado en un único fichero binario
+
+Las listas de `pkg/` se leen una sola vez (p. ej. al construir la imagen Docker) y se
+guardan sin duplicados: cada enlace aparece una vez aunque esté en varias listas, y las
+listas idénticas (Temas/Juegos/US.txt y Juegos/US.txt...) comparten el mismo bloque.
+Cargarlo es descomprimir un blob y leer unos arrays, sin volver a parsear texto.
+
+Formato (little-endian):
+    cabecera  <4sHHIII  "PS3C", versión, 0, nº listas, nº bloques, nº entradas
+    listas    por lista: <H longitud + nombre UTF-8 + <I bloque
+    bloques   por bloque: <I nº entradas + array de índices <I
+    textos    <I longitud + zlib("nombre\\turl\\n" por entrada)
+
+Uso (lo usa ps3_ia_login_pkg.sh):
+    python3 ps3_catalogo.py compilar pkg/ pkg_catalogo.bin
+    python3 ps3_catalogo.py listas pkg_catalogo.bin
+    python3 ps3_catalogo.py entradas pkg_catalogo.bin Juegos/US "DLC´S/EU"   # nombre|url
+"""
+
+from __future__ import annotations
+import os
+import re
+import sys
+import zlib
+import struct
+import argparse
+from array import array
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+MAGIA = b"PS3C"
+VERSION = 1
+CABECERA = struct.Struct("<4sHHIII")
+RE_TITLE_ID = re.compile(r" - [A-Z]{4}\d{5}.*")
+
+
+def _leer_lista(path: Path) -> Iterator[Tuple[str, str]]:
+    """Bloques "Nombre - TITLEID / URL" de una lista (igual que el awk del script)."""
+    texto = path.read_text(encoding="utf-8", errors="ignore")
+    # Párrafos separados por líneas vacías, como RS="" en awk
+    for bloque in re.split(r"\n\n+", texto.strip("\n")):
+        lineas = bloque.split("\n")
+        if len(lineas) >= 2:
+            yield RE_TITLE_ID.sub("", lineas[0]), lineas[1]
+
+
+def compilar(pkg_dir: Path, destino: Path) -> Tuple[int, int, int]:
+    """Genera el catálogo binario. Devuelve (listas, bloques, entradas)."""
+    entradas: List[Tuple[str, str]] = []
+    por_par: Dict[Tuple[str, str], int] = {}
+    bloques: List[Tuple[int, ...]] = []
+    por_bloque: Dict[Tuple[int, ...], int] = {}
+    listas: List[Tuple[str, int]] = []
+    for txt in sorted(pkg_dir.rglob("*.txt")):
+        indices = []
+        for nombre, url in _leer_lista(txt):
+            par = (nombre.replace("\t", " "), url)
+            i = por_par.get(par)
+            if i is None:
+                i = por_par[par] = len(entradas)
+                entradas.append(par)
+            indices.append(i)
+        clave = tuple(indices)
+        b = por_bloque.get(clave)
+        if b is None:
+            b = por_bloque[clave] = len(bloques)
+            bloques.append(clave)
+        listas.append((txt.relative_to(pkg_dir).with_suffix("").as_posix(), b))
+
+    textos = zlib.compress("".join(f"{n}\t{u}\n" for n, u in entradas).encode("utf-8"), 9)
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    tmp = destino.with_name(destino.name + ".part")
+    with open(tmp, "wb") as f:
+        f.write(CABECERA.pack(MAGIA, VERSION, 0, len(listas), len(bloques), len(entradas)))
+        for nombre, b in listas:
+            n = nombre.encode("utf-8")
+            f.write(struct.pack("<H", len(n)) + n + struct.pack("<I", b))
+        for indices in bloques:
+            a = array("I", indices)
+            if sys.byteorder != "little":
+                a.byteswap()
+            f.write(struct.pack("<I", len(a)) + a.tobytes())
+        f.write(struct.pack("<I", len(textos)) + textos)
+    os.replace(tmp, destino)
+    return len(listas), len(bloques), len(entradas)
+
+
+class Catalogo:
+    def __init__(self, path: Path):
+        datos = Path(path).read_bytes()
+        magia, version, _, n_listas, n_bloques, n_entradas = CABECERA.unpack_from(datos)
+        if magia != MAGIA or version != VERSION:
+            raise ValueError(f"{path} no es un catálogo compilado válido")
+        pos = CABECERA.size
+        self.listas: Dict[str, int] = {}
+        for _ in range(n_listas):
+            (largo,) = struct.unpack_from("<H", datos, pos)
+            nombre = datos[pos + 2:pos + 2 + largo].decode("utf-8")
+            (self.listas[nombre],) = struct.unpack_from("<I", datos, pos + 2 + largo)
+            pos += 6 + largo
+        self.bloques: List[array] = []
+        for _ in range(n_bloques):
+            (n,) = struct.unpack_from("<I", datos, pos)
+            a = array("I")
+            a.frombytes(datos[pos + 4:pos + 4 + 4 * n])
+            if sys.byteorder != "little":
+                a.byteswap()
+            self.bloques.append(a)
+            pos += 4 + 4 * n
+        (largo,) = struct.unpack_from("<I", datos, pos)
+        self._textos = zlib.decompress(datos[pos + 4:pos + 4 + largo]).decode("utf-8").split("\n")
+        self.total = n_entradas
+
+    def entrada(self, i: int) -> Tuple[str, str]:
+        nombre, url = self._textos[i].split("\t", 1)
+        return nombre, url
+
+    def entradas(self, lista: str) -> List[Tuple[str, str]]:
+        return [self.entrada(i) for i in self.bloques[self.listas[lista]]]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Catálogo PKG compilado")
+    sub = parser.add_subparsers(dest="orden", required=True)
+    p = sub.add_parser("compilar", help="Compila las listas .txt en un único fichero")
+    p.add_argument("pkg_dir", type=Path)
+    p.add_argument("destino", type=Path)
+    p = sub.add_parser("listas", help="Muestra las listas del catálogo")
+    p.add_argument("catalogo", type=Path)
+    p = sub.add_parser("entradas", help="Imprime nombre|url de una o varias listas")
+    p.add_argument("catalogo", type=Path)
+    p.add_argument("lista", nargs="+")
+    args = parser.parse_args(argv)
+
+    if args.orden == "compilar":
+        listas, bloques, entradas = compilar(args.pkg_dir, args.destino)
+        print(f"✅ {args.destino}: {listas} listas, {bloques} bloques, {entradas} entradas únicas "
+              f"({args.destino.stat().st_size / 1024:.0f} KB)")
+        return 0
+
+    catalogo = Catalogo(args.catalogo)
+    if args.orden == "listas":
+        print("\n".join(catalogo.listas))
+        return 0
+    salida = []
+    for lista in args.lista:
+        if lista not in catalogo.listas:
+            print(f"[ERROR] Lista desconocida: {lista}", file=sys.stderr)
+            return 1
+        salida.extend(f"{n}|{u}" for n, u in catalogo.entradas(lista))
+    sys.stdout.write("\n".join(salida) + ("\n" if salida else ""))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Rastreador HEAD del catálogo PKG
+
+Recorre las URLs de los `pkg/*.txt` con peticiones HEAD concurrentes (con límite de
+hilos y de peticiones por segundo) y guarda para cada una Content-Length,
+Last-Modified y el estado HTTP en `~/.iaPS3/pkg_meta.json`. En pasadas posteriores
+solo se vuelven a comprobar las entradas caducadas.
+
+Uso:
+    python3 ps3_crawler.py                 # comprueba las entradas nuevas o caducadas
+    python3 ps3_crawler.py --hilos 64 --rps 40 --max-edad-dias 3
+"""
+
+from __future__ import annotations
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, List, Optional
+
+import requests
+
+IA_PS3_DIR = Path.home() / ".iaPS3"
+PKG_DIR = IA_PS3_DIR / "pkg"
+META_FILE = IA_PS3_DIR / "pkg_meta.json"
+
+HILOS = 32
+RPS = 20.0
+MAX_EDAD = 7 * 24 * 3600
+# Los fallos de red se reintentan antes que las entradas correctas
+MAX_EDAD_ERROR = 24 * 3600
+GUARDAR_CADA = 500
+# Campos de una comprobación que pueden no repetirse en la siguiente; el resto de la
+# entrada (sha256, content_id, rap, title_id y el tamaño del volcado TSV) se conserva
+CAMPOS_VOLATILES = ('error', 'last_modified')
+
+
+class LimitadorTasa:
+    """Cubo de fichas compartido entre hilos: como mucho `rps` peticiones por segundo."""
+
+    def __init__(self, rps: float):
+        self.rps = rps
+        self._fichas = rps
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def esperar(self) -> None:
+        if self.rps <= 0:
+            return
+        while True:
+            with self._lock:
+                ahora = time.monotonic()
+                self._fichas = min(self.rps, self._fichas + (ahora - self._ultimo) * self.rps)
+                self._ultimo = ahora
+                if self._fichas >= 1:
+                    self._fichas -= 1
+                    return
+                espera = (1 - self._fichas) / self.rps
+            time.sleep(espera)
+
+
+# Protege el diccionario de metadatos compartido entre el rastreo en segundo plano y la UI
+_meta_lock = threading.Lock()
+_meta_global: Optional[Dict[str, Dict]] = None
+
+
+def cargar_meta(path: Path = META_FILE) -> Dict[str, Dict]:
+    try:
+        return json.loads(path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+
+
+def obtener_meta() -> Dict[str, Dict]:
+    """Metadatos del catálogo compartidos por todo el proceso (se leen una vez)."""
+    global _meta_global
+    with _meta_lock:
+        if _meta_global is None:
+            _meta_global = cargar_meta()
+        return _meta_global
+
+
+def guardar_meta(meta: Dict[str, Dict], path: Path = META_FILE) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with _meta_lock:
+        contenido = json.dumps(meta, ensure_ascii=False, separators=(',', ':'))
+    tmp.write_text(contenido, encoding='utf-8')
+    os.replace(tmp, path)
+
+
+def caducada(info: Optional[Dict], max_edad: float = MAX_EDAD, ahora: Optional[float] = None) -> bool:
+    if not info:
+        return True
+    ahora = time.time() if ahora is None else ahora
+    edad = ahora - info.get('checked', 0)
+    if info.get('status') != 200:
+        return edad > min(max_edad, MAX_EDAD_ERROR)
+    return edad > max_edad
+
+
+def formato_tamano(info: Optional[Dict]) -> str:
+    """Texto corto para listas: tamaño, enlace muerto o vacío si no se ha comprobado."""
+    if not info or ('status' not in info and not info.get('size')):
+        return ""
+    status = info.get('status')
+    if status is None:
+        # Sin comprobar todavía, pero con el tamaño declarado en el volcado TSV
+        status = 200 if info.get('size') else None
+    if status != 200:
+        return f"❌ {status or 'sin respuesta'}"
+    size = info.get('size') or 0
+    if not size:
+        return "?"
+    for unidad in ("B", "KB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:.0f} {unidad}" if unidad == "B" else f"{size:.1f} {unidad}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+def urls_catalogo(pkg_dir: Path = PKG_DIR) -> List[str]:
+    """URLs únicas de todos los .txt del catálogo (2ª línea de cada bloque)."""
+    urls = set()
+    for txt in pkg_dir.rglob('*.txt'):
+        anterior_vacia = True
+        nombre_visto = False
+        with open(txt, encoding='utf-8', errors='ignore') as f:
+            for linea in f:
+                linea = linea.strip()
+                if not linea:
+                    anterior_vacia, nombre_visto = True, False
+                    continue
+                if anterior_vacia:
+                    nombre_visto, anterior_vacia = True, False
+                elif nombre_visto:
+                    urls.add(linea)
+                    nombre_visto = False
+    return sorted(urls)
+
+
+_local = threading.local()
+
+
+def _session() -> requests.Session:
+    s = getattr(_local, 'session', None)
+    if s is None:
+        s = _local.session = requests.Session()
+    return s
+
+
+def consultar(url: str, timeout: int = 20) -> Dict:
+    """HEAD de una URL. Si el servidor no admite HEAD se pide el primer byte con Range."""
+    info: Dict = {'checked': int(time.time())}
+    try:
+        r = _session().head(url, allow_redirects=True, timeout=timeout)
+        if r.status_code in (403, 405, 501):
+            r = _session().get(url, headers={'Range': 'bytes=0-0'}, stream=True,
+                               allow_redirects=True, timeout=timeout)
+            r.close()
+            rango = r.headers.get('Content-Range', '')
+            if r.status_code == 206 and '/' in rango:
+                r.status_code = 200
+                r.headers['Content-Length'] = rango.rsplit('/', 1)[1]
+        info['status'] = r.status_code
+        if r.status_code == 200 and r.headers.get('Content-Length', '').isdigit():
+            info['size'] = int(r.headers['Content-Length'])
+        if r.headers.get('Last-Modified'):
+            info['last_modified'] = r.headers['Last-Modified']
+    except requests.RequestException as e:
+        info['status'] = 0
+        info['error'] = type(e).__name__
+    return info
+
+
+def rastrear(urls: Iterable[str], meta: Optional[Dict[str, Dict]] = None,
+             hilos: int = HILOS, rps: float = RPS, max_edad: float = MAX_EDAD,
+             progreso: Optional[Callable[[int, int], None]] = None,
+             cancelado: Optional[threading.Event] = None,
+             meta_path: Path = META_FILE) -> Dict[str, Dict]:
+    """Comprueba las URLs nuevas o caducadas y actualiza `meta` (y el fichero) en el sitio."""
+    meta = obtener_meta() if meta is None else meta
+    ahora = time.time()
+    pendientes = [u for u in urls if caducada(meta.get(u), max_edad, ahora)]
+    total = len(pendientes)
+    if not total:
+        return meta
+    limitador = LimitadorTasa(rps)
+
+    def tarea(url: str) -> Dict:
+        if cancelado is not None and cancelado.is_set():
+            return {}
+        limitador.esperar()
+        return consultar(url)
+
+    hechos = 0
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        futuros = {pool.submit(tarea, u): u for u in pendientes}
+        for fut in as_completed(futuros):
+            info = fut.result()
+            if info:
+                with _meta_lock:
+                    entrada = meta.setdefault(futuros[fut], {})
+                    for campo in CAMPOS_VOLATILES:
+                        entrada.pop(campo, None)
+                    entrada.update(info)
+            hechos += 1
+            if progreso:
+                progreso(hechos, total)
+            if hechos % GUARDAR_CADA == 0:
+                guardar_meta(meta, meta_path)
+    guardar_meta(meta, meta_path)
+    return meta
+
+
+def rastrear_en_segundo_plano(urls: Iterable[str], **kwargs) -> threading.Thread:
+    """Lanza `rastrear` en un hilo daemon (para el CLI y la GUI)."""
+    hilo = threading.Thread(target=rastrear, args=(list(urls),), kwargs=kwargs, daemon=True)
+    hilo.start()
+    return hilo
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Comprueba tamaños y enlaces del catálogo PKG")
+    parser.add_argument("--hilos", type=int, default=HILOS)
+    parser.add_argument("--rps", type=float, default=RPS, help="Peticiones por segundo (0 = sin límite)")
+    parser.add_argument("--max-edad-dias", type=float, default=MAX_EDAD / 86400,
+                        help="Vuelve a comprobar entradas más antiguas que esto")
+    args = parser.parse_args(argv)
+
+    urls = urls_catalogo()
+    print(f"🔍 {len(urls)} URLs en {PKG_DIR}")
+
+    def progreso(hechos: int, total: int) -> None:
+        if hechos % 100 == 0 or hechos == total:
+            sys.stdout.write(f"\r  {hechos}/{total} comprobadas")
+            sys.stdout.flush()
+
+    meta = rastrear(urls, hilos=args.hilos, rps=args.rps,
+                    max_edad=args.max_edad_dias * 86400, progreso=progreso)
+    print()
+    muertas = sum(1 for u in urls if meta.get(u, {}).get('status') not in (None, 200))
+    print(f"✅ Metadatos guardados en {META_FILE} ({muertas} enlaces caídos)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,719 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Demonio de descargas con API HTTP local
+
+Un solo proceso por equipo mantiene en caliente el índice del catálogo, los metadatos
+de archive.org (ps3IAPKGv1.obtener_item) y las conexiones HTTP de cada hilo, y ejecuta
+las descargas y libray de todos los clientes: la CLI, la GUI y los scripts le envían
+trabajos en vez de descargar ellos mismos.
+
+API (solo escucha en 127.0.0.1 salvo que se indique otro --host, y entonces exige
+--clave / PS3_DEMONIO_CLAVE en la cabecera X-PS3-Clave):
+    GET    /estado                      versión, trabajos por estado
+    GET    /trabajos                    lista de trabajos
+    POST   /trabajos                    {"tipo": "pkg", "url", "destino", ...} o {"trabajos": [...]}
+    GET    /trabajos/<id>
+    PATCH  /trabajos/<id>               {"prioridad": 10}   (mayor = antes)
+    DELETE /trabajos/<id>               cancela (en cola, esperando espacio o descargando)
+    GET    /eventos[?id=<id>]           progreso y cambios de estado (Server-Sent Events)
+    GET    /pack/<title_id>             entradas del catálogo de un juego (índice en memoria)
+
+Trabajos:
+    pkg: url, destino (carpeta), tam_parte, extraer, conservar_pkg
+    ia:  item, fichero, dest_dir, final_dir, formato, tam_parte
+
+Seguridad: los cuerpos tienen que ser application/json, y en 127.0.0.1 se rechazan
+las peticiones con otro Host o con un Origin ajeno (una web abierta en el navegador
+no puede encolar descargas). Las carpetas de los trabajos tienen que estar dentro de
+PS3_DEMONIO_RAICES (por defecto la carpeta personal y la temporal) y no pueden ser
+ocultas.
+
+Uso:
+    python3 ps3_demonio.py servir --descargas 3
+    python3 ps3_demonio.py pkg http://zeus.dl.playstation.net/...pkg --destino ~/PS3 --seguir
+    python3 ps3_demonio.py ia sony_playstation3_xxx "Juego (Europe).zip" --dest /tmp/ps3 --final ~/ISO
+    python3 ps3_demonio.py lista
+    python3 ps3_demonio.py cancelar 12
+"""
+
+from __future__ import annotations
+import os
+import sys
+import hmac
+import json
+import time
+import heapq
+import queue
+import argparse
+import itertools
+import threading
+import tempfile
+from pathlib import Path, PurePosixPath
+from urllib.parse import urlsplit, parse_qs
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional
+
+import requests
+
+PUERTO = int(os.environ.get("PS3_DEMONIO_PUERTO", "8119"))
+DESCARGAS = int(os.environ.get("PS3_DEMONIO_DESCARGAS", "2"))
+# Clave compartida (cabecera X-PS3-Clave); obligatoria si se escucha fuera de 127.0.0.1
+CLAVE = os.environ.get("PS3_DEMONIO_CLAVE", "")
+# Trabajos terminados que se recuerdan (los más antiguos se olvidan)
+HISTORIAL = int(os.environ.get("PS3_DEMONIO_HISTORIAL", "200"))
+LOCALES = ("127.0.0.1", "localhost", "::1")
+# Cada cuánto se publica el progreso de un trabajo como mucho
+INTERVALO_PROGRESO = 0.5
+# Comentario periódico en /eventos para detectar clientes desconectados
+PING_SSE = 15
+
+TIPOS = ("pkg", "ia")
+ESTADOS_FINALES = ("completado", "error", "cancelado")
+
+
+class Cancelado(Exception):
+    pass
+
+
+class Trabajo:
+    def __init__(self, id: int, tipo: str, datos: Dict, prioridad: int = 0):
+        self.id = id
+        self.tipo = tipo
+        self.datos = datos
+        self.prioridad = prioridad
+        self.estado = "en_cola"
+        self.hechos = 0
+        self.total = 0
+        self.mensaje = ""
+        self.creado = time.time()
+        self.actualizado = self.creado
+        self.cancelar = threading.Event()
+
+    @property
+    def nombre(self) -> str:
+        if self.tipo == "pkg":
+            return os.path.basename(urlsplit(self.datos["url"]).path)
+        return f"{self.datos['item']}/{self.datos['fichero']}"
+
+    def a_dict(self) -> Dict:
+        return {"id": self.id, "tipo": self.tipo, "nombre": self.nombre, "prioridad": self.prioridad,
+                "estado": self.estado, "hechos": self.hechos, "total": self.total,
+                "mensaje": self.mensaje, "creado": self.creado, "actualizado": self.actualizado,
+                "datos": self.datos}
+
+
+def raices_configuradas() -> List[Path]:
+    """Carpetas bajo las que el demonio puede escribir: PS3_DEMONIO_RAICES (separadas
+    por ":" o ";" en Windows) o, por defecto, la carpeta personal y la temporal."""
+    conf = os.environ.get("PS3_DEMONIO_RAICES", "")
+    rutas = [p for p in conf.split(os.pathsep) if p] if conf else [str(Path.home()), tempfile.gettempdir()]
+    return [Path(p).expanduser().resolve() for p in rutas]
+
+
+def carpeta_permitida(ruta: str, raices: List[Path]) -> str:
+    """Ruta absoluta de una carpeta de trabajo si cae dentro de alguna raíz y no pasa
+    por carpetas ocultas (~/.ssh, ~/.config...). ValueError si no."""
+    p = Path(ruta).expanduser().resolve()
+    for raiz in raices:
+        try:
+            relativa = p.relative_to(raiz)
+        except ValueError:
+            continue
+        if any(parte.startswith(".") for parte in relativa.parts):
+            raise ValueError(f"{p}: no se escribe en carpetas ocultas")
+        return str(p)
+    raise ValueError(f"{p} está fuera de las carpetas permitidas "
+                     f"({', '.join(map(str, raices))}); añádela a PS3_DEMONIO_RAICES")
+
+
+def _nombre_relativo(nombre: str, campo: str) -> str:
+    """Nombres que acaban en una ruta (item, fichero, nombre del PKG): sin raíz ni '..'."""
+    ruta = PurePosixPath(str(nombre).replace("\\", "/"))
+    if not nombre or ruta.is_absolute() or ".." in ruta.parts or ruta.name.startswith("."):
+        raise ValueError(f"{campo} no válido: {nombre!r}")
+    return str(nombre)
+
+
+def validar(datos: Dict, raices: Optional[List[Path]] = None) -> Dict:
+    """Normaliza un trabajo recibido por la API. ValueError si le falta algo.
+    Con `raices`, las carpetas tienen que estar dentro de alguna de ellas."""
+    tipo = datos.get("tipo")
+    if tipo not in TIPOS:
+        raise ValueError(f"tipo debe ser uno de {', '.join(TIPOS)}")
+
+    def carpeta(ruta: str) -> str:
+        return carpeta_permitida(ruta, raices) if raices is not None else str(Path(ruta).expanduser().resolve())
+
+    if tipo == "pkg":
+        if not str(datos.get("url", "")).startswith(("http://", "https://")):
+            raise ValueError("falta url")
+        _nombre_relativo(os.path.basename(urlsplit(datos["url"]).path), "nombre del PKG")
+        limpio = {"url": datos["url"],
+                  "destino": carpeta(datos.get("destino") or "."),
+                  "tam_parte": int(datos.get("tam_parte") or 0),
+                  "extraer": bool(datos.get("extraer")),
+                  "conservar_pkg": bool(datos.get("conservar_pkg", True))}
+    else:
+        for campo in ("item", "fichero", "dest_dir", "final_dir"):
+            if not datos.get(campo):
+                raise ValueError(f"falta {campo}")
+        if "/" in datos["item"] or "\\" in datos["item"]:
+            raise ValueError(f"item no válido: {datos['item']!r}")
+        limpio = {"item": _nombre_relativo(datos["item"], "item"),
+                  "fichero": _nombre_relativo(datos["fichero"], "fichero"),
+                  "dest_dir": carpeta(datos["dest_dir"]),
+                  "final_dir": carpeta(datos["final_dir"]),
+                  "formato": datos.get("formato") or None,
+                  "tam_parte": datos.get("tam_parte")}
+    return limpio
+
+
+class Motor:
+    """Cola con prioridad, hilos de descarga y un pool de libray compartidos."""
+
+    def __init__(self, descargas: int = DESCARGAS, hilos_libray: Optional[int] = None,
+                 raices: Optional[List[Path]] = None, historial: int = HISTORIAL):
+        import ps3IAPKGv1 as logic
+        self.logic = logic
+        self.raices = raices_configuradas() if raices is None else raices
+        self.historial = historial
+        self._cond = threading.Condition()
+        self._cola: List = []
+        self._secuencia = 0
+        self._empujes = itertools.count()
+        self._trabajos: Dict[int, Trabajo] = {}
+        self._subs: List["queue.Queue[Dict]"] = []
+        self._subs_lock = threading.Lock()
+        self._presupuestos: Dict = {}
+        hilos_libray = hilos_libray or int(os.environ.get("LIBRAY_HILOS", "1") or 1)
+        self._libray = ThreadPoolExecutor(max_workers=hilos_libray, thread_name_prefix="libray")
+        self._hilos = [threading.Thread(target=self._bucle, name=f"descarga-{i + 1}", daemon=True)
+                       for i in range(max(1, descargas))]
+        for h in self._hilos:
+            h.start()
+        # Índice del catálogo en memoria desde el arranque (para /pack)
+        threading.Thread(target=logic.ps3_indice.obtener_indice, daemon=True).start()
+
+    # --- Eventos ---
+
+    def suscribir(self) -> "queue.Queue[Dict]":
+        q: "queue.Queue[Dict]" = queue.Queue(maxsize=1000)
+        with self._subs_lock:
+            self._subs.append(q)
+        return q
+
+    def desuscribir(self, q) -> None:
+        with self._subs_lock:
+            if q in self._subs:
+                self._subs.remove(q)
+
+    def _publicar(self, evento: str, t: Trabajo) -> None:
+        t.actualizado = time.time()
+        datos = {"evento": evento, "trabajo": t.a_dict()}
+        with self._subs_lock:
+            for q in self._subs:
+                try:
+                    q.put_nowait(datos)
+                except queue.Full:
+                    pass  # cliente lento: pierde eventos, no frena las descargas
+
+    def _estado(self, t: Trabajo, estado: str, mensaje: str = "") -> None:
+        t.estado = estado
+        t.mensaje = mensaje
+        self._publicar("estado", t)
+        if estado in ESTADOS_FINALES:
+            self._podar()
+
+    def _podar(self) -> None:
+        """Olvida los trabajos terminados más antiguos por encima de `historial`."""
+        with self._cond:
+            terminados = [t for t in self._trabajos.values() if t.estado in ESTADOS_FINALES]
+            sobran = len(terminados) - self.historial
+            if sobran > 0:
+                for t in sorted(terminados, key=lambda t: t.actualizado)[:sobran]:
+                    del self._trabajos[t.id]
+
+    # --- Cola ---
+
+    def enviar(self, datos: Dict) -> Trabajo:
+        limpio = validar(datos, self.raices)
+        with self._cond:
+            self._secuencia += 1
+            t = Trabajo(self._secuencia, datos["tipo"], limpio, int(datos.get("prioridad") or 0))
+            self._trabajos[t.id] = t
+            heapq.heappush(self._cola, (-t.prioridad, t.id, next(self._empujes), t))
+            self._cond.notify()
+        self._publicar("estado", t)
+        return t
+
+    def trabajos(self) -> List[Trabajo]:
+        with self._cond:
+            return list(self._trabajos.values())
+
+    def trabajo(self, id: int) -> Optional[Trabajo]:
+        return self._trabajos.get(id)
+
+    def priorizar(self, id: int, prioridad: int) -> Trabajo:
+        with self._cond:
+            t = self._trabajos[id]
+            t.prioridad = prioridad
+            if t.estado == "en_cola":
+                # Entrada nueva en el heap; la antigua se descarta al salir (prioridad distinta)
+                heapq.heappush(self._cola, (-prioridad, t.id, next(self._empujes), t))
+        self._publicar("estado", t)
+        return t
+
+    def cancelar(self, id: int) -> Trabajo:
+        with self._cond:
+            t = self._trabajos[id]
+            if t.estado in ESTADOS_FINALES:
+                return t
+            t.cancelar.set()
+            en_cola = t.estado == "en_cola"
+            if en_cola:
+                t.estado = "cancelado"
+        if en_cola:
+            self._publicar("estado", t)
+            self._podar()
+        return t
+
+    def _siguiente(self) -> Trabajo:
+        with self._cond:
+            while True:
+                while self._cola:
+                    prioridad, _, _, t = heapq.heappop(self._cola)
+                    if t.estado == "en_cola" and -prioridad == t.prioridad:
+                        t.estado = "descargando"
+                        return t
+                self._cond.wait()
+
+    # --- Ejecución ---
+
+    def _progreso(self, t: Trabajo) -> Callable[[int, int], None]:
+        ultimo = [0.0]
+
+        def progreso(hechos: int, total: int) -> None:
+            if t.cancelar.is_set():
+                raise Cancelado()
+            t.hechos, t.total = hechos, total
+            ahora = time.monotonic()
+            if ahora - ultimo[0] >= INTERVALO_PROGRESO or (total and hechos >= total):
+                ultimo[0] = ahora
+                self._publicar("progreso", t)
+        return progreso
+
+    def _bucle(self) -> None:
+        while True:
+            t = self._siguiente()
+            self._publicar("estado", t)
+            try:
+                if t.tipo == "pkg":
+                    self._ejecutar_pkg(t)
+                else:
+                    self._ejecutar_ia(t)
+            except Exception as e:
+                self._estado(t, "error", str(e))
+
+    def _terminar_descarga(self, t: Trabajo, ok: bool) -> bool:
+        """Estado tras una descarga: las funciones de descarga convierten la cancelación
+        en un False, así que se distingue por el evento."""
+        if t.cancelar.is_set():
+            self._estado(t, "cancelado")
+            return False
+        if not ok:
+            self._estado(t, "error", "descarga fallida (ver ps3_log.py)")
+        return ok
+
+    def _ejecutar_pkg(self, t: Trabajo) -> None:
+        d = t.datos
+        destino = Path(d["destino"]) / os.path.basename(urlsplit(d["url"]).path)
+        ok = self.logic.descargar_pkg(d["url"], destino, progreso=self._progreso(t),
+                                      tam_parte=d["tam_parte"],
+                                      extraer=Path(d["destino"]) if d["extraer"] else None,
+                                      conservar_pkg=d["conservar_pkg"])
+        if self._terminar_descarga(t, ok):
+            self._estado(t, "completado", str(destino))
+
+    def _presupuesto(self, dest_dir: Path, final_dir: Path):
+        with self._cond:
+            clave = (str(dest_dir), str(final_dir))
+            if clave not in self._presupuestos:
+                self._presupuestos[clave] = self.logic.ps3_planificador.PresupuestoDisco(dest_dir, final_dir)
+            return self._presupuestos[clave]
+
+    def _ejecutar_ia(self, t: Trabajo) -> None:
+        logic, d = self.logic, t.datos
+        dest_dir, final_dir = Path(d["dest_dir"]), Path(d["final_dir"])
+        dest_dir.mkdir(parents=True, exist_ok=True)
+        final_dir.mkdir(parents=True, exist_ok=True)
+        # Igual que ejecutar_lote_ia: la descarga solo empieza si su pico cabe en disco
+        size = logic.tamanos_archivos_ia(d["item"], [d["fichero"]])[d["fichero"]]
+        presupuesto = self._presupuesto(dest_dir, final_dir)
+        if size:
+            self._estado(t, "esperando_espacio")
+            if not presupuesto.reservar(size, abandonar=t.cancelar):
+                if t.cancelar.is_set():
+                    self._estado(t, "cancelado")
+                else:
+                    self._estado(t, "error", "sin espacio en disco")
+                return
+            self._estado(t, "descargando")
+        entrada = dest_dir / d["item"] / d["fichero"]
+        ok = logic.descargar_archivo(d["item"], d["fichero"], dest_dir, progreso=self._progreso(t))
+        if not self._terminar_descarga(t, ok and entrada.exists()):
+            if t.cancelar.is_set():
+                entrada.unlink(missing_ok=True)
+            if size:
+                presupuesto.cancelar(size)
+            return
+        self._estado(t, "esperando_libray")
+
+        def procesar() -> None:
+            ok = False
+            try:
+                if t.cancelar.is_set():
+                    self._estado(t, "cancelado")
+                    return
+                self._estado(t, "libray")
+                salida = final_dir / f"{logic.sanitize_filename(d['fichero'])}.decrypted.iso"
+                ok = logic.procesar_archivo_con_libray(entrada, salida, formato=d["formato"],
+                                                       tam_parte=d["tam_parte"])
+                if ok:
+                    self._estado(t, "completado", str(logic.ruta_salida(salida, d["formato"] or logic.FORMATO_SALIDA)))
+                else:
+                    self._estado(t, "error", "libray falló (ver ps3_log.py)")
+            except Exception as e:
+                self._estado(t, "error", str(e))
+            finally:
+                if size:
+                    presupuesto.confirmar(size, ok)
+
+        self._libray.submit(procesar)
+
+
+# --- Servidor HTTP ---
+
+def servir(motor: Motor, host: str = "127.0.0.1", puerto: int = PUERTO, clave: str = CLAVE) -> None:
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    local = host in LOCALES
+    if not local and not clave:
+        raise ValueError(f"Escuchar en {host} sin clave dejaría a cualquiera de la red encolar descargas: "
+                         "usa --clave o PS3_DEMONIO_CLAVE")
+    # Lo que manda un cliente local (CLI, GUI, curl); los navegadores añaden Origin
+    hosts = {f"{h}:{puerto}" for h in ("127.0.0.1", "localhost", "[::1]")}
+    origenes = {f"http://{h}" for h in hosts}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, formato, *args):
+            pass
+
+        def _json(self, datos, codigo: int = 200) -> None:
+            cuerpo = json.dumps(datos, ensure_ascii=False).encode("utf-8")
+            self.send_response(codigo)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def _cuerpo(self) -> Dict:
+            largo = int(self.headers.get("Content-Length") or 0)
+            return json.loads(self.rfile.read(largo) or b"{}") if largo else {}
+
+        def _permitido(self) -> bool:
+            """Clave, Host, Origin y Content-Type; responde el error si algo no cuadra."""
+            if clave and not hmac.compare_digest(self.headers.get("X-PS3-Clave", "").encode("utf-8"),
+                                                 clave.encode("utf-8")):
+                self._json({"error": "clave incorrecta"}, 403)
+            elif local and self.headers.get("Host", "") not in hosts:
+                self._json({"error": "Host no permitido"}, 403)
+            elif self.headers.get("Origin") and self.headers["Origin"] not in origenes:
+                self._json({"error": "Origin no permitido"}, 403)
+            elif self.command in ("POST", "PATCH") and \
+                    self.headers.get("Content-Type", "").split(";")[0].strip().lower() != "application/json":
+                self._json({"error": "el cuerpo tiene que ser application/json"}, 415)
+            else:
+                return True
+            self.close_connection = True
+            return False
+
+        def _ruta(self):
+            partes = urlsplit(self.path)
+            return [p for p in partes.path.split("/") if p], parse_qs(partes.query)
+
+        def _trabajo(self, partes) -> Optional[Trabajo]:
+            t = motor.trabajo(int(partes[1])) if len(partes) == 2 and partes[1].isdigit() else None
+            if t is None:
+                self._json({"error": "trabajo no encontrado"}, 404)
+            return t
+
+        def do_GET(self):
+            if not self._permitido():
+                return
+            partes, query = self._ruta()
+            if partes == ["estado"]:
+                conteo: Dict[str, int] = {}
+                for t in motor.trabajos():
+                    conteo[t.estado] = conteo.get(t.estado, 0) + 1
+                self._json({"pid": os.getpid(), "trabajos": conteo})
+            elif partes == ["trabajos"]:
+                self._json([t.a_dict() for t in motor.trabajos()])
+            elif partes[:1] == ["trabajos"]:
+                t = self._trabajo(partes)
+                if t is not None:
+                    self._json(t.a_dict())
+            elif partes == ["eventos"]:
+                self._eventos(int(query["id"][0]) if query.get("id", [""])[0].isdigit() else None)
+            elif len(partes) == 2 and partes[0] == "pack":
+                indice = motor.logic.ps3_indice.obtener_indice()
+                self._json([e._asdict() for e in indice.pack(partes[1])])
+            else:
+                self._json({"error": "ruta desconocida"}, 404)
+
+        def do_POST(self):
+            if not self._permitido():
+                return
+            partes, _ = self._ruta()
+            if partes != ["trabajos"]:
+                self._json({"error": "ruta desconocida"}, 404)
+                return
+            try:
+                datos = self._cuerpo()
+                lote = datos["trabajos"] if "trabajos" in datos else [datos]
+                for d in lote:
+                    validar(d, motor.raices)
+                self._json([motor.enviar(d).a_dict() for d in lote], 201)
+            except (ValueError, TypeError, KeyError) as e:
+                self._json({"error": str(e)}, 400)
+
+        def do_PATCH(self):
+            if not self._permitido():
+                return
+            partes, _ = self._ruta()
+            t = self._trabajo(partes) if partes[:1] == ["trabajos"] else None
+            if t is None:
+                return
+            try:
+                self._json(motor.priorizar(t.id, int(self._cuerpo()["prioridad"])).a_dict())
+            except (ValueError, TypeError, KeyError) as e:
+                self._json({"error": str(e)}, 400)
+
+        def do_DELETE(self):
+            if not self._permitido():
+                return
+            partes, _ = self._ruta()
+            t = self._trabajo(partes) if partes[:1] == ["trabajos"] else None
+            if t is not None:
+                self._json(motor.cancelar(t.id).a_dict())
+
+        def _eventos(self, id: Optional[int]) -> None:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            q = motor.suscribir()
+            try:
+                # Estado actual primero, luego los cambios
+                for t in motor.trabajos():
+                    if id is None or t.id == id:
+                        self._sse({"evento": "estado", "trabajo": t.a_dict()})
+                while True:
+                    try:
+                        datos = q.get(timeout=PING_SSE)
+                    except queue.Empty:
+                        self.wfile.write(b": ping\n\n")
+                        self.wfile.flush()
+                        continue
+                    if id is None or datos["trabajo"]["id"] == id:
+                        self._sse(datos)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            finally:
+                motor.desuscribir(q)
+
+        def _sse(self, datos: Dict) -> None:
+            self.wfile.write(f"event: {datos['evento']}\ndata: {json.dumps(datos, ensure_ascii=False)}\n\n"
+                             .encode("utf-8"))
+            self.wfile.flush()
+
+    servidor = ThreadingHTTPServer((host, puerto), Handler)
+    servidor.daemon_threads = True
+    print(f"👾 Demonio PS3 escuchando en http://{host}:{puerto}")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+
+# --- Cliente ---
+
+class Cliente:
+    """Cliente de la API del demonio (lo usan la CLI, la GUI y este mismo script)."""
+
+    def __init__(self, url: Optional[str] = None, clave: Optional[str] = None):
+        conf = os.environ.get("PS3_DEMONIO", "")
+        url = url or (conf if conf.startswith("http") else f"http://127.0.0.1:{PUERTO}")
+        self.url = url.rstrip("/")
+        self.session = requests.Session()
+        # El demonio es local: nunca a través de un proxy (p. ej. el de la caché)
+        self.session.trust_env = False
+        clave = CLAVE if clave is None else clave
+        if clave:
+            self.session.headers["X-PS3-Clave"] = clave
+
+    def _pedir(self, metodo: str, ruta: str, **kw):
+        r = self.session.request(metodo, self.url + ruta, timeout=kw.pop("timeout", 10), **kw)
+        if r.status_code >= 400:
+            raise ValueError(r.json().get("error", r.text))
+        return r.json()
+
+    def disponible(self) -> bool:
+        try:
+            self._pedir("GET", "/estado", timeout=0.5)
+            return True
+        except (requests.RequestException, ValueError):
+            return False
+
+    def enviar(self, trabajos: List[Dict]) -> List[Dict]:
+        return self._pedir("POST", "/trabajos", json={"trabajos": trabajos})
+
+    def trabajos(self) -> List[Dict]:
+        return self._pedir("GET", "/trabajos")
+
+    def cancelar(self, id: int) -> Dict:
+        return self._pedir("DELETE", f"/trabajos/{id}")
+
+    def priorizar(self, id: int, prioridad: int) -> Dict:
+        return self._pedir("PATCH", f"/trabajos/{id}", json={"prioridad": prioridad})
+
+    def eventos(self, id: Optional[int] = None) -> Iterator[Dict]:
+        """Eventos del demonio según llegan (bloquea; se corta cerrando el generador)."""
+        ruta = "/eventos" + (f"?id={id}" if id is not None else "")
+        with self.session.get(self.url + ruta, stream=True, timeout=(5, None)) as r:
+            r.raise_for_status()
+            # Línea a línea según llegan (iter_lines esperaría a llenar su búfer)
+            for linea in iter(r.raw.readline, b""):
+                if linea.startswith(b"data: "):
+                    yield json.loads(linea[6:])
+
+    def seguir(self, ids: List[int], al_evento: Callable[[Dict], None]) -> Dict[int, Dict]:
+        """Sigue los trabajos `ids` hasta que terminen. Devuelve su estado final."""
+        pendientes, finales = set(ids), {}
+        eventos = self.eventos()
+        try:
+            for e in eventos:
+                t = e["trabajo"]
+                if t["id"] not in pendientes:
+                    continue
+                al_evento(e)
+                if t["estado"] in ESTADOS_FINALES:
+                    pendientes.discard(t["id"])
+                    finales[t["id"]] = t
+                    if not pendientes:
+                        break
+        finally:
+            eventos.close()
+        return finales
+
+
+def cliente() -> Optional[Cliente]:
+    """Cliente del demonio si hay uno escuchando (PS3_DEMONIO=0 lo desactiva,
+    PS3_DEMONIO=http://host:puerto apunta a otro)."""
+    if os.environ.get("PS3_DEMONIO", "").strip() == "0":
+        return None
+    c = Cliente()
+    return c if c.disponible() else None
+
+
+def _linea(t: Dict) -> str:
+    progreso = f"{t['hechos'] * 100 // t['total']}%" if t["total"] else ""
+    return f"[{t['id']:>4}] {t['estado']:17} {progreso:>4} p={t['prioridad']:<3} {t['nombre']} {t['mensaje']}".rstrip()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Demonio de descargas PS3 y su cliente")
+    parser.add_argument("--url", help=f"URL del demonio (por defecto http://127.0.0.1:{PUERTO})")
+    sub = parser.add_subparsers(dest="orden", required=True)
+    p = sub.add_parser("servir", help="Arranca el demonio")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--puerto", type=int, default=PUERTO)
+    p.add_argument("--descargas", type=int, default=DESCARGAS, help="Descargas simultáneas")
+    p.add_argument("--clave", default=CLAVE, help="Clave compartida (PS3_DEMONIO_CLAVE); obligatoria fuera de 127.0.0.1")
+    p = sub.add_parser("pkg", help="Encola descargas de PKG")
+    p.add_argument("urls", nargs="+")
+    p.add_argument("--destino", default=".")
+    p.add_argument("--extraer", action="store_true")
+    p.add_argument("--prioridad", type=int, default=0)
+    p.add_argument("--seguir", action="store_true", help="Espera a que terminen mostrando el progreso")
+    p = sub.add_parser("ia", help="Encola ficheros de un item de archive.org (descarga + libray)")
+    p.add_argument("item")
+    p.add_argument("ficheros", nargs="+")
+    p.add_argument("--dest", required=True, help="Carpeta temporal de las ISO cifradas")
+    p.add_argument("--final", required=True, help="Carpeta de las ISO desencriptadas")
+    p.add_argument("--formato", choices=("iso", "cso"))
+    p.add_argument("--prioridad", type=int, default=0)
+    p.add_argument("--seguir", action="store_true")
+    sub.add_parser("lista", help="Muestra los trabajos")
+    p = sub.add_parser("cancelar", help="Cancela un trabajo")
+    p.add_argument("id", type=int)
+    p = sub.add_parser("prioridad", help="Cambia la prioridad de un trabajo en cola (mayor = antes)")
+    p.add_argument("id", type=int)
+    p.add_argument("prioridad", type=int)
+    p = sub.add_parser("seguir", help="Muestra los eventos del demonio")
+    p.add_argument("id", type=int, nargs="?")
+    args = parser.parse_args(argv)
+
+    if args.orden == "servir":
+        if args.host not in LOCALES and not args.clave:
+            print(f"[ERROR] Para escuchar en {args.host} hace falta --clave (o PS3_DEMONIO_CLAVE)")
+            return 1
+        servir(Motor(args.descargas), args.host, args.puerto, args.clave)
+        return 0
+
+    c = Cliente(args.url)
+    try:
+        if args.orden in ("pkg", "ia"):
+            if args.orden == "pkg":
+                lote = [{"tipo": "pkg", "url": u, "destino": str(Path(args.destino).expanduser().resolve()),
+                         "extraer": args.extraer, "prioridad": args.prioridad} for u in args.urls]
+            else:
+                lote = [{"tipo": "ia", "item": args.item, "fichero": f, "formato": args.formato,
+                         "dest_dir": str(Path(args.dest).expanduser().resolve()),
+                         "final_dir": str(Path(args.final).expanduser().resolve()),
+                         "prioridad": args.prioridad} for f in args.ficheros]
+            enviados = c.enviar(lote)
+            for t in enviados:
+                print(_linea(t))
+            if args.seguir:
+                finales = c.seguir([t["id"] for t in enviados], lambda e: print(_linea(e["trabajo"])))
+                return 0 if all(t["estado"] == "completado" for t in finales.values()) else 1
+        elif args.orden == "lista":
+            for t in c.trabajos():
+                print(_linea(t))
+        elif args.orden == "cancelar":
+            print(_linea(c.cancelar(args.id)))
+        elif args.orden == "prioridad":
+            print(_linea(c.priorizar(args.id, args.prioridad)))
+        elif args.orden == "seguir":
+            for e in c.eventos(args.id):
+                print(_linea(e["trabajo"]))
+    except requests.RequestException as e:
+        print(f"[ERROR] No se pudo contactar con el demonio en {c.url}: {e}")
+        return 1
+    except ValueError as e:
+        print(f"[ERROR] {e}")
+        return 1
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
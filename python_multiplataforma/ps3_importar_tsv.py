@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Importador incremental de volcados TSV (estilo NoPayStation) a las listas pkg/
+
+Lee el TSV en una sola pasada en streaming (fila a fila, sin cargar el volcado en
+memoria) y lo compara con el catálogo existente de esa categoría. Solo se tocan los
+ficheros de región con altas, bajas o cambios, conservando el formato de siempre:
+
+    Nombre - TITLEID
+    URL
+
+Además guarda el tamaño, SHA-256, Content ID y RAP de cada enlace en
+`~/.iaPS3/pkg_meta.json` (el mismo fichero que usa ps3_crawler.py).
+
+Uso:
+    python3 ps3_importar_tsv.py PS3_GAMES.tsv --categoria Juegos
+    python3 ps3_importar_tsv.py PS3_DLCS.tsv --categoria "DLC´S" --simular
+"""
+
+from __future__ import annotations
+import os
+import sys
+import csv
+import argparse
+import itertools
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Tuple
+
+import ps3_crawler
+
+PKG_DIR = Path.home() / ".iaPS3" / "pkg"
+REGIONES = ("US", "EU", "JP", "ASIA")
+CATEGORIAS = ("Juegos", "DLC´S", "Temas", "Avatares", "Demos")
+# Categoría deducida del nombre del volcado (PS3_GAMES.tsv, PS3_DLCS.tsv...)
+CATEGORIA_POR_FICHERO = {
+    "GAMES": "Juegos", "DLCS": "DLC´S", "THEMES": "Temas", "AVATARS": "Avatares", "DEMOS": "Demos",
+}
+# Enlaces que NoPayStation marca como no disponibles
+ENLACES_INVALIDOS = {"", "MISSING", "CART ONLY", "NOT REQUIRED"}
+
+# Cabeceras aceptadas para cada campo (en minúsculas)
+COLUMNAS = {
+    "title_id": ("title id", "titleid"),
+    "region": ("region",),
+    "name": ("name",),
+    "url": ("pkg direct link", "pkg link", "pkg"),
+    "rap": ("rap",),
+    "content_id": ("content id", "contentid"),
+    "size": ("file size", "size"),
+    "sha256": ("sha256", "sha-256"),
+}
+
+
+class Fila(NamedTuple):
+    title_id: str
+    region: str
+    name: str
+    url: str
+    rap: str
+    content_id: str
+    size: int
+    sha256: str
+
+    @property
+    def nombre_catalogo(self) -> str:
+        return f"{self.name} - {self.title_id}" if self.title_id else self.name
+
+
+def leer_bloques(path: Path) -> Iterator[Tuple[str, str]]:
+    """Pares (línea de nombre, url) de una lista del catálogo, en streaming."""
+    if not path.exists():
+        return
+    # None = esperando nombre, str = esperando url, False = resto del bloque (se ignora)
+    nombre = None
+    with open(path, encoding='utf-8', errors='ignore') as f:
+        for linea in f:
+            linea = linea.strip()
+            if not linea:
+                nombre = None
+            elif nombre is None:
+                nombre = linea
+            elif nombre is not False:
+                yield nombre, linea
+                nombre = False
+
+
+def _indices_columnas(cabecera: List[str]) -> Dict[str, int]:
+    normal = [c.strip().lower() for c in cabecera]
+    indices = {}
+    for campo, alias in COLUMNAS.items():
+        for a in alias:
+            if a in normal:
+                indices[campo] = normal.index(a)
+                break
+    faltan = {"title_id", "region", "name", "url"} - indices.keys()
+    if faltan:
+        raise ValueError(f"Faltan columnas en el TSV: {', '.join(sorted(faltan))}")
+    return indices
+
+
+def leer_tsv(path: Path) -> Iterator[Fila]:
+    """Filas válidas del volcado, una a una (memoria constante)."""
+    with open(path, encoding='utf-8', errors='replace', newline='') as f:
+        lector = csv.reader(f, delimiter='\t', quoting=csv.QUOTE_NONE)
+        cabecera = next(lector, None)
+        if cabecera is None:
+            return
+        idx = _indices_columnas(cabecera)
+
+        def campo(fila: List[str], nombre: str) -> str:
+            i = idx.get(nombre)
+            return fila[i].strip() if i is not None and i < len(fila) else ""
+
+        for fila in lector:
+            url = campo(fila, "url")
+            if url.upper() in ENLACES_INVALIDOS or not url.lower().startswith("http"):
+                continue
+            size = campo(fila, "size")
+            yield Fila(campo(fila, "title_id"), campo(fila, "region").upper(),
+                       campo(fila, "name"), url, campo(fila, "rap"), campo(fila, "content_id"),
+                       int(size) if size.isdigit() else 0, campo(fila, "sha256").lower())
+
+
+class Resultado(NamedTuple):
+    altas: int
+    bajas: int
+    cambios: int
+    ignoradas: int
+    ficheros: List[Path]
+
+
+def importar(tsv: Path, categoria: str, pkg_dir: Path = PKG_DIR,
+             eliminar: bool = True, simular: bool = False) -> Resultado:
+    """Aplica al catálogo solo las diferencias con el volcado. Con `simular` no toca
+    ni las listas ni los metadatos."""
+    carpeta = pkg_dir / categoria
+    # Catálogo actual por región: url -> línea de nombre (son ficheros pequeños)
+    actual: Dict[str, Dict[str, str]] = {
+        r: dict((url, nombre) for nombre, url in leer_bloques(carpeta / f"{r}.txt")) for r in REGIONES}
+    vistos: Dict[str, set] = {r: set() for r in REGIONES}
+    cambios: Dict[str, Dict[str, str]] = {r: {} for r in REGIONES}
+    altas: Dict[str, List[Tuple[str, str]]] = {r: [] for r in REGIONES}
+    # Datos del volcado por URL; se mezclan con los metadatos compartidos al final
+    datos: Dict[str, Dict] = {}
+    ignoradas = 0
+
+    for fila in leer_tsv(tsv):
+        if fila.region not in actual:
+            ignoradas += 1
+            continue
+        r = fila.region
+        if fila.url in vistos[r]:
+            continue
+        vistos[r].add(fila.url)
+        nombre = fila.nombre_catalogo
+        previo = actual[r].get(fila.url)
+        if previo is None:
+            altas[r].append((nombre, fila.url))
+        elif previo != nombre:
+            cambios[r][fila.url] = nombre
+        info = datos.setdefault(fila.url, {})
+        for clave, valor in (("sha256", fila.sha256), ("content_id", fila.content_id),
+                             ("rap", fila.rap), ("title_id", fila.title_id), ("size", fila.size)):
+            if valor:
+                info[clave] = valor
+
+    total_altas = total_bajas = total_cambios = 0
+    tocados: List[Path] = []
+    for r in REGIONES:
+        bajas = set(actual[r]) - vistos[r] if eliminar else set()
+        if not (altas[r] or bajas or cambios[r]):
+            continue
+        total_altas += len(altas[r])
+        total_bajas += len(bajas)
+        total_cambios += len(cambios[r])
+        destino = carpeta / f"{r}.txt"
+        tocados.append(destino)
+        if simular:
+            continue
+        _reescribir(destino, bajas, cambios[r], altas[r])
+
+    if not simular:
+        _mezclar_meta(datos)
+    return Resultado(total_altas, total_bajas, total_cambios, ignoradas, tocados)
+
+
+def _mezclar_meta(datos: Dict[str, Dict]) -> None:
+    """Añade los datos del volcado a pkg_meta.json. El tamaño medido por el rastreador
+    (entradas con 'status') manda sobre el del volcado."""
+    meta = ps3_crawler.obtener_meta()
+    with ps3_crawler._meta_lock:
+        for url, nuevo in datos.items():
+            info = meta.setdefault(url, {})
+            if 'status' in info:
+                nuevo = {k: v for k, v in nuevo.items() if k != 'size'}
+            info.update(nuevo)
+    ps3_crawler.guardar_meta(meta)
+
+
+def _reescribir(destino: Path, bajas: set, cambios: Dict[str, str],
+                altas: List[Tuple[str, str]]) -> None:
+    """Reescribe una lista aplicando bajas/cambios en su sitio y añadiendo las altas al final."""
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    tmp = destino.with_name(f"{destino.name}.{os.getpid()}.tmp")
+    with open(tmp, 'w', encoding='utf-8', newline='\n') as out:
+        primero = True
+        bloques = ((cambios.get(url, nombre), url) for nombre, url in leer_bloques(destino)
+                   if url not in bajas)
+        for nombre, url in itertools.chain(bloques, altas):
+            out.write(("" if primero else "\n\n") + f"{nombre}\n{url}")
+            primero = False
+    os.replace(tmp, destino)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Importa un volcado TSV al catálogo pkg/")
+    parser.add_argument("tsv", type=Path)
+    parser.add_argument("--categoria", choices=CATEGORIAS,
+                        help="Carpeta destino (por defecto se deduce del nombre del TSV)")
+    parser.add_argument("--pkg-dir", type=Path, default=PKG_DIR)
+    parser.add_argument("--conservar", action="store_true",
+                        help="No elimina entradas que ya no estén en el volcado")
+    parser.add_argument("--simular", action="store_true", help="Solo muestra las diferencias")
+    args = parser.parse_args(argv)
+
+    categoria = args.categoria
+    if categoria is None:
+        for clave, cat in CATEGORIA_POR_FICHERO.items():
+            if clave in args.tsv.name.upper():
+                categoria = cat
+                break
+    if categoria is None:
+        print("[ERROR] No se pudo deducir la categoría; usa --categoria.")
+        return 1
+
+    res = importar(args.tsv, categoria, args.pkg_dir, eliminar=not args.conservar, simular=args.simular)
+    prefijo = "(simulación) " if args.simular else ""
+    print(f"{prefijo}{categoria}: +{res.altas} altas, -{res.bajas} bajas, ~{res.cambios} cambios "
+          f"({res.ignoradas} filas de otras regiones ignoradas)")
+    for p in res.ficheros:
+        print(f"  - {p}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Índice del catálogo PKG por Title ID
+
+Recorre una sola vez todas las listas de `~/.iaPS3/pkg` (Juegos, DLC´S, Temas,
+Avatares, Demos y todas las regiones) y guarda en `~/.iaPS3/pkg_indice.json` un mapa
+de Title ID (`BLUS30074`) y prefijo de Content ID (`UP0002-BLUS30074`) a todas sus
+entradas. Así el juego, sus DLC, temas y avatares se encuentran con una búsqueda en
+un diccionario, sin volver a leer ninguna lista. El índice se reconstruye solo cuando
+cambia algún fichero del catálogo.
+
+Uso:
+    python3 ps3_indice.py BLUS30074
+    python3 ps3_indice.py UP0002-BLUS30074 --reconstruir
+"""
+
+from __future__ import annotations
+import os
+import re
+import sys
+import json
+import argparse
+import threading
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+import ps3_crawler
+from ps3_importar_tsv import CATEGORIAS, leer_bloques
+
+IA_PS3_DIR = Path.home() / ".iaPS3"
+PKG_DIR = IA_PS3_DIR / "pkg"
+INDICE_FILE = IA_PS3_DIR / "pkg_indice.json"
+VERSION = 1
+
+
+RE_TITLE_ID = re.compile(r"\b([A-Z]{4}\d{5})\b")
+# Prefijo de Content ID: UP0002-BLUS30074 (también dentro de un Content ID completo)
+RE_CONTENT = re.compile(r"\b([A-Z]{2}\d{4})-([A-Z]{4}\d{5})")
+# Las URL de la CDN llevan editor y Title ID: /cdn/UP0002/BLUS30074_00/...
+RE_CDN = re.compile(r"/cdn/([A-Z]{2}\d{4})/([A-Z]{4}\d{5})_")
+RE_SUFIJO_NOMBRE = re.compile(r" - [A-Z]{4}\d{5}.*")
+
+
+class EntradaCatalogo(NamedTuple):
+    categoria: str
+    region: str
+    nombre: str
+    url: str
+    title_id: str
+    content: str  # prefijo de Content ID ("" si no se conoce)
+
+    @property
+    def etiqueta(self) -> str:
+        return f"[{self.categoria}/{self.region}] {self.nombre or self.title_id}"
+
+
+def normalizar_clave(texto: str) -> Optional[str]:
+    """Prefijo de Content ID o Title ID contenido en el texto (en mayúsculas)."""
+    texto = (texto or "").strip().upper()
+    m = RE_CONTENT.search(texto)
+    if m:
+        return f"{m.group(1)}-{m.group(2)}"
+    m = RE_TITLE_ID.search(texto)
+    return m.group(1) if m else None
+
+
+def _firma(pkg_dir: Path) -> List[List]:
+    """Ruta, tamaño y mtime de cada lista: si algo cambia, el índice se rehace."""
+    firma = []
+    for txt in sorted(pkg_dir.rglob("*.txt")):
+        st = txt.stat()
+        firma.append([txt.relative_to(pkg_dir).as_posix(), st.st_size, st.st_mtime_ns])
+    return firma
+
+
+class IndiceCatalogo:
+    def __init__(self, entradas: List[EntradaCatalogo], firma: List[List]):
+        self.entradas = entradas
+        self.firma = firma
+        self._claves: Dict[str, List[int]] = {}
+        for i, e in enumerate(entradas):
+            self._claves.setdefault(e.title_id, []).append(i)
+            if e.content:
+                self._claves.setdefault(e.content, []).append(i)
+
+    @classmethod
+    def construir(cls, pkg_dir: Path = PKG_DIR, meta: Optional[Dict[str, Dict]] = None) -> "IndiceCatalogo":
+        meta = ps3_crawler.obtener_meta() if meta is None else meta
+        entradas: List[EntradaCatalogo] = []
+        vistas = set()
+        # Las listas menos anidadas primero: las copias en subcarpetas no duplican entradas
+        txts = sorted(pkg_dir.rglob("*.txt"), key=lambda p: (len(p.relative_to(pkg_dir).parts), str(p)))
+        for txt in txts:
+            categoria = txt.parent.name if txt.parent != pkg_dir else "PKG"
+            for linea_nombre, url in leer_bloques(txt):
+                if url in vistas:
+                    continue
+                vistas.add(url)
+                info = meta.get(url, {})
+                cdn = RE_CDN.search(url)
+                title_id = info.get("title_id") or ""
+                if not title_id:
+                    m = RE_TITLE_ID.search(linea_nombre.rsplit(" - ", 1)[-1])
+                    title_id = m.group(1) if m else (cdn.group(2) if cdn else "")
+                if not title_id:
+                    continue
+                content = normalizar_clave(info.get("content_id", "")) or ""
+                if "-" not in content:
+                    content = f"{cdn.group(1)}-{cdn.group(2)}" if cdn else ""
+                entradas.append(EntradaCatalogo(categoria, txt.stem, RE_SUFIJO_NOMBRE.sub("", linea_nombre).strip(),
+                                                url, title_id, content))
+        return cls(entradas, _firma(pkg_dir))
+
+    @classmethod
+    def cargar(cls, pkg_dir: Path = PKG_DIR, path: Path = INDICE_FILE) -> "IndiceCatalogo":
+        """Índice guardado si sigue al día; si no, se reconstruye y se guarda."""
+        try:
+            datos = json.loads(path.read_text(encoding="utf-8"))
+            if datos.get("version") == VERSION and datos.get("firma") == _firma(pkg_dir):
+                return cls([EntradaCatalogo(*e) for e in datos["entradas"]], datos["firma"])
+        except (OSError, ValueError, TypeError, KeyError):
+            pass
+        indice = cls.construir(pkg_dir)
+        indice.guardar(path)
+        return indice
+
+    def guardar(self, path: Path = INDICE_FILE) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps({"version": VERSION, "firma": self.firma,
+                                   "entradas": [list(e) for e in self.entradas]},
+                                  ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+        os.replace(tmp, path)
+
+    def buscar(self, clave: str) -> List[EntradaCatalogo]:
+        """Entradas de un Title ID o prefijo de Content ID (búsqueda directa en el mapa)."""
+        clave = normalizar_clave(clave)
+        return [self.entradas[i] for i in self._claves.get(clave, [])] if clave else []
+
+    def pack(self, clave: str) -> List[EntradaCatalogo]:
+        """Juego y todos sus extras, ordenados por categoría y región."""
+        orden = {c: i for i, c in enumerate(CATEGORIAS)}
+        return sorted(self.buscar(clave),
+                      key=lambda e: (orden.get(e.categoria, len(orden)), e.region, e.nombre.lower()))
+
+    def buscar_nombre(self, texto: str, categoria: Optional[str] = "Juegos",
+                      limite: int = 50) -> List[EntradaCatalogo]:
+        """Búsqueda por nombre (recorre las entradas) para dar con el Title ID."""
+        texto = texto.strip().lower()
+        res = []
+        for e in self.entradas:
+            if (categoria is None or e.categoria == categoria) and texto in e.nombre.lower():
+                res.append(e)
+                if len(res) >= limite:
+                    break
+        return res
+
+
+_indice_lock = threading.Lock()
+_indice_global: Optional[IndiceCatalogo] = None
+
+
+def obtener_indice(recargar: bool = False) -> IndiceCatalogo:
+    """Índice compartido por todo el proceso (se carga o construye una vez)."""
+    global _indice_global
+    with _indice_lock:
+        if _indice_global is None or recargar:
+            _indice_global = IndiceCatalogo.cargar()
+        return _indice_global
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Busca un juego y todos sus extras por Title ID")
+    parser.add_argument("clave", nargs="?", help="Title ID (BLUS30074), Content ID o parte del nombre")
+    parser.add_argument("--reconstruir", action="store_true", help="Rehace el índice aunque esté al día")
+    args = parser.parse_args(argv)
+
+    if args.reconstruir:
+        indice = IndiceCatalogo.construir()
+        indice.guardar()
+    else:
+        indice = IndiceCatalogo.cargar()
+    print(f"📇 {len(indice.entradas)} entradas indexadas ({INDICE_FILE})")
+    if not args.clave:
+        return 0
+    if normalizar_clave(args.clave):
+        for e in indice.pack(args.clave):
+            print(f"  {e.etiqueta}\n      {e.url}")
+    else:
+        for e in indice.buscar_nombre(args.clave):
+            print(f"  {e.title_id}  {e.etiqueta}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
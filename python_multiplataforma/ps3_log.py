@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Log estructurado único (JSON-lines) para descargas y procesado con libray
+
+- Un fichero por proceso (`~/.iaPS3/logs/ps3_downloader-<fecha>-<pid>.jsonl`) con
+  rotación por tamaño: la CLI, la GUI, el demonio y los trabajadores pueden escribir a
+  la vez sin pisarse al rotar. Los de hace más de PS3_LOG_DIAS días se borran al arrancar.
+- La consulta mezcla los ficheros de todos los procesos por orden de hora.
+- Se escribe desde un hilo en segundo plano (QueueHandler + QueueListener), así las
+  descargas nunca esperan al disco.
+- Cada registro lleva: ts, job, fase, nivel, msg y campos extra (duración, bytes, rc...).
+
+Consulta desde la línea de comandos:
+    python3 ps3_log.py --job sony_playstation3_xxx --fallos
+    python3 ps3_log.py --fase libray --ultimos 50
+"""
+
+from __future__ import annotations
+import os
+import sys
+import json
+import time
+import heapq
+import queue
+import atexit
+import logging
+import argparse
+import threading
+import logging.handlers
+from pathlib import Path
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+# Tramos para la traza de --profile (no hace nada si el perfilado no está activo)
+import ps3_perfil
+
+LOGS_DIR = Path.home() / ".iaPS3" / "logs"
+# Prefijo de los ficheros; el antiguo ps3_downloader.jsonl compartido también se lee
+LOG_NOMBRE = "ps3_downloader"
+MAX_BYTES = 10 * 1024 * 1024
+BACKUPS = 5
+RETENCION_DIAS = int(os.environ.get("PS3_LOG_DIAS", "30"))
+
+_logger = logging.getLogger("ps3")
+_listener: Optional[logging.handlers.QueueListener] = None
+_init_lock = threading.Lock()
+# Fichero de este proceso (se decide al escribir el primer registro)
+log_file: Optional[Path] = None
+
+
+class _FormatoJSON(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        datos = {
+            "ts": round(record.created, 3),
+            "nivel": record.levelname.lower(),
+            "job": getattr(record, "job", None),
+            "fase": getattr(record, "fase", None),
+            "msg": record.getMessage(),
+        }
+        datos.update(getattr(record, "campos", {}))
+        return json.dumps(datos, ensure_ascii=False)
+
+
+def _podar_antiguos(dias: int = RETENCION_DIAS) -> None:
+    """Borra los ficheros de log (de cualquier proceso) sin tocar en `dias` días."""
+    limite = time.time() - dias * 86400
+    for path in LOGS_DIR.glob(f"{LOG_NOMBRE}*.jsonl*"):
+        try:
+            if path.stat().st_mtime < limite:
+                path.unlink()
+        except OSError:
+            pass  # otro proceso lo tiene abierto (Windows) o ya no está
+
+
+def _iniciar() -> None:
+    global _listener, log_file
+    with _init_lock:
+        if _listener is not None:
+            return
+        LOGS_DIR.mkdir(parents=True, exist_ok=True)
+        if RETENCION_DIAS > 0:
+            _podar_antiguos()
+        log_file = LOGS_DIR / f"{LOG_NOMBRE}-{time.strftime('%Y%m%d_%H%M%S')}-{os.getpid()}.jsonl"
+        fichero = logging.handlers.RotatingFileHandler(
+            log_file, maxBytes=MAX_BYTES, backupCount=BACKUPS, encoding="utf-8")
+        fichero.setFormatter(_FormatoJSON())
+        cola: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+        _logger.addHandler(logging.handlers.QueueHandler(cola))
+        _logger.setLevel(logging.INFO)
+        _logger.propagate = False
+        _listener = logging.handlers.QueueListener(cola, fichero)
+        _listener.start()
+        atexit.register(cerrar)
+
+
+def cerrar() -> None:
+    """Vacía la cola y detiene el hilo escritor."""
+    global _listener
+    with _init_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+            for h in list(_logger.handlers):
+                _logger.removeHandler(h)
+
+
+def registro(job: Optional[str], fase: str, msg: str, nivel: int = logging.INFO, **campos) -> None:
+    """Encola un registro estructurado. No bloquea en disco."""
+    if _listener is None:
+        _iniciar()
+    _logger.log(nivel, msg, extra={"job": job, "fase": fase, "campos": campos})
+
+
+def error(job: Optional[str], fase: str, msg: str, **campos) -> None:
+    registro(job, fase, msg, nivel=logging.ERROR, **campos)
+
+
+@contextmanager
+def fase(job: Optional[str], nombre: str, **campos) -> Iterator[Dict]:
+    """Registra inicio y fin de una fase con su duración.
+
+    El diccionario devuelto se puede rellenar con campos que se añadirán al registro
+    final (p. ej. bytes o rc). Si se marca `ok=False` o hay excepción, el fin se
+    registra como error.
+    """
+    extra: Dict = {}
+    traza: Dict = {}
+    registro(job, nombre, "inicio", **campos)
+    t0 = time.perf_counter()
+    with ps3_perfil.tramo(job, nombre, traza):
+        try:
+            yield extra
+        except BaseException as e:
+            fallo = {**campos, **extra, "ok": False, "excepcion": repr(e)}
+            traza.update(fallo)
+            error(job, nombre, "fin", **{**fallo, "duracion": round(time.perf_counter() - t0, 3)})
+            raise
+        ok = extra.pop("ok", True)
+        traza.update({**campos, **extra, "ok": ok})
+    registro(job, nombre, "fin", nivel=logging.INFO if ok else logging.ERROR,
+             **{**campos, **extra, "ok": ok, "duracion": round(time.perf_counter() - t0, 3)})
+
+
+# --- Consulta ---
+
+def _ficheros_log() -> List[List[Path]]:
+    """Ficheros de cada proceso, de su rotado más antiguo al actual."""
+    procesos: Dict[str, List] = {}
+    for path in LOGS_DIR.glob(f"{LOG_NOMBRE}*.jsonl*"):
+        base, _, sufijo = path.name.partition(".jsonl")
+        sufijo = sufijo.lstrip(".")
+        if sufijo and not sufijo.isdigit():
+            continue
+        procesos.setdefault(base, []).append((-int(sufijo or 0), path))
+    return [[p for _, p in sorted(ficheros)] for _, ficheros in sorted(procesos.items())]
+
+
+def _leer_proceso(ficheros: List[Path]) -> Iterator[Dict]:
+    for path in ficheros:
+        try:
+            with open(path, encoding="utf-8", errors="replace") as f:
+                for linea in f:
+                    try:
+                        yield json.loads(linea)
+                    except ValueError:
+                        continue
+        except OSError:
+            continue  # rotado o podado mientras se leía
+
+
+def leer_registros(job: Optional[str] = None, fase: Optional[str] = None,
+                   solo_fallos: bool = False) -> Iterator[Dict]:
+    """Registros de todos los procesos mezclados por hora."""
+    for r in heapq.merge(*map(_leer_proceso, _ficheros_log()), key=lambda r: r.get("ts") or 0):
+        if job and job not in (r.get("job") or ""):
+            continue
+        if fase and r.get("fase") != fase:
+            continue
+        if solo_fallos and r.get("nivel") != "error" and r.get("ok") is not False:
+            continue
+        yield r
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Consulta el log estructurado de PS3 Downloader")
+    parser.add_argument("--job", help="Filtra por trabajo (coincidencia parcial)")
+    parser.add_argument("--fase", help="Filtra por fase (descarga, libray, pkg...)")
+    parser.add_argument("--fallos", action="store_true", help="Solo registros de error")
+    parser.add_argument("--ultimos", type=int, default=0, help="Muestra solo los N últimos")
+    parser.add_argument("--json", action="store_true", help="Salida JSON-lines sin formatear")
+    args = parser.parse_args(argv)
+
+    registros = list(leer_registros(args.job, args.fase, args.fallos))
+    if args.ultimos:
+        registros = registros[-args.ultimos:]
+    for r in registros:
+        if args.json:
+            print(json.dumps(r, ensure_ascii=False))
+            continue
+        hora = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(r.get("ts", 0)))
+        extra = {k: v for k, v in r.items() if k not in ("ts", "nivel", "job", "fase", "msg")}
+        extra_txt = " ".join(f"{k}={v}" for k, v in extra.items())
+        print(f"[{hora}] {r.get('nivel', ''):5} {r.get('job') or '-'} [{r.get('fase')}] "
+              f"{r.get('msg')} {extra_txt}".rstrip())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Perfilado del pipeline con trazas para Chrome/Perfetto
+
+Con `--profile` (o PS3_PERFIL=1) cada fase registrada con `ps3_log.fase` (metadatos,
+descarga, pkg, libray, verificar_cso...) se guarda además como un tramo con su inicio
+y duración, en una fila por trabajo. Las descargas separan el tiempo de red y el de
+escritura en disco, y la cola de libray y las esperas por espacio libre aparecen como
+tramos propios, así los solapes y los huecos de un lote se ven en la línea de tiempo.
+
+Opcionalmente se pasa cProfile por una de cada N fases pesadas (PS3_PERFIL_MUESTREO=N)
+para ver qué funciones de Python se llevan el tiempo sin frenar todo el lote. Solo se
+muestrea una fase a la vez: desde Python 3.12 cProfile no admite dos perfiles activos en
+el mismo proceso, así que las fases que se solapan con la muestra van sin ella.
+
+Al salir se escribe `~/.iaPS3/logs/perfil_<fecha>.json` (ábrelo en https://ui.perfetto.dev
+o chrome://tracing) y, si hubo muestreo, `perfil_<fecha>.pstats`.
+
+    python3 ps3IAPKGv1.py --profile
+    python3 ps3_perfil.py ~/.iaPS3/logs/perfil_20240101_120000.json   # resumen por fase
+"""
+
+from __future__ import annotations
+import io
+import os
+import sys
+import json
+import time
+import atexit
+import pstats
+import cProfile
+import argparse
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+LOGS_DIR = Path.home() / ".iaPS3" / "logs"
+# Fases en las que corre el código Python caliente (bucles de bytes)
+FASES_PESADAS = {"descarga", "pkg", "libray", "verificar_cso"}
+# Funciones que se adjuntan a cada tramo muestreado
+TOP_FUNCIONES = 15
+# Cada cuánto se añade un punto al contador de bytes de una transferencia
+INTERVALO_CONTADOR = 0.5
+
+ACTIVO = False
+_destino: Optional[Path] = None
+_muestreo = 0
+_t0 = 0.0
+_lock = threading.Lock()
+_eventos: List[Dict] = []
+_filas: Dict[str, int] = {}
+_perfiles: List[cProfile.Profile] = []
+_contador_fases = 0
+# La fase que se está muestreando ahora (una por proceso)
+_muestra: Optional[cProfile.Profile] = None
+
+
+def ahora() -> float:
+    return time.perf_counter()
+
+
+def _us(t: float) -> int:
+    return int((t - _t0) * 1_000_000)
+
+
+def _fila(job: Optional[str]) -> int:
+    """Fila (tid) de la traza para un trabajo; se crea al verlo por primera vez."""
+    job = job or "general"
+    with _lock:
+        tid = _filas.get(job)
+        if tid is None:
+            tid = _filas[job] = len(_filas) + 1
+            _eventos.append({"ph": "M", "name": "thread_name", "pid": os.getpid(), "tid": tid,
+                             "args": {"name": job}})
+            _eventos.append({"ph": "M", "name": "thread_sort_index", "pid": os.getpid(), "tid": tid,
+                             "args": {"sort_index": tid}})
+        return tid
+
+
+def activar(destino: Optional[Path] = None, muestreo: Optional[int] = None) -> Path:
+    """Empieza a registrar tramos. La traza se exporta al salir (o con `exportar`)."""
+    global ACTIVO, _destino, _muestreo, _t0
+    if ACTIVO:
+        return _destino
+    if destino is None:
+        LOGS_DIR.mkdir(parents=True, exist_ok=True)
+        destino = LOGS_DIR / f"perfil_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    if muestreo is None:
+        muestreo = int(os.environ.get("PS3_PERFIL_MUESTREO", "0") or 0)
+    _destino, _muestreo, _t0 = Path(destino), max(0, muestreo), ahora()
+    _eventos.append({"ph": "M", "name": "process_name", "pid": os.getpid(),
+                     "args": {"name": "PS3 Downloader"}})
+    ACTIVO = True
+    atexit.register(exportar)
+    return _destino
+
+
+def _empezar_muestra(nombre: str) -> Optional[cProfile.Profile]:
+    """cProfile para esta fase si le toca y no hay otra muestra en marcha; si no, None."""
+    global _contador_fases, _muestra
+    if not _muestreo or nombre not in FASES_PESADAS:
+        return None
+    with _lock:
+        if _muestra is not None:
+            return None
+        _contador_fases += 1
+        if (_contador_fases - 1) % _muestreo:
+            return None
+        perfil = cProfile.Profile()
+        try:
+            perfil.enable()
+        except ValueError:
+            # Otra herramienta de perfilado ya está activa (3.12+): esta fase va sin muestra
+            return None
+        _muestra = perfil
+        return perfil
+
+
+def _terminar_muestra(perfil: cProfile.Profile) -> None:
+    global _muestra
+    perfil.disable()
+    with _lock:
+        _muestra = None
+        _perfiles.append(perfil)
+
+
+def _top(perfil: cProfile.Profile) -> List[str]:
+    texto = io.StringIO()
+    pstats.Stats(perfil, stream=texto).sort_stats("cumulative").print_stats(TOP_FUNCIONES)
+    lineas = texto.getvalue().splitlines()
+    # Solo las filas de la tabla (tras la cabecera "ncalls tottime ...")
+    for i, linea in enumerate(lineas):
+        if linea.lstrip().startswith("ncalls"):
+            return [l.strip() for l in lineas[i + 1:] if l.strip()]
+    return []
+
+
+def registrar(job: Optional[str], nombre: str, inicio: float, fin: Optional[float] = None,
+              args: Optional[Dict] = None) -> None:
+    """Añade un tramo ya medido (p. ej. el tiempo que un trabajo pasó en cola)."""
+    if not ACTIVO:
+        return
+    fin = ahora() if fin is None else fin
+    evento = {"ph": "X", "name": nombre, "cat": nombre, "pid": os.getpid(), "tid": _fila(job),
+              "ts": _us(inicio), "dur": max(0, _us(fin) - _us(inicio)),
+              "args": {"hilo": threading.current_thread().name, **(args or {})}}
+    with _lock:
+        _eventos.append(evento)
+
+
+@contextmanager
+def tramo(job: Optional[str], nombre: str, args: Optional[Dict] = None) -> Iterator[Dict]:
+    """Mide un bloque como tramo de la traza. `args` se lee al terminar, así se puede
+    rellenar dentro (bytes, rc...). Sin perfilado activo no hace nada."""
+    args = {} if args is None else args
+    if not ACTIVO:
+        yield args
+        return
+    perfil = _empezar_muestra(nombre)
+    inicio = ahora()
+    try:
+        yield args
+    finally:
+        fin = ahora()
+        if perfil is not None:
+            _terminar_muestra(perfil)
+            args = {**args, "cprofile": _top(perfil)}
+        registrar(job, nombre, inicio, fin, _serializable(args))
+
+
+def _serializable(args: Dict) -> Dict:
+    return {k: v if isinstance(v, (str, int, float, bool, list, type(None))) else str(v)
+            for k, v in args.items()}
+
+
+def _contador(job: Optional[str], t: float, hechos: int) -> None:
+    evento = {"ph": "C", "name": f"bytes {job}", "pid": os.getpid(), "ts": _us(t),
+              "args": {"MB": round(hechos / 1024 ** 2, 1)}}
+    with _lock:
+        _eventos.append(evento)
+
+
+def transferir(trozos: Iterable[bytes], escribir: Callable[[bytes], object],
+               total: int = 0, progreso: Optional[Callable[[int, int], None]] = None,
+               job: Optional[str] = None, info: Optional[Dict] = None) -> int:
+    """Bucle de copia de una descarga: escribe cada trozo y avisa del progreso.
+
+    Con el perfilado activo separa el tiempo esperando a la red del tiempo escribiendo
+    (se añaden a `info` como red_s y disco_s) y va dejando un contador de bytes.
+    Devuelve los bytes escritos.
+    """
+    hechos = 0
+    if not ACTIVO:
+        for chunk in trozos:
+            if chunk:
+                escribir(chunk)
+                hechos += len(chunk)
+                if progreso:
+                    progreso(hechos, total)
+        return hechos
+
+    red = disco = 0.0
+    it = iter(trozos)
+    t = ultimo = ahora()
+    while True:
+        try:
+            chunk = next(it)
+        except StopIteration:
+            break
+        t1 = ahora()
+        red += t1 - t
+        if chunk:
+            escribir(chunk)
+            hechos += len(chunk)
+            if progreso:
+                progreso(hechos, total)
+        t = ahora()
+        disco += t - t1
+        if t - ultimo >= INTERVALO_CONTADOR:
+            _contador(job, t, hechos)
+            ultimo = t
+    _contador(job, t, hechos)
+    if info is not None:
+        info.update(red_s=round(red, 3), disco_s=round(disco, 3))
+    return hechos
+
+
+def exportar() -> Optional[Path]:
+    """Escribe la traza (formato Trace Event de Chrome) y el .pstats si hubo muestreo."""
+    if not ACTIVO or _destino is None:
+        return None
+    with _lock:
+        eventos = list(_eventos)
+        perfiles = list(_perfiles)
+    _destino.parent.mkdir(parents=True, exist_ok=True)
+    tmp = _destino.with_name(_destino.name + ".part")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": eventos, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+    os.replace(tmp, _destino)
+    if perfiles:
+        stats = pstats.Stats(perfiles[0])
+        for p in perfiles[1:]:
+            stats.add(p)
+        stats.dump_stats(str(_destino.with_suffix(".pstats")))
+    return _destino
+
+
+# --- Resumen de una traza ---
+
+def resumen(path: Path) -> List[str]:
+    """Tiempo total por fase y tiempo de pared del lote (para comparar ejecuciones)."""
+    datos = json.loads(Path(path).read_text(encoding="utf-8"))
+    tramos = [e for e in datos.get("traceEvents", []) if e.get("ph") == "X"]
+    if not tramos:
+        return ["(sin tramos)"]
+    por_fase: Dict[str, List[int]] = {}
+    for e in tramos:
+        por_fase.setdefault(e["name"], []).append(e["dur"])
+    inicio = min(e["ts"] for e in tramos)
+    fin = max(e["ts"] + e["dur"] for e in tramos)
+    lineas = [f"Tiempo de pared: {(fin - inicio) / 1e6:.2f} s"]
+    for nombre, durs in sorted(por_fase.items(), key=lambda kv: -sum(kv[1])):
+        lineas.append(f"  {nombre:15} {len(durs):5}x  total {sum(durs) / 1e6:9.2f} s  "
+                      f"máx {max(durs) / 1e6:8.2f} s")
+    return lineas
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Resumen por fase de una traza de perfilado")
+    parser.add_argument("traza", type=Path)
+    args = parser.parse_args(argv)
+    for linea in resumen(args.traza):
+        print(linea)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Extractor de PKG de PS3 en streaming
+
+`ExtractorPKG` es una salida de ps3_salida (write/close/abortar): recibe los bytes del
+PKG según se descargan, lee la cabecera y la tabla de ficheros cifrada en cuanto
+llegan, descifra la zona de datos con AES-CTR en trozos paralelos y escribe cada
+fichero directamente en el árbol de salida. No hace falta guardar el .pkg.
+
+Formato (PKG "finalizado" de PS3, big-endian):
+- Cabecera 0xC0: magia "\\x7FPKG", revisión (0x8000 retail / 0x0000 debug), tipo,
+  nº de ficheros, tamaño total, offset y tamaño de datos, Content ID, digest e IV.
+- Zona de datos cifrada: tabla de entradas de 0x20 bytes (offset y tamaño del nombre,
+  offset y tamaño de los datos, flags), luego los nombres y luego los ficheros.
+- Retail: AES-128-CTR con la clave de PKG de PS3 y el IV de la cabecera como contador.
+  Debug: flujo de claves SHA-1 a partir del digest de la cabecera.
+
+Requiere pycryptodome (ya lo instala libray) o cryptography.
+
+Uso:
+    python3 ps3_pkg.py info juego.pkg
+    python3 ps3_pkg.py extraer juego.pkg carpeta_destino
+"""
+
+from __future__ import annotations
+import os
+import sys
+import shutil
+import struct
+import hashlib
+import argparse
+from collections import deque
+from pathlib import Path, PurePosixPath
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import BinaryIO, Deque, List, NamedTuple, Optional, Tuple
+
+import ps3_salida
+
+# AES: pycryptodome (dependencia de libray) o, si no, cryptography
+try:
+    from Crypto.Cipher import AES as _AES
+
+    def _aes_ctr(clave: bytes, contador: bytes):
+        return _AES.new(clave, _AES.MODE_CTR, nonce=b"", initial_value=contador).decrypt
+except ImportError:
+    try:
+        from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+        def _aes_ctr(clave: bytes, contador: bytes):
+            return Cipher(algorithms.AES(clave), modes.CTR(contador)).decryptor().update
+    except ImportError:
+        _aes_ctr = None
+
+PKG_MAGIA = b"\x7FPKG"
+PKG_CABECERA = struct.Struct(">4sHHIIIIQQQ48s16s16s")
+PKG_ENTRADA = struct.Struct(">IIQQII")
+REVISION_DEBUG = 0x0000
+TIPO_PS3 = 1
+# Clave pública de los PKG retail de PS3 (la misma que usan todas las herramientas libres)
+CLAVE_PS3 = bytes.fromhex("2E7B71D7C9C9A14EA3221F188828B8F8")
+# Tipo de entrada (byte bajo de flags) que indica carpeta
+TIPO_CARPETA = 0x04
+
+# Trozo de datos que se descifra en cada tarea y tareas en vuelo por hilo
+TAREA = 4 * 1024 * 1024
+VENTANA_POR_HILO = 2
+
+
+class CabeceraPKG(NamedTuple):
+    revision: int
+    tipo: int
+    n_ficheros: int
+    tamano_total: int
+    data_offset: int
+    data_size: int
+    content_id: str
+    digest: bytes
+    iv: bytes
+
+    @property
+    def debug(self) -> bool:
+        return self.revision == REVISION_DEBUG
+
+    @property
+    def title_id(self) -> str:
+        return self.content_id[7:16]
+
+
+class EntradaPKG(NamedTuple):
+    nombre: str
+    offset: int
+    size: int
+    flags: int
+
+    @property
+    def es_carpeta(self) -> bool:
+        return (self.flags & 0xFF) == TIPO_CARPETA
+
+
+def leer_cabecera(datos: bytes) -> CabeceraPKG:
+    if len(datos) < PKG_CABECERA.size:
+        raise ValueError("Cabecera de PKG incompleta")
+    (magia, revision, tipo, _meta_off, _meta_n, _meta_size, n_ficheros, total,
+     data_offset, data_size, content_id, digest, iv) = PKG_CABECERA.unpack_from(datos)
+    if magia != PKG_MAGIA:
+        raise ValueError("No es un PKG de PS3 (magia incorrecta)")
+    if tipo != TIPO_PS3:
+        raise ValueError(f"Solo se admiten PKG de PS3 (tipo {tipo})")
+    return CabeceraPKG(revision, tipo, n_ficheros, total, data_offset, data_size,
+                       content_id.rstrip(b"\0").decode("ascii", "replace"), digest, iv)
+
+
+def _ruta_segura(nombre: str) -> PurePosixPath:
+    """Ruta relativa sin '..' ni raíz (los nombres vienen del propio PKG)."""
+    partes = [p for p in PurePosixPath(nombre.replace("\\", "/")).parts if p not in ("", ".", "..", "/")]
+    if not partes:
+        raise ValueError(f"Nombre de fichero no válido en el PKG: {nombre!r}")
+    return PurePosixPath(*partes)
+
+
+class Descifrador:
+    """Descifra cualquier trozo de la zona de datos a partir de su offset."""
+
+    def __init__(self, cab: CabeceraPKG):
+        self.cab = cab
+        self._iv = int.from_bytes(cab.iv, "big")
+        if not cab.debug and _aes_ctr is None:
+            raise RuntimeError("Falta AES para descifrar PKG. Instala con: pip install pycryptodome")
+
+    def __call__(self, offset: int, datos: bytes) -> bytes:
+        bloque, dentro = divmod(offset, 16)
+        if self.cab.debug:
+            return self._debug(bloque, dentro, datos)
+        contador = ((self._iv + bloque) % (1 << 128)).to_bytes(16, "big")
+        descifrar = _aes_ctr(CLAVE_PS3, contador)
+        if dentro:
+            descifrar(b"\0" * dentro)
+        return descifrar(datos)
+
+    def _debug(self, bloque: int, dentro: int, datos: bytes) -> bytes:
+        d = self.cab.digest
+        base = d[0:8] + d[0:8] + d[8:16] + d[8:16] + b"\0" * 0x18
+        n = (dentro + len(datos) + 15) // 16
+        flujo = b"".join(hashlib.sha1(base + (bloque + i).to_bytes(8, "big")).digest()[:16]
+                         for i in range(n))[dentro:dentro + len(datos)]
+        return (int.from_bytes(datos, "big") ^ int.from_bytes(flujo, "big")).to_bytes(len(datos), "big")
+
+
+class ExtractorPKG(ps3_salida.Salida):
+    """Extrae un PKG según llegan sus bytes.
+
+    Los ficheros se escriben en `<destino>/<Content ID>` (primero en una carpeta
+    `.part` que se renombra al terminar). Si se pasa `sha256` se comprueba el PKG
+    completo al cerrar (p. ej. el del volcado TSV).
+    """
+
+    def __init__(self, destino: Path, hilos: Optional[int] = None, sha256: Optional[str] = None):
+        self.destino = Path(destino)
+        self.destino.mkdir(parents=True, exist_ok=True)
+        self.cabecera: Optional[CabeceraPKG] = None
+        self.entradas: List[EntradaPKG] = []
+        self.carpeta: Optional[Path] = None
+        self.recibidos = 0
+        self._sha256_esperado = (sha256 or "").lower()
+        self._sha256 = hashlib.sha256()
+        self._inicio = bytearray()
+        self._cifrado = bytearray()
+        self._cifrado_offset = 0
+        hilos = hilos or os.cpu_count() or 2
+        self._ventana = hilos * VENTANA_POR_HILO
+        self._pool = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="pkg")
+        self._pendientes: Deque[Tuple[int, Future]] = deque()
+        self._descifrar: Optional[Descifrador] = None
+        # Tabla y nombres: se acumula lo descifrado hasta poder leerlos
+        self._prefijo: Optional[bytearray] = bytearray()
+        self._fin_prefijo = 0
+        # Reparto a ficheros: (inicio, fin, ruta) ordenados por offset
+        self._tramos: List[Tuple[int, int, Path]] = []
+        self._tramo = 0
+        self._f: Optional[BinaryIO] = None
+        self._cerrado = False
+
+    # --- Entrada ---
+
+    def write(self, datos: bytes) -> int:
+        self._sha256.update(datos)
+        pos = self.recibidos
+        self.recibidos += len(datos)
+        if self.cabecera is None:
+            self._inicio += datos
+            if len(self._inicio) < PKG_CABECERA.size:
+                return len(datos)
+            self._iniciar(leer_cabecera(bytes(self._inicio)))
+            datos, pos = bytes(self._inicio), 0
+            self._inicio = bytearray()
+        cab = self.cabecera
+        # Solo interesa la zona de datos (se ignoran metadatos y la firma final)
+        ini = max(pos, cab.data_offset)
+        fin = min(pos + len(datos), cab.data_offset + cab.data_size)
+        if ini < fin:
+            self._cifrado += datos[ini - pos:fin - pos]
+            while len(self._cifrado) >= TAREA:
+                self._enviar(bytes(self._cifrado[:TAREA]))
+                del self._cifrado[:TAREA]
+        return len(datos)
+
+    def _iniciar(self, cab: CabeceraPKG) -> None:
+        self.cabecera = cab
+        self._descifrar = Descifrador(cab)
+        self.carpeta = self.destino / (cab.content_id or "pkg")
+        self._tmp = self.carpeta.with_name(self.carpeta.name + ".part")
+        if self._tmp.exists():
+            shutil.rmtree(self._tmp)
+        self._tmp.mkdir(parents=True)
+        self._fin_prefijo = cab.n_ficheros * PKG_ENTRADA.size
+
+    def _enviar(self, datos: bytes) -> None:
+        while len(self._pendientes) >= self._ventana:
+            self._procesar(*self._recoger())
+        offset = self._cifrado_offset
+        self._cifrado_offset += len(datos)
+        self._pendientes.append((offset, self._pool.submit(self._descifrar, offset, datos)))
+
+    def _recoger(self) -> Tuple[int, bytes]:
+        offset, fut = self._pendientes.popleft()
+        return offset, fut.result()
+
+    # --- Tabla de ficheros ---
+
+    def _procesar(self, offset: int, plano: bytes) -> None:
+        if self._prefijo is not None:
+            self._prefijo += plano
+            if len(self._prefijo) < self._fin_prefijo:
+                return
+            if not self.entradas:
+                self._leer_tabla(bytes(self._prefijo))
+                if len(self._prefijo) < self._fin_prefijo:
+                    return
+            self._leer_nombres(bytes(self._prefijo))
+            # Lo acumulado puede incluir ya datos de ficheros
+            offset, plano = 0, bytes(self._prefijo)
+            self._prefijo = None
+        self._repartir(offset, plano)
+
+    def _leer_tabla(self, datos: bytes) -> None:
+        crudas = [PKG_ENTRADA.unpack_from(datos, i * PKG_ENTRADA.size)
+                  for i in range(self.cabecera.n_ficheros)]
+        self._crudas = crudas
+        self._fin_prefijo = max([self._fin_prefijo] + [n_off + n_size for n_off, n_size, *_ in crudas])
+        self.entradas = [EntradaPKG("", d_off, d_size, flags)
+                         for _n_off, _n_size, d_off, d_size, flags, _ in crudas]
+
+    def _leer_nombres(self, datos: bytes) -> None:
+        entradas = []
+        for (n_off, n_size, d_off, d_size, flags, _), e in zip(self._crudas, self.entradas):
+            nombre = datos[n_off:n_off + n_size].rstrip(b"\0").decode("utf-8", "replace")
+            entradas.append(e._replace(nombre=nombre))
+        self.entradas = entradas
+        for e in entradas:
+            ruta = self._tmp / _ruta_segura(e.nombre)
+            if e.es_carpeta:
+                ruta.mkdir(parents=True, exist_ok=True)
+                continue
+            if e.offset + e.size > self.cabecera.data_size:
+                raise ValueError(f"{e.nombre}: fuera de la zona de datos del PKG")
+            ruta.parent.mkdir(parents=True, exist_ok=True)
+            if e.size == 0:
+                ruta.touch()
+            else:
+                self._tramos.append((e.offset, e.offset + e.size, ruta))
+        self._tramos.sort()
+        for (_, fin, _), (ini, _, _) in zip(self._tramos, self._tramos[1:]):
+            if ini < fin:
+                raise ValueError("El PKG tiene ficheros solapados; no se puede extraer en streaming")
+
+    # --- Escritura de ficheros ---
+
+    def _repartir(self, base: int, plano: bytes) -> None:
+        """Escribe en cada fichero la parte del trozo descifrado (que empieza en `base`) que le toca."""
+        offset, fin_trozo = base, base + len(plano)
+        while self._tramo < len(self._tramos) and offset < fin_trozo:
+            ini, fin, ruta = self._tramos[self._tramo]
+            if fin_trozo <= ini:
+                return
+            offset = max(offset, ini)
+            if self._f is None:
+                self._f = open(ruta, "wb")
+            hasta = min(fin, fin_trozo)
+            self._f.write(plano[offset - base:hasta - base])
+            offset = hasta
+            if hasta == fin:
+                self._f.close()
+                self._f = None
+                self._tramo += 1
+
+    # --- Cierre ---
+
+    def close(self) -> None:
+        if self._cerrado:
+            return
+        try:
+            if self.cabecera is None:
+                raise ValueError("PKG vacío o sin cabecera")
+            if self._cifrado:
+                self._enviar(bytes(self._cifrado))
+                self._cifrado.clear()
+            while self._pendientes:
+                self._procesar(*self._recoger())
+            if self.recibidos != self.cabecera.tamano_total:
+                raise ValueError(f"PKG incompleto: {self.recibidos} de {self.cabecera.tamano_total} bytes")
+            if self._prefijo is not None or self._tramo < len(self._tramos):
+                raise ValueError("PKG incompleto: faltan ficheros por extraer")
+            if self._sha256_esperado and self._sha256.hexdigest() != self._sha256_esperado:
+                raise ValueError("El SHA-256 del PKG no coincide con el esperado")
+        except BaseException:
+            self.abortar()
+            raise
+        self._cerrado = True
+        self._pool.shutdown()
+        if self.carpeta.exists():
+            shutil.rmtree(self.carpeta)
+        os.replace(self._tmp, self.carpeta)
+
+    def abortar(self) -> None:
+        self._cerrado = True
+        for _, fut in self._pendientes:
+            fut.cancel()
+        self._pendientes.clear()
+        self._pool.shutdown(wait=True)
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+        if self.cabecera is not None and self._tmp.exists():
+            shutil.rmtree(self._tmp, ignore_errors=True)
+
+
+class SalidaDoble(ps3_salida.Salida):
+    """Reparte los mismos bytes a dos salidas (guardar el .pkg y extraerlo a la vez)."""
+
+    def __init__(self, principal: ps3_salida.Salida, secundaria: ps3_salida.Salida):
+        self.principal = principal
+        self.secundaria = secundaria
+        self.destino = principal.destino
+
+    def write(self, datos: bytes) -> int:
+        self.principal.write(datos)
+        self.secundaria.write(datos)
+        return len(datos)
+
+    def close(self) -> None:
+        try:
+            self.secundaria.close()
+        except BaseException:
+            self.principal.abortar()
+            raise
+        self.principal.close()
+
+    def abortar(self) -> None:
+        self.secundaria.abortar()
+        self.principal.abortar()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Información y extracción de PKG de PS3")
+    sub = parser.add_subparsers(dest="orden", required=True)
+    p = sub.add_parser("info", help="Muestra la cabecera y la lista de ficheros")
+    p.add_argument("pkg", type=Path)
+    p = sub.add_parser("extraer", help="Extrae el PKG en <destino>/<Content ID>")
+    p.add_argument("pkg", type=Path)
+    p.add_argument("destino", type=Path)
+    p.add_argument("--hilos", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    try:
+        if args.orden == "info":
+            with open(args.pkg, "rb") as f:
+                cab = leer_cabecera(f.read(PKG_CABECERA.size))
+                f.seek(cab.data_offset)
+                descifrar = Descifrador(cab)
+                tabla = descifrar(0, f.read(cab.n_ficheros * PKG_ENTRADA.size))
+                crudas = [PKG_ENTRADA.unpack_from(tabla, i * PKG_ENTRADA.size) for i in range(cab.n_ficheros)]
+                fin_nombres = max([len(tabla)] + [o + n for o, n, *_ in crudas])
+                f.seek(cab.data_offset)
+                datos = descifrar(0, f.read(fin_nombres))
+            print(f"Content ID: {cab.content_id}  ({'debug' if cab.debug else 'retail'}, "
+                  f"{cab.n_ficheros} entradas, {cab.tamano_total} bytes)")
+            for o, n, d_off, d_size, flags, _ in crudas:
+                nombre = datos[o:o + n].rstrip(b"\0").decode("utf-8", "replace")
+                marca = "/" if (flags & 0xFF) == TIPO_CARPETA else ""
+                print(f"  {d_size:>12}  {nombre}{marca}")
+        else:
+            with ExtractorPKG(args.destino, hilos=args.hilos) as extractor:
+                ps3_salida.copiar(args.pkg, extractor)
+            print(f"✅ Extraído en {extractor.carpeta}")
+    except (OSError, ValueError, RuntimeError) as e:
+        print(f"[ERROR] {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Planificador de cola según el espacio en disco
+
+Antes de empezar un lote calcula, con los tamaños conocidos (metadatos de archive.org
+o cabeceras HEAD) y el espacio libre de la carpeta temporal y la final, si el lote
+cabe entero y en qué orden conviene hacerlo. Durante la ejecución, `PresupuestoDisco`
+frena las descargas para que el pico de uso (ISO cifrada + ISO desencriptada) nunca
+supere el espacio disponible.
+
+Modelo de cada trabajo de tamaño S:
+- La descarga ocupa S en la carpeta temporal.
+- libray escribe S en la carpeta final; al terminar bien se borra la ISO temporal.
+- Si libray falla, la ISO temporal se conserva y la salida parcial no cuenta.
+Si ambas carpetas están en el mismo sistema de ficheros comparten presupuesto.
+"""
+
+from __future__ import annotations
+import os
+import shutil
+import time
+import threading
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+# Espacio que se deja siempre libre en cada sistema de ficheros
+MARGEN = 1024 ** 3
+# Cada cuánto mira una reserva en espera si la han cancelado
+ESPERA_ABANDONO = 0.5
+
+
+class Trabajo(NamedTuple):
+    nombre: str
+    size: int
+
+
+def _existente(path: Path) -> Path:
+    """Primer ancestro que existe (la carpeta destino puede no estar creada aún)."""
+    path = Path(path).expanduser().resolve()
+    while not path.exists() and path != path.parent:
+        path = path.parent
+    return path
+
+
+def espacio_libre(path: Path) -> int:
+    return shutil.disk_usage(_existente(path)).free
+
+
+def id_fs(path: Path) -> int:
+    return os.stat(_existente(path)).st_dev
+
+
+def formato_bytes(n: int) -> str:
+    for unidad in ("B", "KB", "MB", "GB"):
+        if abs(n) < 1024:
+            return f"{n:.1f} {unidad}" if unidad != "B" else f"{n} B"
+        n /= 1024
+    return f"{n:.1f} TB"
+
+
+class Plan(NamedTuple):
+    orden: List[Trabajo]
+    omitidos: List[Trabajo]
+    desconocidos: List[str]
+    mismo_fs: bool
+    libre_temp: int
+    libre_final: int
+    pico_temp: int
+    pico_final: int
+
+    @property
+    def factible(self) -> bool:
+        return not self.omitidos
+
+    def resumen(self) -> str:
+        lineas = []
+        total = sum(t.size for t in self.orden)
+        if self.mismo_fs:
+            lineas.append(f"Temporal y final en el mismo disco: libre {formato_bytes(self.libre_temp)}, "
+                          f"pico previsto {formato_bytes(self.pico_temp)}")
+        else:
+            lineas.append(f"Temporal: libre {formato_bytes(self.libre_temp)}, "
+                          f"pico previsto {formato_bytes(self.pico_temp)}")
+            lineas.append(f"Final:    libre {formato_bytes(self.libre_final)}, "
+                          f"pico previsto {formato_bytes(self.pico_final)}")
+        lineas.append(f"{len(self.orden)} archivo(s) planificados ({formato_bytes(total)})")
+        if self.desconocidos:
+            lineas.append(f"⚠️ Tamaño desconocido (no se pueden planificar): {', '.join(self.desconocidos)}")
+        if self.omitidos:
+            lineas.append("❌ No caben y se omitirán: " +
+                          ", ".join(f"{t.nombre} ({formato_bytes(t.size)})" for t in self.omitidos))
+        else:
+            lineas.append("✅ El lote completo cabe en disco")
+        return "\n".join(lineas)
+
+
+def planificar(trabajos: List[Trabajo], temp_dir: Path, final_dir: Path,
+               margen: int = MARGEN) -> Plan:
+    """Ordena los trabajos y descarta los que no caben.
+
+    Se procesan de mayor a menor: el pico de cada trabajo es lo ya acumulado en la
+    carpeta final más 2×S (mismo disco) o S en la temporal, así que poner los
+    grandes primero minimiza el pico global.
+    """
+    mismo_fs = id_fs(temp_dir) == id_fs(final_dir)
+    libre_temp = max(0, espacio_libre(temp_dir) - margen)
+    libre_final = libre_temp if mismo_fs else max(0, espacio_libre(final_dir) - margen)
+
+    conocidos = sorted((t for t in trabajos if t.size > 0), key=lambda t: t.size, reverse=True)
+    desconocidos = [t.nombre for t in trabajos if t.size <= 0]
+
+    orden: List[Trabajo] = []
+    omitidos: List[Trabajo] = []
+    acumulado = pico_temp = pico_final = 0
+    for t in conocidos:
+        if mismo_fs:
+            pico = acumulado + 2 * t.size
+            if pico > libre_temp:
+                omitidos.append(t)
+                continue
+            pico_temp = pico_final = max(pico_temp, pico)
+        else:
+            if t.size > libre_temp or acumulado + t.size > libre_final:
+                omitidos.append(t)
+                continue
+            pico_temp = max(pico_temp, t.size)
+            pico_final = acumulado + t.size
+        acumulado += t.size
+        orden.append(t)
+    # Los de tamaño desconocido van al final, sin garantías
+    orden.extend(Trabajo(n, 0) for n in desconocidos)
+    return Plan(orden, omitidos, desconocidos, mismo_fs, libre_temp, libre_final, pico_temp, pico_final)
+
+
+class PresupuestoDisco:
+    """Reservas de espacio para ejecutar el plan con descargas y libray solapados.
+
+    Cada trabajo reserva su pico completo (S temporal + S final) antes de descargar;
+    así solo espera quien va a descargar y nunca hay interbloqueo con libray.
+    """
+
+    def __init__(self, temp_dir: Path, final_dir: Path, margen: int = MARGEN):
+        self._cond = threading.Condition()
+        self._temp = id_fs(temp_dir)
+        self._final = id_fs(final_dir)
+        self._disponible: Dict[int, int] = {}
+        for path, dev in ((temp_dir, self._temp), (final_dir, self._final)):
+            self._disponible.setdefault(dev, max(0, espacio_libre(path) - margen))
+        self._reservado: Dict[int, int] = {dev: 0 for dev in self._disponible}
+        self._permanente: Dict[int, int] = {dev: 0 for dev in self._disponible}
+
+    def _necesario(self, size: int) -> Dict[int, int]:
+        nec = {dev: 0 for dev in self._disponible}
+        nec[self._temp] += size
+        nec[self._final] += size
+        return nec
+
+    def reservar(self, size: int, timeout: Optional[float] = None,
+                 abandonar: Optional[threading.Event] = None) -> bool:
+        """Bloquea hasta poder reservar el pico del trabajo. False si nunca va a caber,
+        si pasan `timeout` segundos o si se activa `abandonar` mientras espera."""
+        nec = self._necesario(size)
+        fin = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                if abandonar is not None and abandonar.is_set():
+                    return False
+                if any(nec[d] > self._disponible[d] - self._permanente[d] for d in nec):
+                    return False
+                if all(self._reservado[d] + self._permanente[d] + nec[d] <= self._disponible[d]
+                       for d in nec):
+                    for d in nec:
+                        self._reservado[d] += nec[d]
+                    return True
+                espera = None if fin is None else fin - time.monotonic()
+                if espera is not None and espera <= 0:
+                    return False
+                if abandonar is not None:
+                    espera = ESPERA_ABANDONO if espera is None else min(espera, ESPERA_ABANDONO)
+                self._cond.wait(espera)
+
+    def cancelar(self, size: int) -> None:
+        """La descarga falló y no queda nada en disco: se libera todo."""
+        with self._cond:
+            for d, n in self._necesario(size).items():
+                self._reservado[d] -= n
+            self._cond.notify_all()
+
+    def confirmar(self, size: int, ok: bool) -> None:
+        """libray terminó: si fue bien queda la salida; si no, queda la ISO temporal."""
+        with self._cond:
+            self._reservado[self._temp] -= size
+            self._reservado[self._final] -= size
+            self._permanente[self._final if ok else self._temp] += size
+            self._cond.notify_all()
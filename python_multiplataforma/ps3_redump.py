@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Comprobación de las ISO desencriptadas contra los DAT de redump
+
+Los DAT (XML de redump, sueltos o dentro del .zip tal como se descargan) se leen una
+sola vez y se guarda en `~/.iaPS3/redump_indice.json` un índice con una clave por
+tamaño y huella ("<tamaño>:<sha1>", "<tamaño>:<md5>", "<tamaño>:<crc32>"). El índice
+se rehace solo cuando cambia algún DAT.
+
+procesar_archivo_con_libray calcula CRC32/MD5/SHA-1 mientras escribe la ISO
+(ps3_salida.SalidaHuellas) y consulta aquí el veredicto de cada trabajo:
+
+- verificado:  tamaño y huellas coinciden con una entrada del DAT
+- no_coincide: el juego está en el DAT (mismo nombre, o mismo tamaño y CRC/MD5)
+               pero la imagen es distinta
+- desconocido: no aparece en ningún DAT
+
+Los DAT se buscan en `~/.iaPS3/redump/` o en PS3_REDUMP_DAT (ficheros o carpetas
+separados por ":" o ";" en Windows). Sin DAT no se calcula nada.
+
+Uso:
+    python3 ps3_redump.py indexar                       # (re)lee los DAT
+    python3 ps3_redump.py comprobar "Juego (Europe).decrypted.iso"
+    python3 ps3_log.py --fase redump                    # veredictos de cada trabajo
+"""
+
+from __future__ import annotations
+import os
+import io
+import sys
+import json
+import zipfile
+import argparse
+import threading
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+IA_PS3_DIR = Path.home() / ".iaPS3"
+REDUMP_DIR = IA_PS3_DIR / "redump"
+INDICE_FILE = IA_PS3_DIR / "redump_indice.json"
+VERSION = 1
+EXTENSIONES = (".dat", ".xml")
+
+
+class Rom(NamedTuple):
+    juego: str
+    nombre: str
+    tamano: int
+    crc32: str
+    md5: str
+    sha1: str
+
+
+class Veredicto(NamedTuple):
+    estado: str  # verificado | no_coincide | desconocido
+    rom: Optional[Rom]
+
+    @property
+    def juego(self) -> str:
+        return self.rom.juego if self.rom else ""
+
+
+def rutas_dat() -> List[Path]:
+    """Ficheros DAT configurados (los .zip de redump se leen por dentro)."""
+    conf = os.environ.get("PS3_REDUMP_DAT", "")
+    origenes = [Path(p).expanduser() for p in conf.split(os.pathsep) if p] if conf else [REDUMP_DIR]
+    rutas = []
+    for origen in origenes:
+        if origen.is_dir():
+            rutas.extend(p for p in sorted(origen.rglob("*"))
+                         if p.is_file() and p.suffix.lower() in EXTENSIONES + (".zip",))
+        elif origen.is_file():
+            rutas.append(origen)
+    return rutas
+
+
+def _firma(rutas: List[Path]) -> List[List]:
+    firma = []
+    for p in rutas:
+        st = p.stat()
+        firma.append([str(p), st.st_size, st.st_mtime_ns])
+    return firma
+
+
+def _xml_de(ruta: Path) -> Iterator[io.BufferedIOBase]:
+    if ruta.suffix.lower() == ".zip":
+        with zipfile.ZipFile(ruta) as z:
+            for nombre in z.namelist():
+                if nombre.lower().endswith(EXTENSIONES):
+                    with z.open(nombre) as f:
+                        yield f
+    else:
+        with open(ruta, "rb") as f:
+            yield f
+
+
+def leer_dat(ruta: Path) -> Iterator[Rom]:
+    """Entradas <rom> de un DAT de redump (formato Logiqx), juego a juego."""
+    for f in _xml_de(ruta):
+        for _, elem in ET.iterparse(f, events=("end",)):
+            if elem.tag not in ("game", "machine"):
+                continue
+            juego = elem.get("name", "")
+            for rom in elem.iter("rom"):
+                if rom.get("size", "").isdigit():
+                    yield Rom(juego, rom.get("name", ""), int(rom.get("size")),
+                              rom.get("crc", "").lower(), rom.get("md5", "").lower(),
+                              rom.get("sha1", "").lower())
+            elem.clear()
+
+
+def normalizar_nombre(nombre: str) -> str:
+    """"Juego (Europe).decrypted.iso" -> "juego (europe)"."""
+    nombre = Path(nombre).name
+    for sufijo in (".cso", ".iso", ".decrypted", ".zip", ".7z"):
+        if nombre.lower().endswith(sufijo):
+            nombre = nombre[:-len(sufijo)]
+    return nombre.strip().lower()
+
+
+class IndiceRedump:
+    def __init__(self, roms: List[Rom], firma: List[List]):
+        self.roms = roms
+        self.firma = firma
+        self._claves: Dict[str, int] = {}
+        self._nombres: Dict[str, List[int]] = {}
+        for i, r in enumerate(roms):
+            for huella in (r.sha1, r.md5, r.crc32):
+                if huella:
+                    self._claves.setdefault(f"{r.tamano}:{huella}", i)
+            for nombre in {normalizar_nombre(r.juego), normalizar_nombre(r.nombre)}:
+                self._nombres.setdefault(nombre, []).append(i)
+
+    @classmethod
+    def construir(cls, rutas: Optional[List[Path]] = None) -> "IndiceRedump":
+        rutas = rutas_dat() if rutas is None else rutas
+        roms: List[Rom] = []
+        for ruta in rutas:
+            roms.extend(leer_dat(ruta))
+        return cls(roms, _firma(rutas))
+
+    @classmethod
+    def cargar(cls, path: Path = INDICE_FILE) -> "IndiceRedump":
+        """Índice guardado si los DAT no han cambiado; si no, se rehace y se guarda."""
+        rutas = rutas_dat()
+        try:
+            datos = json.loads(path.read_text(encoding="utf-8"))
+            if datos.get("version") == VERSION and datos.get("firma") == _firma(rutas):
+                return cls([Rom(*r) for r in datos["roms"]], datos["firma"])
+        except (OSError, ValueError, TypeError, KeyError):
+            pass
+        indice = cls.construir(rutas)
+        indice.guardar(path)
+        return indice
+
+    def guardar(self, path: Path = INDICE_FILE) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps({"version": VERSION, "firma": self.firma,
+                                   "roms": [list(r) for r in self.roms]},
+                                  ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+        os.replace(tmp, path)
+
+    def buscar(self, tamano: int, huella: str) -> Optional[Rom]:
+        i = self._claves.get(f"{tamano}:{huella.lower()}")
+        return self.roms[i] if i is not None else None
+
+    def por_nombre(self, nombre: str) -> List[Rom]:
+        return [self.roms[i] for i in self._nombres.get(normalizar_nombre(nombre), [])]
+
+    def veredicto(self, tamano: int, crc32: str, md5: str, sha1: str,
+                  nombre: Optional[str] = None) -> Veredicto:
+        rom = self.buscar(tamano, sha1)
+        if rom is not None:
+            iguales = rom.crc32 in ("", crc32) and rom.md5 in ("", md5)
+            return Veredicto("verificado" if iguales else "no_coincide", rom)
+        # Mismo tamaño y CRC o MD5 pero otro SHA-1, o un juego con ese nombre: imagen distinta
+        rom = self.buscar(tamano, md5) or self.buscar(tamano, crc32)
+        if rom is None and nombre:
+            rom = next(iter(self.por_nombre(nombre)), None)
+        return Veredicto("no_coincide" if rom else "desconocido", rom)
+
+
+_indice_lock = threading.Lock()
+_indice_global: Optional[IndiceRedump] = None
+_precarga: Optional[threading.Thread] = None
+
+
+def activo() -> bool:
+    """Hay algún DAT configurado (si no, no merece la pena calcular huellas)."""
+    return bool(rutas_dat())
+
+
+def obtener_indice(recargar: bool = False) -> IndiceRedump:
+    """Índice compartido por todo el proceso (se lee una vez)."""
+    global _indice_global
+    with _indice_lock:
+        if _indice_global is None or recargar:
+            _indice_global = IndiceRedump.cargar()
+        return _indice_global
+
+
+def precargar() -> None:
+    """Carga el índice en segundo plano (p. ej. mientras libray desencripta)."""
+    global _precarga
+    with _indice_lock:
+        if _indice_global is not None or (_precarga is not None and _precarga.is_alive()):
+            return
+        _precarga = threading.Thread(target=obtener_indice, name="redump", daemon=True)
+        _precarga.start()
+
+
+def comprobar(huellas, nombre: Optional[str] = None) -> Veredicto:
+    """Veredicto de unas ps3_salida.Huellas."""
+    return obtener_indice().veredicto(huellas.tamano, huellas.crc32, huellas.md5, huellas.sha1, nombre)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Comprobación de ISO contra los DAT de redump")
+    sub = parser.add_subparsers(dest="orden", required=True)
+    sub.add_parser("indexar", help="Lee los DAT y guarda el índice")
+    p = sub.add_parser("comprobar", help="Calcula las huellas de una ISO ya escrita y la busca")
+    p.add_argument("iso", type=Path, nargs="+")
+    args = parser.parse_args(argv)
+
+    rutas = rutas_dat()
+    if not rutas:
+        print(f"[ERROR] No hay DAT de redump en {REDUMP_DIR} (o en PS3_REDUMP_DAT)")
+        return 1
+    if args.orden == "indexar":
+        indice = IndiceRedump.construir(rutas)
+        indice.guardar()
+        print(f"📀 {len(indice.roms)} entradas de {len(rutas)} DAT ({INDICE_FILE})")
+        return 0
+
+    import ps3_salida
+    indice = obtener_indice()
+    fallos = 0
+    for iso in args.iso:
+        h = ps3_salida.huellas_fichero(iso)
+        v = indice.veredicto(h.tamano, h.crc32, h.md5, h.sha1, iso.name)
+        fallos += v.estado != "verificado"
+        print(f"{'✅' if v.estado == 'verificado' else '❌' if v.estado == 'no_coincide' else '❔'} "
+              f"{iso.name}: {v.estado} {v.juego}".rstrip())
+    return 1 if fallos else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,609 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Reparto de descargas y libray entre varios equipos (coordinador / trabajadores)
+
+Un coordinador guarda la lista de trabajos y los presta (arriendo) a trabajadores que
+corren en otros equipos. Cada trabajador ejecuta la descarga (descargar_archivo /
+descargar_pkg) y libray con su propio motor (ps3_demonio.Motor), y cada LATIDO segundos
+informa al coordinador del progreso, lo que además renueva sus arriendos. Si un
+trabajador deja de dar señales, sus arriendos caducan y los trabajos vuelven a la cola
+para otro; un trabajo que se pierde MAX_INTENTOS veces se da por fallido. Un trabajador
+que pierde un arriendo (caducado o cancelado) abandona ese trabajo.
+
+Las carpetas las pone cada trabajador: los trabajos solo dicen qué descargar.
+
+API del coordinador (HTTP + JSON, cabecera X-PS3-Clave si se arranca con --clave, que es
+obligatoria para escuchar fuera de 127.0.0.1):
+    GET    /estado                      trabajos por estado y último latido de cada trabajador
+    GET    /trabajos                    lista de trabajos
+    POST   /trabajos                    {"tipo": "pkg", "url"} / {"tipo": "ia", "item", "fichero"} o {"trabajos": [...]}
+    PATCH  /trabajos/<id>               {"prioridad": 10}
+    DELETE /trabajos/<id>               cancela
+    POST   /registrar                   {"trabajador"}: devuelve a la cola lo que tuviera (se reinició)
+    POST   /arrendar                    {"trabajador", "max", "espera"}: trabajos prestados (espera hasta "espera" s)
+    POST   /latido                      {"trabajador", "arriendos": [{"id", "arriendo", "estado", ...}]}
+                                        -> {"cancelar": [ids que ya no son suyos]}
+
+Uso (varios trabajadores en el mismo equipo también valen, con carpetas distintas):
+    python3 ps3_reparto.py --clave SECRETO coordinador --host 0.0.0.0
+    python3 ps3_reparto.py --coordinador http://nas:8120 --clave SECRETO trabajador --dest /tmp/ps3 --final ~/ISO --destino ~/PS3
+    python3 ps3_reparto.py ia sony_playstation3_xxx "*.zip"
+    python3 ps3_reparto.py pkg http://zeus.dl.playstation.net/...pkg
+    python3 ps3_reparto.py lista
+"""
+
+from __future__ import annotations
+import os
+import sys
+import json
+import time
+import hmac
+import heapq
+import socket
+import fnmatch
+import argparse
+import itertools
+import threading
+from pathlib import Path
+from urllib.parse import urlsplit
+from typing import Dict, List, Optional
+
+import requests
+
+from ps3_demonio import ESTADOS_FINALES, LOCALES, TIPOS, Cliente, Trabajo, _linea
+
+PUERTO = int(os.environ.get("PS3_COORDINADOR_PUERTO", "8120"))
+COORDINADOR = os.environ.get("PS3_COORDINADOR", f"http://127.0.0.1:{PUERTO}")
+CLAVE = os.environ.get("PS3_REPARTO_CLAVE", "")
+# Un arriendo sin latido durante ARRIENDO segundos se da por perdido
+ARRIENDO = int(os.environ.get("PS3_ARRIENDO", "60"))
+LATIDO = 10
+# Espera máxima de /arrendar cuando no hay trabajos (long polling)
+ESPERA_ARRIENDO = 20
+MAX_INTENTOS = 3
+# Estados del motor del trabajador que ocupan un hueco de descarga
+ESTADOS_DESCARGA = ("en_cola", "esperando_espacio", "descargando")
+# Estados del motor del trabajador que el coordinador refleja tal cual; el resto (en su
+# cola, esperando espacio o libray) sigue siendo "asignado": nunca vuelve a "en_cola" aquí
+ESTADOS_TRABAJANDO = ("descargando", "libray")
+
+
+class Tarea(Trabajo):
+    """Trabajo del coordinador: además sabe a quién está prestado y hasta cuándo."""
+
+    def __init__(self, id: int, tipo: str, datos: Dict, prioridad: int = 0):
+        super().__init__(id, tipo, datos, prioridad)
+        self.trabajador = ""
+        self.arriendo = 0
+        self.expira = 0.0
+        self.intentos = 0
+
+    def a_dict(self) -> Dict:
+        d = super().a_dict()
+        d.update(trabajador=self.trabajador, arriendo=self.arriendo, intentos=self.intentos)
+        return d
+
+
+def validar_tarea(datos: Dict) -> Dict:
+    """Como ps3_demonio.validar, pero sin carpetas (las decide cada trabajador)."""
+    tipo = datos.get("tipo")
+    if tipo not in TIPOS:
+        raise ValueError(f"tipo debe ser uno de {', '.join(TIPOS)}")
+    if tipo == "pkg":
+        if not str(datos.get("url", "")).startswith(("http://", "https://")):
+            raise ValueError("falta url")
+        return {"url": datos["url"], "tam_parte": int(datos.get("tam_parte") or 0),
+                "extraer": bool(datos.get("extraer")),
+                "conservar_pkg": bool(datos.get("conservar_pkg", True))}
+    for campo in ("item", "fichero"):
+        if not datos.get(campo):
+            raise ValueError(f"falta {campo}")
+    return {"item": datos["item"], "fichero": datos["fichero"],
+            "formato": datos.get("formato") or None, "tam_parte": datos.get("tam_parte")}
+
+
+# --- Coordinador ---
+
+class Coordinador:
+    def __init__(self, arriendo: int = ARRIENDO, max_intentos: int = MAX_INTENTOS):
+        self.arriendo = arriendo
+        self.max_intentos = max_intentos
+        self._cond = threading.Condition()
+        self._cola: List = []
+        self._secuencia = 0
+        self._empujes = itertools.count()
+        self._arriendos = itertools.count(1)
+        self._tareas: Dict[int, Tarea] = {}
+        self.trabajadores: Dict[str, float] = {}
+        threading.Thread(target=self._vigilar, name="vigilante", daemon=True).start()
+
+    def _encolar(self, t: Tarea) -> None:
+        t.estado = "en_cola"
+        t.trabajador, t.arriendo, t.expira = "", 0, 0.0
+        heapq.heappush(self._cola, (-t.prioridad, t.id, next(self._empujes), t))
+        self._cond.notify_all()
+
+    def _devolver(self, t: Tarea, motivo: str, contar: bool = True) -> None:
+        """Trabajo cuyo arriendo se perdió: a la cola otra vez, o fallido si ya van muchas."""
+        quien = t.trabajador
+        if contar:
+            t.intentos += 1
+        if t.intentos >= self.max_intentos:
+            t.estado, t.mensaje = "error", f"{motivo} ({t.intentos} intentos)"
+            print(f"❌ [{t.id}] {t.nombre}: {t.mensaje}")
+            return
+        t.mensaje = motivo
+        self._encolar(t)
+        print(f"⚠️  [{t.id}] {t.nombre}: {motivo} ({quien}), vuelve a la cola")
+
+    def _vigilar(self) -> None:
+        while True:
+            time.sleep(min(5, max(1, self.arriendo // 4)))
+            ahora = time.monotonic()
+            with self._cond:
+                for t in self._tareas.values():
+                    if t.trabajador and t.estado not in ESTADOS_FINALES and t.expira < ahora:
+                        self._devolver(t, "arriendo caducado")
+
+    def enviar(self, datos: Dict) -> Tarea:
+        limpio = validar_tarea(datos)
+        with self._cond:
+            self._secuencia += 1
+            t = Tarea(self._secuencia, datos["tipo"], limpio, int(datos.get("prioridad") or 0))
+            self._tareas[t.id] = t
+            self._encolar(t)
+        return t
+
+    def tareas(self) -> List[Tarea]:
+        with self._cond:
+            return list(self._tareas.values())
+
+    def tarea(self, id: int) -> Optional[Tarea]:
+        return self._tareas.get(id)
+
+    def priorizar(self, id: int, prioridad: int) -> Tarea:
+        with self._cond:
+            t = self._tareas[id]
+            t.prioridad = prioridad
+            if t.estado == "en_cola":
+                heapq.heappush(self._cola, (-prioridad, t.id, next(self._empujes), t))
+        return t
+
+    def cancelar(self, id: int) -> Tarea:
+        """Cancela en el acto; si estaba prestado, el trabajador lo abandona en su próximo latido."""
+        with self._cond:
+            t = self._tareas[id]
+            if t.estado not in ESTADOS_FINALES:
+                t.estado, t.mensaje = "cancelado", ""
+            return t
+
+    def devolver(self, tareas: List[Tarea], motivo: str) -> None:
+        """Arriendos que el trabajador no llegó a recibir: a la cola sin contar intento."""
+        with self._cond:
+            for t in tareas:
+                if t.estado == "asignado":
+                    self._devolver(t, motivo, contar=False)
+
+    def registrar(self, trabajador: str) -> int:
+        """Un trabajador que arranca no tiene nada en marcha: lo que tuviera vuelve a la cola."""
+        with self._cond:
+            self.trabajadores[trabajador] = time.time()
+            suyas = [t for t in self._tareas.values()
+                     if t.trabajador == trabajador and t.estado not in ESTADOS_FINALES]
+            for t in suyas:
+                self._devolver(t, "trabajador reiniciado", contar=False)
+            return len(suyas)
+
+    def arrendar(self, trabajador: str, maximo: int, espera: float = 0) -> List[Tarea]:
+        fin = time.monotonic() + max(0.0, espera)
+        with self._cond:
+            while True:
+                self.trabajadores[trabajador] = time.time()
+                dadas = []
+                while self._cola and len(dadas) < maximo:
+                    prioridad, _, _, t = heapq.heappop(self._cola)
+                    if t.estado == "en_cola" and -prioridad == t.prioridad:
+                        t.estado, t.mensaje = "asignado", ""
+                        t.trabajador, t.arriendo = trabajador, next(self._arriendos)
+                        t.expira = time.monotonic() + self.arriendo
+                        t.hechos = t.total = 0
+                        dadas.append(t)
+                restante = fin - time.monotonic()
+                if dadas or restante <= 0:
+                    return dadas
+                self._cond.wait(restante)
+
+    def latido(self, trabajador: str, informes: List[Dict]) -> Dict:
+        """Progreso de los arriendos de un trabajador; renueva los que siguen siendo suyos."""
+        cancelar = []
+        with self._cond:
+            self.trabajadores[trabajador] = time.time()
+            for inf in informes:
+                t = self._tareas.get(inf.get("id"))
+                if (t is None or t.trabajador != trabajador or t.arriendo != inf.get("arriendo")
+                        or t.estado in ESTADOS_FINALES):
+                    # Caducado y prestado a otro, o cancelado: que lo abandone
+                    cancelar.append(inf.get("id"))
+                    continue
+                estado = inf.get("estado", "")
+                if estado == "devuelto":
+                    self._devolver(t, "devuelto por el trabajador", contar=False)
+                    continue
+                t.estado = estado if estado in ESTADOS_TRABAJANDO + ESTADOS_FINALES else "asignado"
+                t.hechos, t.total = int(inf.get("hechos") or 0), int(inf.get("total") or 0)
+                t.mensaje = inf.get("mensaje", "")
+                t.actualizado = time.time()
+                t.expira = time.monotonic() + self.arriendo
+                if estado in ESTADOS_FINALES:
+                    print(f"{'✅' if estado == 'completado' else '❌'} [{t.id}] {t.nombre}: {estado} "
+                          f"en {trabajador} {t.mensaje}".rstrip())
+        return {"cancelar": cancelar}
+
+
+def servir(coordinador: Coordinador, host: str = "127.0.0.1", puerto: int = PUERTO,
+           clave: str = CLAVE) -> None:
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    if host not in LOCALES and not clave:
+        raise ValueError(f"Escuchar en {host} sin clave dejaría a cualquiera de la red encolar descargas "
+                         "en los trabajadores: usa --clave o PS3_REPARTO_CLAVE")
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, formato, *args):
+            pass
+
+        def _json(self, datos, codigo: int = 200) -> None:
+            cuerpo = json.dumps(datos, ensure_ascii=False).encode("utf-8")
+            self.send_response(codigo)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def _cuerpo(self) -> Dict:
+            largo = int(self.headers.get("Content-Length") or 0)
+            return json.loads(self.rfile.read(largo) or b"{}") if largo else {}
+
+        def _ruta(self) -> Optional[List[str]]:
+            if clave and not hmac.compare_digest(self.headers.get("X-PS3-Clave", "").encode("utf-8"),
+                                                 clave.encode("utf-8")):
+                self._json({"error": "clave incorrecta"}, 403)
+                return None
+            return [p for p in urlsplit(self.path).path.split("/") if p]
+
+        def _tarea(self, partes) -> Optional[Tarea]:
+            t = coordinador.tarea(int(partes[1])) if len(partes) == 2 and partes[1].isdigit() else None
+            if t is None:
+                self._json({"error": "trabajo no encontrado"}, 404)
+            return t
+
+        def do_GET(self):
+            partes = self._ruta()
+            if partes is None:
+                return
+            if partes == ["estado"]:
+                conteo: Dict[str, int] = {}
+                for t in coordinador.tareas():
+                    conteo[t.estado] = conteo.get(t.estado, 0) + 1
+                self._json({"trabajos": conteo, "trabajadores": coordinador.trabajadores})
+            elif partes == ["trabajos"]:
+                self._json([t.a_dict() for t in coordinador.tareas()])
+            elif partes[:1] == ["trabajos"]:
+                t = self._tarea(partes)
+                if t is not None:
+                    self._json(t.a_dict())
+            else:
+                self._json({"error": "ruta desconocida"}, 404)
+
+        def do_POST(self):
+            partes = self._ruta()
+            if partes is None:
+                return
+            try:
+                datos = self._cuerpo()
+                if partes == ["trabajos"]:
+                    lote = datos["trabajos"] if "trabajos" in datos else [datos]
+                    for d in lote:
+                        validar_tarea(d)
+                    self._json([coordinador.enviar(d).a_dict() for d in lote], 201)
+                elif partes == ["registrar"]:
+                    self._json({"devueltos": coordinador.registrar(str(datos["trabajador"]))})
+                elif partes == ["arrendar"]:
+                    espera = min(float(datos.get("espera") or 0), ESPERA_ARRIENDO)
+                    tareas = coordinador.arrendar(str(datos["trabajador"]), int(datos.get("max") or 1), espera)
+                    try:
+                        self._json([{"id": t.id, "arriendo": t.arriendo, "tipo": t.tipo, "datos": t.datos}
+                                    for t in tareas])
+                    except (BrokenPipeError, ConnectionResetError):
+                        # El trabajador se fue mientras esperaba: sin esperar a que caduquen
+                        coordinador.devolver(tareas, "trabajador desconectado")
+                elif partes == ["latido"]:
+                    self._json(coordinador.latido(str(datos["trabajador"]), list(datos.get("arriendos") or [])))
+                else:
+                    self._json({"error": "ruta desconocida"}, 404)
+            except (ValueError, TypeError, KeyError) as e:
+                self._json({"error": str(e)}, 400)
+
+        def do_PATCH(self):
+            partes = self._ruta()
+            t = self._tarea(partes) if partes and partes[:1] == ["trabajos"] else None
+            if t is None:
+                if partes is not None and partes[:1] != ["trabajos"]:
+                    self._json({"error": "ruta desconocida"}, 404)
+                return
+            try:
+                self._json(coordinador.priorizar(t.id, int(self._cuerpo()["prioridad"])).a_dict())
+            except (ValueError, TypeError, KeyError) as e:
+                self._json({"error": str(e)}, 400)
+
+        def do_DELETE(self):
+            partes = self._ruta()
+            t = self._tarea(partes) if partes and partes[:1] == ["trabajos"] else None
+            if t is not None:
+                self._json(coordinador.cancelar(t.id).a_dict())
+            elif partes is not None and partes[:1] != ["trabajos"]:
+                self._json({"error": "ruta desconocida"}, 404)
+
+    servidor = ThreadingHTTPServer((host, puerto), Handler)
+    servidor.daemon_threads = True
+    print(f"🛰️  Coordinador PS3 escuchando en http://{host}:{puerto} (arriendos de {coordinador.arriendo} s)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+
+# --- Trabajador ---
+
+class ClienteCoordinador(Cliente):
+    """Las rutas de trabajos son las mismas que las del demonio; se añaden las de reparto."""
+
+    def __init__(self, url: str = COORDINADOR, clave: str = CLAVE):
+        super().__init__(url)
+        if clave:
+            self.session.headers["X-PS3-Clave"] = clave
+
+    def registrar(self, trabajador: str) -> int:
+        return self._pedir("POST", "/registrar", json={"trabajador": trabajador})["devueltos"]
+
+    def arrendar(self, trabajador: str, maximo: int, espera: float = ESPERA_ARRIENDO) -> List[Dict]:
+        return self._pedir("POST", "/arrendar", json={"trabajador": trabajador, "max": maximo, "espera": espera},
+                           timeout=espera + 10)
+
+    def latido(self, trabajador: str, arriendos: List[Dict]) -> Dict:
+        return self._pedir("POST", "/latido", json={"trabajador": trabajador, "arriendos": arriendos})
+
+    def estado(self) -> Dict:
+        return self._pedir("GET", "/estado")
+
+
+class Trabajador:
+    """Pide trabajos al coordinador y los ejecuta con un ps3_demonio.Motor local."""
+
+    def __init__(self, cliente: ClienteCoordinador, nombre: str, dest_dir: Path, final_dir: Path,
+                 destino: Path, descargas: int = 2, hilos_libray: Optional[int] = None):
+        from ps3_demonio import Motor
+        self.cliente = cliente
+        self.nombre = nombre
+        self.dest_dir, self.final_dir, self.destino = dest_dir, final_dir, destino
+        self.descargas = max(1, descargas)
+        hilos_libray = hilos_libray or int(os.environ.get("LIBRAY_HILOS", "1") or 1)
+        # Trabajos que puede tener a la vez: los que descargan más los que esperan o pasan por libray
+        self.capacidad = self.descargas + hilos_libray
+        # El motor local solo escribe en las carpetas de este trabajador
+        self.motor = Motor(self.descargas, hilos_libray, raices=[dest_dir, final_dir, destino])
+        self._lock = threading.Lock()
+        self._arriendos: Dict[int, Dict] = {}  # id en el motor local -> {"id", "arriendo"}
+        self._cambio = threading.Event()
+        self._latir_ya = threading.Event()
+        self._parar = threading.Event()
+
+    def _local(self, tarea: Dict) -> Dict:
+        datos = {**tarea["datos"], "tipo": tarea["tipo"]}
+        if tarea["tipo"] == "ia":
+            datos.update(dest_dir=str(self.dest_dir), final_dir=str(self.final_dir))
+        else:
+            datos["destino"] = str(self.destino)
+        return datos
+
+    def _huecos(self) -> int:
+        with self._lock:
+            locales = [self.motor.trabajo(i) for i in self._arriendos]
+        activos = [t for t in locales if t.estado not in ESTADOS_FINALES]
+        descargando = sum(t.estado in ESTADOS_DESCARGA for t in activos)
+        return min(self.descargas - descargando, self.capacidad - len(activos))
+
+    def _seguir_motor(self) -> None:
+        q = self.motor.suscribir()
+        while not self._parar.is_set():
+            e = q.get()
+            t = e["trabajo"]
+            with self._lock:
+                arriendo = self._arriendos.get(t["id"])
+            if arriendo is None or e["evento"] != "estado":
+                continue
+            self._cambio.set()
+            if t["estado"] in ESTADOS_FINALES:
+                print(f"{'✅' if t['estado'] == 'completado' else '❌'} [{arriendo['id']}] {t['nombre']}: "
+                      f"{t['estado']} {t['mensaje']}".rstrip())
+                self._latir_ya.set()
+
+    def _latido(self, devolver: bool = False) -> None:
+        with self._lock:
+            pares = list(self._arriendos.items())
+        informes = []
+        for local, a in pares:
+            t = self.motor.trabajo(local)
+            estado = "devuelto" if devolver and t.estado not in ESTADOS_FINALES else t.estado
+            informes.append({**a, "estado": estado, "hechos": t.hechos, "total": t.total, "mensaje": t.mensaje})
+        try:
+            respuesta = self.cliente.latido(self.nombre, informes)
+        except (requests.RequestException, ValueError) as e:
+            print(f"⚠️  El coordinador no responde ({e}); se reintenta en {LATIDO} s")
+            return
+        cancelar = set(respuesta.get("cancelar") or [])
+        with self._lock:
+            for (local, a), inf in zip(pares, informes):
+                if inf["estado"] in ESTADOS_FINALES or inf["estado"] == "devuelto":
+                    # Ya informado: el coordinador lo tiene
+                    self._arriendos.pop(local, None)
+                elif a["id"] in cancelar:
+                    print(f"🚫 [{a['id']}] Arriendo perdido o cancelado, se abandona")
+                    self.motor.cancelar(local)
+                    self._arriendos.pop(local, None)
+
+    def _latir(self) -> None:
+        while not self._parar.is_set():
+            self._latir_ya.wait(LATIDO)
+            self._latir_ya.clear()
+            if not self._parar.is_set():
+                self._latido()
+                self._cambio.set()
+
+    def ejecutar(self) -> None:
+        devueltos = self.cliente.registrar(self.nombre)
+        if devueltos:
+            print(f"🔁 {devueltos} trabajo(s) de una ejecución anterior vuelven a la cola")
+        print(f"🛠️  Trabajador {self.nombre} conectado a {self.cliente.url} "
+              f"({self.descargas} descargas, capacidad {self.capacidad})")
+        threading.Thread(target=self._seguir_motor, name="eventos", daemon=True).start()
+        threading.Thread(target=self._latir, name="latido", daemon=True).start()
+        try:
+            while True:
+                huecos = self._huecos()
+                if huecos <= 0:
+                    self._cambio.wait(LATIDO)
+                    self._cambio.clear()
+                    continue
+                try:
+                    tareas = self.cliente.arrendar(self.nombre, huecos)
+                except (requests.RequestException, ValueError) as e:
+                    print(f"⚠️  No se pudo pedir trabajo al coordinador ({e})")
+                    time.sleep(LATIDO)
+                    continue
+                for tarea in tareas:
+                    local = self.motor.enviar(self._local(tarea))
+                    with self._lock:
+                        self._arriendos[local.id] = {"id": tarea["id"], "arriendo": tarea["arriendo"]}
+                    print(f"📥 [{tarea['id']}] {local.nombre}")
+        except (KeyboardInterrupt, SystemExit):
+            # Ctrl+C o SIGTERM (ps3IAPKGv1 los convierte en sys.exit)
+            print("\n⏹️  Deteniendo: los trabajos sin terminar vuelven al coordinador")
+            self._parar.set()
+            with self._lock:
+                locales = list(self._arriendos)
+            for local in locales:
+                self.motor.cancelar(local)
+            self._latido(devolver=True)
+            # Un momento para que las descargas canceladas borren sus ficheros a medias
+            limite = time.monotonic() + 5
+            while time.monotonic() < limite and any(
+                    self.motor.trabajo(i).estado in ESTADOS_DESCARGA for i in locales):
+                time.sleep(0.2)
+
+
+def _linea_tarea(t: Dict) -> str:
+    return _linea(t) + (f"  @{t['trabajador']}" if t.get("trabajador") else "")
+
+
+def _expandir(item: str, patrones: List[str]) -> List[str]:
+    """Nombres tal cual o patrones (*.zip) contra los ficheros del item."""
+    if not any(c in p for p in patrones for c in "*?["):
+        return patrones
+    import ps3IAPKGv1 as logic
+    nombres = [f.get("name") for f in logic.obtener_item(item).files if f.get("name")]
+    elegidos = []
+    for p in patrones:
+        for n in (fnmatch.filter(nombres, p) if any(c in p for c in "*?[") else [p]):
+            if n not in elegidos:
+                elegidos.append(n)
+    return elegidos
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Reparto de descargas PS3 entre varios equipos")
+    parser.add_argument("--coordinador", default=COORDINADOR, help=f"URL del coordinador (por defecto {COORDINADOR})")
+    parser.add_argument("--clave", default=CLAVE,
+                        help="Clave compartida (PS3_REPARTO_CLAVE); obligatoria fuera de 127.0.0.1")
+    sub = parser.add_subparsers(dest="orden", required=True)
+    p = sub.add_parser("coordinador", help="Arranca el coordinador")
+    p.add_argument("--host", default="127.0.0.1", help="0.0.0.0 para aceptar trabajadores de otros equipos")
+    p.add_argument("--puerto", type=int, default=PUERTO)
+    p.add_argument("--arriendo", type=int, default=ARRIENDO, help="Segundos sin latido para dar un trabajo por perdido")
+    p = sub.add_parser("trabajador", help="Ejecuta trabajos del coordinador en este equipo")
+    p.add_argument("--dest", required=True, help="Carpeta temporal de las ISO cifradas")
+    p.add_argument("--final", required=True, help="Carpeta de las ISO desencriptadas")
+    p.add_argument("--destino", default=".", help="Carpeta de los PKG")
+    p.add_argument("--descargas", type=int, default=2, help="Descargas simultáneas")
+    p.add_argument("--nombre", default=f"{socket.gethostname()}-{os.getpid()}")
+    p = sub.add_parser("pkg", help="Encola descargas de PKG")
+    p.add_argument("urls", nargs="+")
+    p.add_argument("--extraer", action="store_true")
+    p.add_argument("--prioridad", type=int, default=0)
+    p = sub.add_parser("ia", help="Encola ficheros de un item (admite patrones: \"*.zip\")")
+    p.add_argument("item")
+    p.add_argument("ficheros", nargs="+")
+    p.add_argument("--formato", choices=("iso", "cso"))
+    p.add_argument("--prioridad", type=int, default=0)
+    sub.add_parser("lista", help="Muestra los trabajos")
+    sub.add_parser("estado", help="Trabajos por estado y trabajadores vistos")
+    p = sub.add_parser("cancelar", help="Cancela un trabajo")
+    p.add_argument("id", type=int)
+    p = sub.add_parser("prioridad", help="Cambia la prioridad de un trabajo en cola (mayor = antes)")
+    p.add_argument("id", type=int)
+    p.add_argument("prioridad", type=int)
+    args = parser.parse_args(argv)
+
+    if args.orden == "coordinador":
+        if args.host not in LOCALES and not args.clave:
+            print(f"[ERROR] Para escuchar en {args.host} hace falta --clave (o PS3_REPARTO_CLAVE)")
+            return 1
+        servir(Coordinador(args.arriendo), args.host, args.puerto, args.clave)
+        return 0
+
+    c = ClienteCoordinador(args.coordinador, args.clave)
+    try:
+        if args.orden == "trabajador":
+            Trabajador(c, args.nombre, Path(args.dest).expanduser().resolve(),
+                       Path(args.final).expanduser().resolve(),
+                       Path(args.destino).expanduser().resolve(), args.descargas).ejecutar()
+        elif args.orden in ("pkg", "ia"):
+            if args.orden == "pkg":
+                lote = [{"tipo": "pkg", "url": u, "extraer": args.extraer, "prioridad": args.prioridad}
+                        for u in args.urls]
+            else:
+                lote = [{"tipo": "ia", "item": args.item, "fichero": f, "formato": args.formato,
+                         "prioridad": args.prioridad} for f in _expandir(args.item, args.ficheros)]
+            if not lote:
+                print("[ERROR] Ningún fichero coincide")
+                return 1
+            for t in c.enviar(lote):
+                print(_linea_tarea(t))
+        elif args.orden == "lista":
+            for t in c.trabajos():
+                print(_linea_tarea(t))
+        elif args.orden == "estado":
+            estado = c.estado()
+            print("  ".join(f"{k}: {v}" for k, v in sorted(estado["trabajos"].items())) or "(sin trabajos)")
+            for nombre, visto in sorted(estado["trabajadores"].items()):
+                print(f"  🛠️  {nombre}: último contacto hace {time.time() - visto:.0f} s")
+        elif args.orden == "cancelar":
+            print(_linea_tarea(c.cancelar(args.id)))
+        elif args.orden == "prioridad":
+            print(_linea_tarea(c.priorizar(args.id, args.prioridad)))
+    except requests.RequestException as e:
+        print(f"[ERROR] No se pudo contactar con el coordinador en {c.url}: {e}")
+        return 1
+    except ValueError as e:
+        print(f"[ERROR] {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,713 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Etapa de salida de las ISO desencriptadas
+
+Las salidas son objetos con `write(datos)`, `close()` y `abortar()` que reciben los
+bytes según los produce libray (a través de una tubería con nombre), sin una segunda
+pasada sobre una ISO en bruto:
+
+- `SalidaFichero`: ISO normal (se escribe en un .part y se renombra al cerrar).
+- `SalidaCSO`: imagen comprimida por bloques (formato CSO v1: cabecera, índice y
+  bloques deflate independientes). Los bloques se comprimen en paralelo en todos los
+  núcleos con una ventana acotada de memoria, y cada uno se descomprime en memoria
+  nada más comprimirlo para comprobar que devuelve los mismos bytes.
+- `SalidaPartes`: partes aptas para FAT32 (`juego.iso.0`, `.1`... o `.66600`, `.66601`...)
+  escritas según llegan los bytes, con un manifiesto JSON para verificarlas y unirlas.
+- `SalidaHuellas`: envuelve cualquiera de las anteriores y calcula CRC32, MD5 y SHA-1
+  de la imagen desencriptada mientras se escribe (para comprobarla contra redump).
+
+`LectorCSO` lee cualquier rango de una CSO, `comprobar_cso` contrasta su cabecera y su
+tamaño con lo que contó SalidaCSO al escribirla, y `verificar_cso` la descomprime entera
+(una segunda pasada) para comprobar que devuelve exactamente los bytes originales.
+
+Uso:
+    python3 ps3_salida.py comprimir juego.iso juego.cso
+    python3 ps3_salida.py descomprimir juego.cso juego.iso
+    python3 ps3_salida.py verificar juego.cso [--original juego.iso]
+    python3 ps3_salida.py partir juego.iso --tam fat32 --estilo 66600
+    python3 ps3_salida.py verificar-partes juego.iso.partes.json
+    python3 ps3_salida.py unir juego.iso.partes.json [destino.iso]
+"""
+
+from __future__ import annotations
+import os
+import sys
+import zlib
+import struct
+import shutil
+import json
+import hashlib
+import argparse
+import tempfile
+import threading
+from array import array
+from collections import deque
+from pathlib import Path
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import BinaryIO, Deque, Dict, Iterator, List, Optional, Tuple
+
+# Tamaño de lectura de la tubería y de las copias
+LECTURA = 1024 * 1024
+
+# --- CSO v1 ---
+# Cabecera: "CISO", tamaño de cabecera, bytes totales, tamaño de bloque, versión, alineación
+CSO_MAGIA = b"CISO"
+CSO_CABECERA = struct.Struct("<4sIQIBB2x")
+# Bit alto de una entrada del índice: bloque guardado sin comprimir
+CSO_PLANO = 0x80000000
+BLOQUE_CSO = 16 * 1024
+NIVEL_CSO = 9
+# Bloques que se comprimen en cada tarea (evita una tarea por cada 16 KiB)
+BLOQUES_POR_TAREA = 64
+
+# --- Partes para FAT32 ---
+# FAT32 no admite ficheros de 4 GiB o más; se deja margen alineado a 64 KiB
+TAM_PARTE_FAT32 = 4 * 1024 ** 3 - 64 * 1024
+# "numerico": juego.iso.0, juego.iso.1...  "66600": juego.iso.66600, juego.iso.66601...
+ESTILOS_PARTES = ("numerico", "66600")
+
+# Las tuberías con nombre solo existen en POSIX; en Windows se hace ISO + compresión
+TUBERIAS = hasattr(os, "mkfifo")
+
+
+class Salida:
+    """Interfaz común. Como gestor de contexto cierra si todo fue bien y aborta si no."""
+
+    destino: Path
+
+    def write(self, datos: bytes) -> int:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        raise NotImplementedError
+
+    def abortar(self) -> None:
+        raise NotImplementedError
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, traza) -> None:
+        if tipo is None:
+            self.close()
+        else:
+            self.abortar()
+
+
+class SalidaFichero(Salida):
+    """ISO sin comprimir."""
+
+    def __init__(self, destino: Path):
+        self.destino = Path(destino)
+        self.destino.parent.mkdir(parents=True, exist_ok=True)
+        self._tmp = self.destino.with_name(self.destino.name + ".part")
+        self._f: Optional[BinaryIO] = open(self._tmp, "wb")
+        self.escritos = 0
+
+    def write(self, datos: bytes) -> int:
+        self._f.write(datos)
+        self.escritos += len(datos)
+        return len(datos)
+
+    def close(self) -> None:
+        if self._f is None:
+            return
+        self._f.close()
+        self._f = None
+        os.replace(self._tmp, self.destino)
+
+    def abortar(self) -> None:
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+        self._tmp.unlink(missing_ok=True)
+
+
+class Huellas:
+    """CRC32, MD5 y SHA-1 de un flujo, calculados a la vez según pasan los bytes."""
+
+    def __init__(self):
+        self.tamano = 0
+        self._crc = 0
+        self._md5 = hashlib.md5()
+        self._sha1 = hashlib.sha1()
+
+    def update(self, datos: bytes) -> None:
+        self._crc = zlib.crc32(datos, self._crc)
+        self._md5.update(datos)
+        self._sha1.update(datos)
+        self.tamano += len(datos)
+
+    @property
+    def crc32(self) -> str:
+        return f"{self._crc:08x}"
+
+    @property
+    def md5(self) -> str:
+        return self._md5.hexdigest()
+
+    @property
+    def sha1(self) -> str:
+        return self._sha1.hexdigest()
+
+    def a_dict(self) -> Dict:
+        return {"tamano": self.tamano, "crc32": self.crc32, "md5": self.md5, "sha1": self.sha1}
+
+
+def huellas_fichero(path: Path) -> Huellas:
+    """Huellas de un fichero ya escrito (cuando no hubo tubería por la que pasar)."""
+    huellas = Huellas()
+    with open(path, "rb") as f:
+        while True:
+            datos = f.read(LECTURA)
+            if not datos:
+                break
+            huellas.update(datos)
+    return huellas
+
+
+class SalidaHuellas(Salida):
+    """Pasa los bytes a otra salida calculando sus huellas, sin releer la imagen.
+
+    Las huellas se calculan en un hilo aparte mientras la salida escribe (o comprime)
+    el mismo trozo: hashlib y zlib sueltan el GIL, así que las dos cosas se solapan.
+    """
+
+    def __init__(self, salida: Salida, huellas: Optional[Huellas] = None):
+        self.salida = salida
+        self.destino = salida.destino
+        self.huellas = huellas or Huellas()
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="huellas")
+
+    def write(self, datos: bytes) -> int:
+        pendiente = self._pool.submit(self.huellas.update, bytes(datos))
+        try:
+            return self.salida.write(datos)
+        finally:
+            pendiente.result()
+
+    def close(self) -> None:
+        self._pool.shutdown()
+        self.salida.close()
+
+    def abortar(self) -> None:
+        self._pool.shutdown()
+        self.salida.abortar()
+
+
+def tamano_parte(texto: str) -> int:
+    """Interpreta "fat32", "4G", "700M", "1048576"... 0 si está vacío (no partir)."""
+    texto = (texto or "").strip().upper()
+    if not texto or texto in ("0", "NO"):
+        return 0
+    if texto == "FAT32":
+        return TAM_PARTE_FAT32
+    multiplos = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+    texto = texto.rstrip("IB") if texto[-1:] == "B" else texto
+    if texto[-1:] in multiplos:
+        return int(float(texto[:-1]) * multiplos[texto[-1]])
+    return int(texto)
+
+
+def nombre_parte(destino: Path, i: int, estilo: str = "numerico") -> Path:
+    sufijo = 66600 + i if estilo == "66600" else i
+    return destino.with_name(f"{destino.name}.{sufijo}")
+
+
+def ruta_manifiesto(destino: Path) -> Path:
+    return destino.with_name(f"{destino.name}.partes.json")
+
+
+def existe_salida(destino: Path) -> bool:
+    """El fichero completo o, si se partió, su manifiesto (que se escribe el último)."""
+    return destino.exists() or ruta_manifiesto(destino).exists()
+
+
+class SalidaPartes(Salida):
+    """Parte el flujo en ficheros de `tam_parte` bytes según se escribe.
+
+    Cada parte se escribe como .part y al cerrar se renombran todas y se guarda el
+    manifiesto (tamaño y SHA-1 de cada parte y del conjunto). Si todo cabe en una
+    sola parte se deja el fichero con su nombre normal y sin manifiesto.
+    """
+
+    def __init__(self, destino: Path, tam_parte: int = TAM_PARTE_FAT32, estilo: str = "numerico"):
+        if tam_parte <= 0:
+            raise ValueError("El tamaño de parte debe ser positivo")
+        if estilo not in ESTILOS_PARTES:
+            raise ValueError(f"Estilo de partes desconocido: {estilo}")
+        self.destino = Path(destino)
+        self.destino.parent.mkdir(parents=True, exist_ok=True)
+        self.tam_parte = tam_parte
+        self.estilo = estilo
+        self.sha1 = hashlib.sha1()
+        self.escritos = 0
+        self.partes: List[Dict] = []
+        self._f: Optional[BinaryIO] = None
+        self._sha_parte = hashlib.sha1()
+        self._en_parte = 0
+        self._cerrada = False
+
+    def _tmp(self, i: int) -> Path:
+        final = nombre_parte(self.destino, i, self.estilo)
+        return final.with_name(final.name + ".part")
+
+    def _cerrar_parte(self) -> None:
+        if self._f is None:
+            return
+        self._f.close()
+        self._f = None
+        self.partes.append({"nombre": nombre_parte(self.destino, len(self.partes), self.estilo).name,
+                            "tamano": self._en_parte, "sha1": self._sha_parte.hexdigest()})
+
+    def write(self, datos: bytes) -> int:
+        vista = memoryview(datos)
+        while vista:
+            if self._f is None or self._en_parte == self.tam_parte:
+                self._cerrar_parte()
+                self._f = open(self._tmp(len(self.partes)), "wb")
+                self._sha_parte = hashlib.sha1()
+                self._en_parte = 0
+            trozo = vista[:self.tam_parte - self._en_parte]
+            self._f.write(trozo)
+            self._sha_parte.update(trozo)
+            self.sha1.update(trozo)
+            self._en_parte += len(trozo)
+            self.escritos += len(trozo)
+            vista = vista[len(trozo):]
+        return len(datos)
+
+    def close(self) -> None:
+        if self._cerrada:
+            return
+        self._cerrada = True
+        if self._f is None and not self.partes:
+            # Flujo vacío: fichero vacío con su nombre normal
+            self.destino.write_bytes(b"")
+            return
+        self._cerrar_parte()
+        if len(self.partes) == 1:
+            os.replace(self._tmp(0), self.destino)
+            return
+        for i in range(len(self.partes)):
+            os.replace(self._tmp(i), nombre_parte(self.destino, i, self.estilo))
+        manifiesto = ruta_manifiesto(self.destino)
+        tmp = manifiesto.with_name(manifiesto.name + ".part")
+        tmp.write_text(json.dumps({
+            "nombre": self.destino.name, "tamano": self.escritos, "sha1": self.sha1.hexdigest(),
+            "tam_parte": self.tam_parte, "estilo": self.estilo, "partes": self.partes,
+        }, ensure_ascii=False, indent=1), encoding="utf-8")
+        os.replace(tmp, manifiesto)
+
+    def abortar(self) -> None:
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+        for i in range(len(self.partes) + 1):
+            self._tmp(i).unlink(missing_ok=True)
+
+
+def leer_manifiesto(manifiesto: Path) -> Dict:
+    return json.loads(Path(manifiesto).read_text(encoding="utf-8"))
+
+
+def _leer_partes(manifiesto: Path, datos: Dict) -> Iterator[Tuple[Dict, bytes]]:
+    for parte in datos["partes"]:
+        with open(Path(manifiesto).with_name(parte["nombre"]), "rb") as f:
+            while True:
+                trozo = f.read(LECTURA)
+                if not trozo:
+                    break
+                yield parte, trozo
+
+
+def verificar_partes(manifiesto: Path) -> List[str]:
+    """Comprueba tamaño y SHA-1 de cada parte y del conjunto. Devuelve los errores."""
+    manifiesto = Path(manifiesto)
+    datos = leer_manifiesto(manifiesto)
+    errores = []
+    for parte in datos["partes"]:
+        ruta = manifiesto.with_name(parte["nombre"])
+        if not ruta.exists():
+            errores.append(f"Falta {parte['nombre']}")
+        elif ruta.stat().st_size != parte["tamano"]:
+            errores.append(f"{parte['nombre']}: tamaño {ruta.stat().st_size}, esperado {parte['tamano']}")
+    if errores:
+        return errores
+    total = hashlib.sha1()
+    actual, h = None, None
+    for parte, trozo in _leer_partes(manifiesto, datos):
+        if parte is not actual:
+            if actual is not None and h.hexdigest() != actual["sha1"]:
+                errores.append(f"{actual['nombre']}: SHA-1 no coincide")
+            actual, h = parte, hashlib.sha1()
+        h.update(trozo)
+        total.update(trozo)
+    if actual is not None and h.hexdigest() != actual["sha1"]:
+        errores.append(f"{actual['nombre']}: SHA-1 no coincide")
+    if total.hexdigest() != datos["sha1"]:
+        errores.append("El SHA-1 del conjunto no coincide")
+    return errores
+
+
+def unir_partes(manifiesto: Path, destino: Optional[Path] = None) -> Path:
+    """Reconstruye el fichero original comprobando el SHA-1 del conjunto."""
+    manifiesto = Path(manifiesto)
+    datos = leer_manifiesto(manifiesto)
+    destino = Path(destino) if destino else manifiesto.with_name(datos["nombre"])
+    h = hashlib.sha1()
+    with SalidaFichero(destino) as salida:
+        for _, trozo in _leer_partes(manifiesto, datos):
+            h.update(trozo)
+            salida.write(trozo)
+        if h.hexdigest() != datos["sha1"]:
+            raise ValueError("El SHA-1 de las partes unidas no coincide con el manifiesto")
+    return destino
+
+
+def _alineacion(total: int, bloque: int) -> int:
+    """Menor alineación que permite direccionar toda la imagen con índices de 31 bits."""
+    n = (total + bloque - 1) // bloque
+    datos = CSO_CABECERA.size + 4 * (n + 1)
+    for align in range(16):
+        maximo = datos + total + n * ((1 << align) - 1)
+        if maximo >> align < CSO_PLANO:
+            return align
+    raise ValueError("Imagen demasiado grande para CSO v1")
+
+
+def _comprimir_bloques(datos: bytes, bloque: int, nivel: int) -> List[Tuple[bytes, bool]]:
+    """Comprime cada bloque por separado (zlib suelta el GIL: los hilos escalan) y lo
+    descomprime en memoria para comprobarlo. ValueError si no devuelve el original."""
+    res = []
+    for i in range(0, len(datos), bloque):
+        trozo = datos[i:i + bloque]
+        c = zlib.compressobj(nivel, zlib.DEFLATED, -15)
+        comprimido = c.compress(trozo) + c.flush()
+        # Si no compensa se guarda tal cual
+        if len(comprimido) >= len(trozo):
+            res.append((trozo, True))
+            continue
+        if zlib.decompress(comprimido, -15) != trozo:
+            raise ValueError("Un bloque comprimido no devuelve los datos originales")
+        res.append((comprimido, False))
+    return res
+
+
+class SalidaCSO(Salida):
+    """Escribe una CSO v1 a partir de un flujo de bytes.
+
+    `total` (el tamaño de la ISO, que coincide con el de la cifrada) fija el tamaño
+    del índice, que se reserva al principio y se rellena al cerrar. La memoria está
+    acotada a `ventana` tareas de `BLOQUES_POR_TAREA` bloques en vuelo.
+    """
+
+    def __init__(self, destino: Path, total: int, bloque: int = BLOQUE_CSO,
+                 nivel: int = NIVEL_CSO, hilos: Optional[int] = None, ventana: Optional[int] = None):
+        if total <= 0:
+            raise ValueError("SalidaCSO necesita el tamaño total de la imagen")
+        self.destino = Path(destino)
+        self.destino.parent.mkdir(parents=True, exist_ok=True)
+        self.total = total
+        self.bloque = bloque
+        self.nivel = nivel
+        self.align = _alineacion(total, bloque)
+        self.n_bloques = (total + bloque - 1) // bloque
+        self.sha1 = hashlib.sha1()
+        self.escritos = 0
+        self.comprimidos = 0
+        hilos = hilos or os.cpu_count() or 2
+        self._ventana = ventana or 2 * hilos
+        self._pool = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="cso")
+        self._pendientes: Deque[Future] = deque()
+        self._buffer = bytearray()
+        self._tarea = bloque * BLOQUES_POR_TAREA
+        self._indice = array("I")
+        self._tmp = self.destino.with_name(self.destino.name + ".part")
+        self._f: Optional[BinaryIO] = open(self._tmp, "wb")
+        self._pos = CSO_CABECERA.size + 4 * (self.n_bloques + 1)
+        self._pos = self._alinear(self._pos)
+        self._f.seek(self._pos)
+
+    def _alinear(self, pos: int) -> int:
+        resto = pos % (1 << self.align)
+        return pos if not resto else pos + (1 << self.align) - resto
+
+    def write(self, datos: bytes) -> int:
+        if self.escritos + len(datos) > self.total:
+            raise ValueError(f"La imagen supera el tamaño previsto ({self.total} bytes)")
+        self.sha1.update(datos)
+        self.escritos += len(datos)
+        self._buffer += datos
+        while len(self._buffer) >= self._tarea:
+            self._enviar(bytes(self._buffer[:self._tarea]))
+            del self._buffer[:self._tarea]
+        return len(datos)
+
+    def _enviar(self, datos: bytes) -> None:
+        # Ventana acotada: antes de encolar más, se escribe la tarea más antigua
+        while len(self._pendientes) >= self._ventana:
+            self._escribir(self._pendientes.popleft().result())
+        self._pendientes.append(self._pool.submit(_comprimir_bloques, datos, self.bloque, self.nivel))
+
+    def _escribir(self, bloques: List[Tuple[bytes, bool]]) -> None:
+        for datos, plano in bloques:
+            self._indice.append((self._pos >> self.align) | (CSO_PLANO if plano else 0))
+            self._f.write(datos)
+            self._pos += len(datos)
+            self.comprimidos += len(datos)
+            relleno = self._alinear(self._pos) - self._pos
+            if relleno:
+                self._f.write(b"\0" * relleno)
+                self._pos += relleno
+
+    def close(self) -> None:
+        if self._f is None:
+            return
+        try:
+            if self._buffer:
+                self._enviar(bytes(self._buffer))
+                self._buffer.clear()
+            while self._pendientes:
+                self._escribir(self._pendientes.popleft().result())
+            if self.escritos != self.total:
+                raise ValueError(f"Imagen incompleta: {self.escritos} de {self.total} bytes")
+            self._indice.append(self._pos >> self.align)
+            self._f.seek(0)
+            self._f.write(CSO_CABECERA.pack(CSO_MAGIA, CSO_CABECERA.size, self.total,
+                                            self.bloque, 1, self.align))
+            if sys.byteorder != "little":
+                self._indice.byteswap()
+            self._f.write(self._indice.tobytes())
+        except BaseException:
+            self.abortar()
+            raise
+        self._pool.shutdown()
+        self._f.close()
+        self._f = None
+        os.replace(self._tmp, self.destino)
+        # Tamaño del fichero terminado (para comprobar_cso)
+        self.tamano = self._pos
+
+    def abortar(self) -> None:
+        for fut in self._pendientes:
+            fut.cancel()
+        self._pendientes.clear()
+        self._pool.shutdown(wait=True)
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+        self._tmp.unlink(missing_ok=True)
+
+
+class LectorCSO:
+    """Acceso aleatorio a una CSO v1."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._f = open(self.path, "rb")
+        magia, cab, self.total, self.bloque, version, self.align = \
+            CSO_CABECERA.unpack(self._f.read(CSO_CABECERA.size))
+        if magia != CSO_MAGIA or version > 1:
+            raise ValueError(f"{self.path} no es una CSO v1")
+        self.n_bloques = (self.total + self.bloque - 1) // self.bloque
+        self._f.seek(cab)
+        self._indice = array("I")
+        self._indice.frombytes(self._f.read(4 * (self.n_bloques + 1)))
+        if sys.byteorder != "little":
+            self._indice.byteswap()
+        if len(self._indice) != self.n_bloques + 1:
+            raise ValueError(f"{self.path}: índice truncado")
+
+    def close(self) -> None:
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def bloque_n(self, i: int) -> bytes:
+        entrada, siguiente = self._indice[i], self._indice[i + 1]
+        inicio = (entrada & ~CSO_PLANO) << self.align
+        fin = (siguiente & ~CSO_PLANO) << self.align
+        esperado = min(self.bloque, self.total - i * self.bloque)
+        self._f.seek(inicio)
+        if entrada & CSO_PLANO:
+            datos = self._f.read(esperado)
+        else:
+            datos = zlib.decompressobj(-15).decompress(self._f.read(fin - inicio))
+        if len(datos) != esperado:
+            raise ValueError(f"{self.path}: bloque {i} corrupto")
+        return datos
+
+    def bloques(self) -> Iterator[bytes]:
+        for i in range(self.n_bloques):
+            yield self.bloque_n(i)
+
+    def leer(self, offset: int, n: int) -> bytes:
+        n = max(0, min(n, self.total - offset))
+        partes = []
+        while n > 0:
+            i, dentro = divmod(offset, self.bloque)
+            trozo = self.bloque_n(i)[dentro:dentro + n]
+            partes.append(trozo)
+            offset += len(trozo)
+            n -= len(trozo)
+        return b"".join(partes)
+
+
+def comprobar_cso(cso: Path, total: int, tamano: int) -> None:
+    """Comprobación sin releer la imagen: la cabecera y el índice se leen bien y el
+    fichero tiene el tamaño que escribió SalidaCSO. ValueError si no."""
+    with LectorCSO(cso) as lector:
+        if lector.total != total:
+            raise ValueError(f"{cso}: la cabecera dice {lector.total} bytes y se escribieron {total}")
+    if Path(cso).stat().st_size != tamano:
+        raise ValueError(f"{cso}: mide {Path(cso).stat().st_size} bytes y se escribieron {tamano}")
+
+
+def verificar_cso(cso: Path, original: Optional[Path] = None, sha1: Optional[str] = None) -> str:
+    """Descomprime la CSO entera y devuelve su SHA-1.
+
+    Si se pasa la ISO original o el SHA-1 esperado, lanza ValueError al primer fallo.
+    """
+    h = hashlib.sha1()
+    with LectorCSO(cso) as lector:
+        ref = open(original, "rb") if original else None
+        try:
+            if ref is not None and os.fstat(ref.fileno()).st_size != lector.total:
+                raise ValueError("El tamaño no coincide con la ISO original")
+            for i, datos in enumerate(lector.bloques()):
+                h.update(datos)
+                if ref is not None and ref.read(len(datos)) != datos:
+                    raise ValueError(f"El bloque {i} no coincide con la ISO original")
+        finally:
+            if ref is not None:
+                ref.close()
+    if sha1 and h.hexdigest() != sha1:
+        raise ValueError("El SHA-1 de la CSO no coincide con el de la ISO escrita")
+    return h.hexdigest()
+
+
+def descomprimir_cso(cso: Path, destino: Path) -> None:
+    with LectorCSO(cso) as lector, SalidaFichero(destino) as salida:
+        for datos in lector.bloques():
+            salida.write(datos)
+
+
+def copiar(origen: Path, salida: Salida) -> None:
+    """Vuelca un fichero existente en una salida (cuando no hay tubería posible)."""
+    with open(origen, "rb") as f:
+        while True:
+            datos = f.read(LECTURA)
+            if not datos:
+                break
+            salida.write(datos)
+
+
+@contextmanager
+def tuberia(salida: Salida, directorio: Path) -> Iterator[Path]:
+    """Tubería con nombre cuyo contenido acaba en `salida`.
+
+    Se entrega la ruta para pasársela al productor (libray -o <ruta>). Al salir del
+    bloque se espera a que el lector termine; si falló al escribir en la salida se
+    relanza su excepción (el productor recibe EPIPE y termina con error).
+    """
+    if not TUBERIAS:
+        raise OSError("Este sistema no admite tuberías con nombre")
+    tmpdir = Path(tempfile.mkdtemp(prefix=".ps3_fifo_", dir=directorio))
+    fifo = tmpdir / "salida.iso"
+    os.mkfifo(fifo)
+    errores: List[BaseException] = []
+
+    def lector() -> None:
+        try:
+            with open(fifo, "rb") as f:
+                while True:
+                    datos = f.read(LECTURA)
+                    if not datos:
+                        break
+                    salida.write(datos)
+        except BaseException as e:
+            errores.append(e)
+
+    hilo = threading.Thread(target=lector, name="ps3-tuberia", daemon=True)
+    hilo.start()
+    try:
+        yield fifo
+    finally:
+        # Si el productor nunca llegó a abrir la tubería, el lector sigue esperando en
+        # open(): abrirla y cerrarla para escritura le entrega un EOF
+        while hilo.is_alive():
+            try:
+                os.close(os.open(fifo, os.O_WRONLY | os.O_NONBLOCK))
+            except OSError:
+                pass
+            hilo.join(0.1)
+        shutil.rmtree(tmpdir, ignore_errors=True)
+    if errores:
+        raise errores[0]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Compresión CSO de ISOs de PS3")
+    sub = parser.add_subparsers(dest="orden", required=True)
+    p = sub.add_parser("comprimir", help="ISO -> CSO")
+    p.add_argument("iso", type=Path)
+    p.add_argument("cso", type=Path)
+    p.add_argument("--bloque", type=int, default=BLOQUE_CSO)
+    p.add_argument("--nivel", type=int, default=NIVEL_CSO)
+    p.add_argument("--hilos", type=int, default=None)
+    p = sub.add_parser("descomprimir", help="CSO -> ISO")
+    p.add_argument("cso", type=Path)
+    p.add_argument("iso", type=Path)
+    p = sub.add_parser("verificar", help="Comprueba que la CSO se descomprime entera")
+    p.add_argument("cso", type=Path)
+    p.add_argument("--original", type=Path, help="ISO original con la que comparar byte a byte")
+    p = sub.add_parser("partir", help="Parte un fichero existente para FAT32")
+    p.add_argument("origen", type=Path)
+    p.add_argument("--tam", default="fat32", help="Tamaño de parte: fat32, 4G, 700M... (por defecto fat32)")
+    p.add_argument("--estilo", choices=ESTILOS_PARTES, default="numerico")
+    p = sub.add_parser("verificar-partes", help="Comprueba las partes con su manifiesto")
+    p.add_argument("manifiesto", type=Path)
+    p = sub.add_parser("unir", help="Une las partes en el fichero original")
+    p.add_argument("manifiesto", type=Path)
+    p.add_argument("destino", type=Path, nargs="?")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.orden == "comprimir":
+            with SalidaCSO(args.cso, args.iso.stat().st_size, args.bloque, args.nivel, args.hilos) as s:
+                copiar(args.iso, s)
+            print(f"✅ {args.cso}: {s.comprimidos / max(1, s.total):.1%} del tamaño original "
+                  f"(SHA-1 {s.sha1.hexdigest()})")
+        elif args.orden == "partir":
+            with SalidaPartes(args.origen, tamano_parte(args.tam), args.estilo) as s:
+                copiar(args.origen, s)
+            print(f"✅ {len(s.partes) or 1} parte(s); manifiesto: {ruta_manifiesto(args.origen)}")
+        elif args.orden == "verificar-partes":
+            errores = verificar_partes(args.manifiesto)
+            for e in errores:
+                print(f"❌ {e}")
+            if errores:
+                return 1
+            print(f"✅ {args.manifiesto}: todas las partes son correctas")
+        elif args.orden == "unir":
+            print(f"✅ {unir_partes(args.manifiesto, args.destino)}")
+        elif args.orden == "descomprimir":
+            descomprimir_cso(args.cso, args.iso)
+            print(f"✅ {args.iso}")
+        else:
+            print(f"✅ {args.cso} correcta (SHA-1 {verificar_cso(args.cso, args.original)})")
+    except (OSError, ValueError) as e:
+        print(f"[ERROR] {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sincronización incremental de una selección con una carpeta espejo
+
+Compara lo que debería haber (las entradas de una o varias listas PKG, o los
+ficheros de uno o varios items de archive.org) con lo que ya hay en la carpeta de
+destino, y solo descarga lo que falta o ha cambiado.
+
+En `<destino>/.ps3_sync.json` se guarda, por cada fichero sincronizado, su tamaño y
+fecha en disco y el validador del origen con el que se descargó (SHA-1/MD5 de
+archive.org, SHA-256 del volcado TSV o tamaño + Last-Modified del rastreador). En
+cada pasada:
+
+- Si el fichero no está, se descarga.
+- Si tamaño y fecha coinciden con el manifiesto, no se lee: solo se compara el
+  validador guardado con el de los metadatos en caché (pkg_meta.json o el item).
+  Así una pasada sin cambios sobre miles de ficheros es solo un stat por fichero.
+- Si no está en el manifiesto o se ha tocado, se comprueba con la huella del origen
+  (o el tamaño si no hay huella) y se adopta sin descargar si coincide.
+
+Con --verificar se recalculan las huellas de todo, con --podar se borran los
+ficheros sincronizados antes que ya no están en la selección (nunca los que no
+aparecen en el manifiesto) y con --simular solo se muestra el plan.
+
+Uso:
+    python3 ps3_sync.py pkg "~/.iaPS3/pkg/DLC´S/US.txt" --destino /mnt/ps3/dlc_us --podar
+    python3 ps3_sync.py pkg lista.txt --destino ~/PS3 --refrescar     # HEAD de lo caducado antes
+    python3 ps3_sync.py ia sony_playstation3_a "*.zip" --destino ~/espejo --simular
+    python3 ps3_sync.py ia sony_playstation3_a "Juego [BLES00001].zip" --item sony_playstation3_b --destino ~/espejo
+"""
+
+from __future__ import annotations
+import os
+import sys
+import json
+import time
+import fnmatch
+import hashlib
+import argparse
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import ps3_crawler
+
+MANIFIESTO = ".ps3_sync.json"
+VERSION = 1
+GUARDAR_CADA = 50
+LECTURA = 4 * 1024 * 1024
+
+
+class Deseado(NamedTuple):
+    ruta: str          # relativa al destino
+    origen: str        # URL del PKG o "<item>/<fichero>"
+    size: int          # 0 = desconocido
+    validador: str     # "" = sin metadatos todavía
+    hashes: Dict[str, str]
+
+
+class Plan(NamedTuple):
+    descargar: List[Tuple[Deseado, str]]  # (entrada, motivo)
+    al_dia: List[str]
+    adoptados: List[str]
+    podar: List[str]
+    fallidos: List[str]
+
+    def resumen(self) -> str:
+        return (f"📋 {len(self.al_dia)} al día, {len(self.adoptados)} ya estaban (adoptados), "
+                f"{len(self.descargar)} por descargar, {len(self.podar)} por borrar")
+
+
+def validador_pkg(info: Optional[Dict]) -> str:
+    """SHA-256 del volcado TSV o tamaño|Last-Modified del rastreo HEAD."""
+    info = info or {}
+    if info.get("sha256"):
+        return f"sha256:{info['sha256'].lower()}"
+    if info.get("status") not in (None, 200) or not info.get("size"):
+        return ""
+    return "|".join(str(p) for p in (info["size"], info.get("last_modified")) if p)
+
+
+def _tipo(validador: str) -> str:
+    """"sha256", "sha1", "md5" o "http" (tamaño|Last-Modified, tamaño|mtime)."""
+    tipo = validador.split(":", 1)[0]
+    return tipo if tipo in ("sha256", "sha1", "md5") else "http"
+
+
+def validador_ia(f: Dict) -> str:
+    for algoritmo in ("sha1", "md5"):
+        if f.get(algoritmo):
+            return f"{algoritmo}:{f[algoritmo].lower()}"
+    return "|".join(str(f[k]) for k in ("size", "mtime") if f.get(k))
+
+
+def deseados_pkg(entradas: List[Tuple[str, str]], meta: Optional[Dict[str, Dict]] = None) -> List[Deseado]:
+    """Entradas (nombre, url) de las listas PKG; el fichero se llama como en la URL."""
+    meta = ps3_crawler.obtener_meta() if meta is None else meta
+    deseados: Dict[str, Deseado] = {}
+    for _, url in entradas:
+        info = meta.get(url) or {}
+        hashes = {"sha256": info["sha256"].lower()} if info.get("sha256") else {}
+        ruta = os.path.basename(url.split("?", 1)[0])
+        deseados.setdefault(ruta, Deseado(ruta, url, int(info.get("size") or 0), validador_pkg(info), hashes))
+    return list(deseados.values())
+
+
+def _elegido(nombre: str, patron: str) -> bool:
+    """Nombre exacto o, si lleva comodines, patrón (los nombres con [...] valen tal cual)."""
+    return nombre == patron or (any(c in patron for c in "*?[") and fnmatch.fnmatchcase(nombre, patron))
+
+
+def deseados_ia(item_identifier: str, patrones: Optional[List[str]] = None) -> List[Deseado]:
+    """Ficheros de un item (todos, o los nombrados y los que casan con los patrones) en
+    <destino>/<item>/."""
+    import ps3IAPKGv1 as logic
+    deseados = []
+    usados = set()
+    for f in logic.obtener_item(item_identifier).files:
+        nombre = f.get("name")
+        elegido_por = [p for p in patrones or () if nombre and _elegido(nombre, p)]
+        if not nombre or (patrones and not elegido_por):
+            continue
+        usados.update(elegido_por)
+        hashes = {k: f[k].lower() for k in ("sha1", "md5") if f.get(k)}
+        deseados.append(Deseado(f"{item_identifier}/{nombre}", f"{item_identifier}/{nombre}",
+                                int(f.get("size") or 0), validador_ia(f), hashes))
+    for p in patrones or ():
+        if p not in usados:
+            print(f"⚠️ {item_identifier}: nada coincide con {p}")
+    return deseados
+
+
+def _huella(path: Path, algoritmo: str) -> str:
+    h = hashlib.new(algoritmo)
+    with open(path, "rb") as f:
+        while True:
+            datos = f.read(LECTURA)
+            if not datos:
+                break
+            h.update(datos)
+    return h.hexdigest()
+
+
+def coincide(path: Path, d: Deseado, size: int) -> bool:
+    """El fichero local es el del origen: por huella si se conoce, si no por tamaño."""
+    if d.size and size != d.size:
+        return False
+    for algoritmo in ("sha256", "sha1", "md5"):
+        if algoritmo in d.hashes:
+            return _huella(path, algoritmo) == d.hashes[algoritmo]
+    return bool(d.size)
+
+
+class Manifiesto:
+    """Lo que se sincronizó en una carpeta: {ruta: {size, mtime_ns, validador, origen}}."""
+
+    def __init__(self, destino: Path):
+        self.path = destino / MANIFIESTO
+        self.entradas: Dict[str, Dict] = {}
+        self.cambiado = False
+        self._lock = threading.Lock()
+        try:
+            datos = json.loads(self.path.read_text(encoding="utf-8"))
+            if datos.get("version") == VERSION:
+                self.entradas = datos["entradas"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def anotar(self, d: Deseado, st: os.stat_result) -> None:
+        with self._lock:
+            self.entradas[d.ruta] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns,
+                                     "validador": d.validador, "origen": d.origen}
+            self.cambiado = True
+
+    def quitar(self, ruta: str) -> None:
+        with self._lock:
+            self.entradas.pop(ruta, None)
+            self.cambiado = True
+
+    def guardar(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with self._lock:
+            contenido = json.dumps({"version": VERSION, "entradas": self.entradas},
+                                   ensure_ascii=False, separators=(",", ":"))
+            self.cambiado = False
+        tmp.write_text(contenido, encoding="utf-8")
+        os.replace(tmp, self.path)
+
+
+def planificar(deseados: List[Deseado], destino: Path, manifiesto: Manifiesto,
+               podar: bool = False, verificar: bool = False) -> Plan:
+    """Decide qué descargar. Adopta en el manifiesto lo que ya estaba bien en disco."""
+    plan = Plan([], [], [], [], [])
+    for d in deseados:
+        path = destino / d.ruta
+        try:
+            st = path.stat()
+        except OSError:
+            plan.descargar.append((d, "falta"))
+            continue
+        anotado = manifiesto.entradas.get(d.ruta)
+        sin_tocar = anotado is not None and (anotado["size"], anotado["mtime_ns"]) == (st.st_size, st.st_mtime_ns)
+        if sin_tocar and not verificar:
+            # Camino rápido: ni se lee el fichero, solo cuenta si el origen ha cambiado
+            guardado = anotado["validador"]
+            if guardado == d.validador or not d.validador:
+                plan.al_dia.append(d.ruta)
+                continue
+            if guardado and _tipo(guardado) == _tipo(d.validador):
+                plan.descargar.append((d, "cambiado en el origen"))
+                continue
+            # Sin validador al descargarlo, o de otro tipo (p. ej. tras importar el volcado
+            # TSV): se comprueba contra los metadatos nuevos en vez de descargar otra vez
+        if coincide(path, d, st.st_size) or (not d.size and not d.hashes and not verificar):
+            # Sin tamaño ni huella del origen no hay con qué comparar: se da por bueno
+            manifiesto.anotar(d, st)
+            (plan.al_dia if sin_tocar else plan.adoptados).append(d.ruta)
+        else:
+            plan.descargar.append((d, "cambiado en el origen" if sin_tocar else "distinto en disco"))
+    if podar:
+        rutas = {d.ruta for d in deseados}
+        plan.podar.extend(r for r in sorted(manifiesto.entradas) if r not in rutas)
+    return plan
+
+
+def sincronizar(deseados: List[Deseado], destino: Path,
+                descargar: Callable[[Deseado, Path], bool],
+                podar: bool = False, verificar: bool = False, simular: bool = False,
+                hilos: int = 1, informar: Callable[[str], None] = print) -> Plan:
+    """Descarga lo que falta o ha cambiado con `descargar(entrada, ruta_local)` y
+    anota cada fichero terminado en el manifiesto. Devuelve el plan ejecutado."""
+    destino.mkdir(parents=True, exist_ok=True)
+    manifiesto = Manifiesto(destino)
+    t0 = time.perf_counter()
+    plan = planificar(deseados, destino, manifiesto, podar=podar, verificar=verificar)
+    informar(f"{plan.resumen()} ({time.perf_counter() - t0:.1f} s)")
+    if simular:
+        for d, motivo in plan.descargar:
+            informar(f"  📥 {d.ruta} ({motivo})")
+        for ruta in plan.podar:
+            informar(f"  🗑️ {ruta}")
+        return plan
+
+    for ruta in plan.podar:
+        (destino / ruta).unlink(missing_ok=True)
+        manifiesto.quitar(ruta)
+        informar(f"🗑️ Borrado: {ruta}")
+    if manifiesto.cambiado:
+        manifiesto.guardar()
+
+    hechos = [0]
+    lock = threading.Lock()
+
+    def tarea(d: Deseado, motivo: str) -> bool:
+        path = destino / d.ruta
+        informar(f"📥 {d.ruta} ({motivo})")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if not descargar(d, path) or not path.exists():
+            with lock:
+                plan.fallidos.append(d.ruta)
+            return False
+        manifiesto.anotar(d, path.stat())
+        with lock:
+            hechos[0] += 1
+            if hechos[0] % GUARDAR_CADA == 0:
+                manifiesto.guardar()
+        return True
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, hilos)) as pool:
+            list(pool.map(lambda x: tarea(*x), plan.descargar))
+    finally:
+        if manifiesto.cambiado:
+            manifiesto.guardar()
+    if not plan.descargar:
+        informar("✅ Todo al día")
+        return plan
+    fallos = len(plan.fallidos)
+    informar(f"{'✅' if not fallos else '⚠️'} Sincronizado: {len(plan.descargar) - fallos} descargados"
+             + (f", {fallos} con error" if fallos else ""))
+    return plan
+
+
+def descargar_pkg(d: Deseado, path: Path) -> bool:
+    import ps3IAPKGv1 as logic
+    return logic.descargar_pkg(d.origen, path, tam_parte=0)
+
+
+def descargar_ia(d: Deseado, path: Path) -> bool:
+    import ps3IAPKGv1 as logic
+    item, nombre = d.origen.split("/", 1)
+    # descargar_archivo escribe en <dest_dir>/<item>/<fichero>
+    return logic.descargar_archivo(item, nombre, path.parents[len(Path(d.ruta).parts) - 1])
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Sincronización incremental con una carpeta espejo")
+    sub = parser.add_subparsers(dest="orden", required=True)
+    p = sub.add_parser("pkg", help="Entradas de una o varias listas .txt del catálogo")
+    p.add_argument("listas", type=Path, nargs="+")
+    p.add_argument("--refrescar", action="store_true",
+                   help="Comprueba con HEAD los enlaces nuevos o caducados antes de comparar")
+    p = sub.add_parser("ia", help="Ficheros de uno o varios items de archive.org")
+    p.add_argument("item")
+    p.add_argument("ficheros", nargs="*", help="Nombres o patrones (\"*.zip\"); sin ninguno, todo el item")
+    p.add_argument("--item", dest="mas_items", action="append", default=[],
+                   help="Otro item con la misma selección (se puede repetir)")
+    for p in sub.choices.values():
+        p.add_argument("--destino", type=Path, required=True)
+        p.add_argument("--podar", action="store_true", help="Borra lo sincronizado que ya no está en la selección")
+        p.add_argument("--verificar", action="store_true", help="Recalcula las huellas aunque no haya cambios")
+        p.add_argument("--simular", action="store_true", help="Solo muestra qué se haría")
+        p.add_argument("--hilos", type=int, default=1, help="Descargas simultáneas")
+    args = parser.parse_args(argv)
+
+    destino = args.destino.expanduser().resolve()
+    if args.orden == "pkg":
+        import ps3IAPKGv1 as logic
+        entradas = [e for lista in args.listas for e in logic.parse_pkg_txt(lista.expanduser())]
+        if args.refrescar:
+            print("🔎 Comprobando enlaces nuevos o caducados...")
+            ps3_crawler.rastrear([url for _, url in entradas])
+        deseados = deseados_pkg(entradas)
+        descargar = descargar_pkg
+    else:
+        items = list(dict.fromkeys([args.item, *args.mas_items]))
+        deseados = [d for item in items for d in deseados_ia(item, args.ficheros)]
+        descargar = descargar_ia
+    if not deseados:
+        print("[ERROR] La selección está vacía")
+        return 1
+    plan = sincronizar(deseados, destino, descargar, podar=args.podar, verificar=args.verificar,
+                       simular=args.simular, hilos=args.hilos)
+    return 1 if plan.fallidos else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
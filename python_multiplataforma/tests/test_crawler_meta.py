@@ -0,0 +1,57 @@
+"""Regresión: rastrear no debe borrar lo que el importador TSV guardó en pkg_meta.json."""
+
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import ps3_crawler
+import ps3_importar_tsv
+
+URL = "http://zeus.dl.playstation.net/cdn/UP0001/BLUS30001_00/juego.pkg"
+SHA256 = "ab" * 32
+
+
+class ImportarYRastrear(unittest.TestCase):
+    def test_sha256_sobrevive_al_rastreo(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            tsv = tmp / "PS3_GAMES.tsv"
+            tsv.write_text("Title ID\tRegion\tName\tPKG direct link\tContent ID\tFile Size\tSHA256\n"
+                           f"BLUS30001\tUS\tJuego\t{URL}\tUP0001-BLUS30001_00-JUEGO00000000000\t123\t{SHA256}\n",
+                           encoding="utf-8")
+            meta = {}
+            with mock.patch.object(ps3_crawler, "_meta_global", meta), \
+                    mock.patch.object(ps3_crawler, "guardar_meta") as guardar:
+                ps3_importar_tsv.importar(tsv, "Juegos", pkg_dir=tmp / "pkg", simular=True)
+                self.assertEqual(meta, {})
+                guardar.assert_not_called()
+                ps3_importar_tsv.importar(tsv, "Juegos", pkg_dir=tmp / "pkg")
+                guardar.assert_called_once_with(meta)
+            self.assertEqual(meta[URL]["sha256"], SHA256)
+            self.assertEqual(meta[URL]["size"], 123)
+
+            cabecera = {"checked": 1, "status": 200, "size": 456, "last_modified": "ayer"}
+            with mock.patch.object(ps3_crawler, "consultar", return_value=cabecera):
+                ps3_crawler.rastrear([URL], meta, rps=0, meta_path=tmp / "pkg_meta.json")
+
+            info = meta[URL]
+            self.assertEqual(info["sha256"], SHA256)
+            self.assertEqual(info["title_id"], "BLUS30001")
+            self.assertEqual(info["content_id"], "UP0001-BLUS30001_00-JUEGO00000000000")
+            self.assertEqual((info["status"], info["size"]), (200, 456))
+
+            # Un fallo posterior no arrastra el Last-Modified de la comprobación anterior
+            info["checked"] = 0
+            with mock.patch.object(ps3_crawler, "consultar",
+                                   return_value={"checked": 2, "status": 0, "error": "ConnectTimeout"}):
+                ps3_crawler.rastrear([URL], meta, rps=0, meta_path=tmp / "pkg_meta.json")
+            self.assertNotIn("last_modified", meta[URL])
+            self.assertEqual(meta[URL]["sha256"], SHA256)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+"""Motor del demonio: cancelar un trabajo que espera espacio y olvidar los terminados."""
+
+import sys
+import shutil
+import time
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import ps3IAPKGv1 as logic
+import ps3_demonio
+import ps3_planificador
+
+
+def _esperar(condicion, segundos=5.0):
+    fin = time.monotonic() + segundos
+    while not condicion():
+        if time.monotonic() > fin:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+class MotorDemonio(unittest.TestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp, True)
+        self.soltar = threading.Event()
+        self.addCleanup(self.soltar.set)
+        for objetivo, nombre, valor in (
+                (logic.ps3_indice, "obtener_indice", lambda: None),
+                (logic, "descargar_pkg", lambda *a, **k: self.soltar.wait(5)),
+                (logic, "descargar_archivo", mock.Mock(return_value=False)),
+                (logic, "tamanos_archivos_ia", lambda item, nombres: {n: 40 for n in nombres})):
+            parche = mock.patch.object(objetivo, nombre, valor)
+            parche.start()
+            self.addCleanup(parche.stop)
+
+    def _pkg(self, motor, n):
+        return motor.enviar({"tipo": "pkg", "url": f"http://zeus.dl.playstation.net/cdn/x/juego{n}.pkg",
+                             "destino": str(self.tmp)})
+
+    def test_cancelar_mientras_espera_espacio(self):
+        motor = ps3_demonio.Motor(descargas=1, raices=[self.tmp])
+        with mock.patch.object(ps3_planificador, "espacio_libre", return_value=ps3_planificador.MARGEN + 100):
+            presupuesto = ps3_planificador.PresupuestoDisco(self.tmp, self.tmp)
+        # Otro trabajo ocupa el disco: este no cabe hasta que termine
+        self.assertTrue(presupuesto.reservar(40))
+        motor._presupuestos[(str(self.tmp), str(self.tmp))] = presupuesto
+        t = motor.enviar({"tipo": "ia", "item": "item", "fichero": "juego.zip",
+                          "dest_dir": str(self.tmp), "final_dir": str(self.tmp)})
+        self.assertTrue(_esperar(lambda: t.estado == "esperando_espacio"))
+
+        motor.cancelar(t.id)
+        self.assertTrue(_esperar(lambda: t.estado == "cancelado", 2), t.estado)
+        logic.descargar_archivo.assert_not_called()
+        # El hilo de descarga queda libre para el siguiente
+        siguiente = self._pkg(motor, 0)
+        self.assertTrue(_esperar(lambda: siguiente.estado == "descargando"))
+
+    def test_historial_acotado(self):
+        motor = ps3_demonio.Motor(descargas=1, raices=[self.tmp], historial=2)
+        activo = self._pkg(motor, 0)
+        self.assertTrue(_esperar(lambda: activo.estado == "descargando"))
+        en_cola = [self._pkg(motor, n) for n in range(1, 5)]
+        for t in en_cola:
+            motor.cancelar(t.id)
+            time.sleep(0.01)
+        self.assertEqual([t.id for t in motor.trabajos()], [activo.id] + [t.id for t in en_cola[-2:]])
+        # Los que siguen en marcha nunca se olvidan
+        self.assertIs(motor.trabajo(activo.id), activo)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+"""IndiceCatalogo: el pack de un Title ID reúne juego y extras de todas las listas."""
+
+import sys
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import ps3_indice
+
+CDN = "http://zeus.dl.playstation.net/cdn"
+LISTAS = {
+    "Juegos/USA.txt": [("Juego - BLUS30074", f"{CDN}/UP0002/BLUS30074_00/juego.pkg"),
+                       ("Otro - BLUS30001", f"{CDN}/UP0001/BLUS30001_00/otro.pkg")],
+    "Juegos/EUR.txt": [("Juego - BLES00001", f"{CDN}/EP0002/BLES00001_00/juego.pkg")],
+    "DLC´S/USA.txt": [("Mapa 2 - BLUS30074", f"{CDN}/UP0002/BLUS30074_00/mapa2.pkg"),
+                      ("Mapa 1 - BLUS30074", f"{CDN}/UP0002/BLUS30074_00/mapa1.pkg")],
+    "Temas/USA.txt": [("Tema", f"{CDN}/UP0002/BLUS30074_00/tema.p3t.pkg")],
+    "Avatares/JAP.txt": [("Avatar - BLUS30074", "http://otro.servidor/avatar.pkg")],
+    # Copia antigua en una subcarpeta: no debe duplicar entradas
+    "Juegos/viejo/USA.txt": [("Juego - BLUS30074", f"{CDN}/UP0002/BLUS30074_00/juego.pkg")],
+}
+
+
+class PackPorTitleID(unittest.TestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp, True)
+        for ruta, bloques in LISTAS.items():
+            txt = self.tmp / ruta
+            txt.parent.mkdir(parents=True, exist_ok=True)
+            txt.write_text("".join(f"{n}\n{u}\n\n" for n, u in bloques), encoding="utf-8")
+        meta = {f"{CDN}/UP0002/BLUS30074_00/mapa1.pkg": {"content_id": "UP0002-BLUS30074_00-MAPA000000000001"}}
+        self.indice = ps3_indice.IndiceCatalogo.construir(self.tmp, meta=meta)
+
+    def test_pack(self):
+        pack = self.indice.pack("blus30074")
+        self.assertEqual([(e.categoria, e.region, e.nombre) for e in pack], [
+            ("Juegos", "USA", "Juego"),
+            ("DLC´S", "USA", "Mapa 1"),
+            ("DLC´S", "USA", "Mapa 2"),
+            ("Temas", "USA", "Tema"),
+            ("Avatares", "JAP", "Avatar"),
+        ])
+        self.assertEqual(pack[1].content, "UP0002-BLUS30074")
+        self.assertEqual(pack[-1].content, "")
+
+    def test_prefijo_de_content_id(self):
+        # Sin la CDN no se conoce el editor: el avatar solo sale por Title ID
+        claves = ("UP0002-BLUS30074", "UP0002-BLUS30074_00-MAPA000000000001")
+        for clave in claves:
+            self.assertEqual([e.nombre for e in self.indice.pack(clave)],
+                             ["Juego", "Mapa 1", "Mapa 2", "Tema"])
+        self.assertEqual(self.indice.pack("EP0002-BLES00001")[0].region, "EUR")
+        self.assertEqual(self.indice.pack("BLUS99999"), [])
+        self.assertEqual(self.indice.pack("sin clave"), [])
+
+    def test_guardar_y_cargar(self):
+        indice_file = self.tmp.parent / f"{self.tmp.name}.json"
+        self.addCleanup(indice_file.unlink, True)
+        self.indice.guardar(indice_file)
+        cargado = ps3_indice.IndiceCatalogo.cargar(self.tmp, indice_file)
+        self.assertEqual(cargado.pack("BLUS30074"), self.indice.pack("BLUS30074"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+"""Log estructurado: un fichero por proceso y consulta mezclada por hora."""
+
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import ps3_log
+
+
+def _escribir(path: Path, registros) -> None:
+    path.write_text("".join(json.dumps(r) + "\n" for r in registros), encoding="utf-8")
+
+
+class LogPorProceso(unittest.TestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp, True)
+        parche = mock.patch.object(ps3_log, "LOGS_DIR", self.tmp)
+        parche.start()
+        self.addCleanup(parche.stop)
+
+    def test_consulta_mezcla_procesos_y_rotados(self):
+        cli = "ps3_downloader-20260101_100000-111.jsonl"
+        gui = "ps3_downloader-20260101_100001-222.jsonl"
+        _escribir(self.tmp / f"{cli}.2", [{"ts": 1, "job": "a", "fase": "descarga"}])
+        _escribir(self.tmp / f"{cli}.1", [{"ts": 3, "job": "a", "fase": "libray"}])
+        _escribir(self.tmp / cli, [{"ts": 6, "job": "a", "fase": "libray", "nivel": "error"}])
+        _escribir(self.tmp / gui, [{"ts": 2, "job": "b", "fase": "descarga"},
+                                   {"ts": 5, "job": "b", "fase": "libray"}])
+        # El fichero compartido de antes también se lee
+        _escribir(self.tmp / "ps3_downloader.jsonl", [{"ts": 4, "job": "c", "fase": "pkg"}])
+        (self.tmp / "ps3_downloader.jsonl.part").write_text("no es un log\n", encoding="utf-8")
+
+        self.assertEqual([r["ts"] for r in ps3_log.leer_registros()], [1, 2, 3, 4, 5, 6])
+        self.assertEqual([r["ts"] for r in ps3_log.leer_registros(fase="libray")], [3, 5, 6])
+        self.assertEqual([r["ts"] for r in ps3_log.leer_registros(job="a", solo_fallos=True)], [6])
+
+    def test_fichero_propio_y_poda(self):
+        viejo = self.tmp / "ps3_downloader-20200101_000000-1.jsonl"
+        _escribir(viejo, [{"ts": 1}])
+        antes = time.time() - (ps3_log.RETENCION_DIAS + 1) * 86400
+        os.utime(viejo, (antes, antes))
+        ajeno = self.tmp / "gui_historial.log"
+        ajeno.write_text("x", encoding="utf-8")
+        os.utime(ajeno, (antes, antes))
+
+        ps3_log.cerrar()  # por si otra prueba dejó el escritor en marcha
+        ps3_log.registro("job", "prueba", "hola")
+        ps3_log.cerrar()
+        self.addCleanup(setattr, ps3_log, "log_file", None)
+
+        self.assertTrue(ps3_log.log_file.name.endswith(f"-{os.getpid()}.jsonl"))
+        self.assertEqual(ps3_log.log_file.parent, self.tmp)
+        self.assertFalse(viejo.exists())
+        self.assertTrue(ajeno.exists())
+        self.assertEqual([r["msg"] for r in ps3_log.leer_registros(fase="prueba")], ["hola"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+"""Regresión: fases solapadas con --profile no deben romper por el muestreo de cProfile."""
+
+import sys
+import cProfile
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import ps3_perfil
+
+
+class MuestreoSolapado(unittest.TestCase):
+    def setUp(self):
+        for nombre, valor in (("ACTIVO", True), ("_muestreo", 1), ("_contador_fases", 0),
+                              ("_muestra", None), ("_eventos", []), ("_filas", {}), ("_perfiles", [])):
+            parche = mock.patch.object(ps3_perfil, nombre, valor)
+            parche.start()
+            self.addCleanup(parche.stop)
+
+    def _tramos(self):
+        return {e["tid"]: e for e in ps3_perfil._eventos if e.get("ph") == "X"}
+
+    def test_una_muestra_por_proceso(self):
+        dentro, seguir = threading.Event(), threading.Event()
+        errores = []
+
+        def primera():
+            try:
+                with ps3_perfil.tramo("a", "descarga"):
+                    dentro.set()
+                    seguir.wait(5)
+            except Exception as e:
+                errores.append(e)
+
+        hilo = threading.Thread(target=primera)
+        hilo.start()
+        self.assertTrue(dentro.wait(5))
+        with ps3_perfil.tramo("b", "libray"):
+            pass
+        seguir.set()
+        hilo.join(5)
+
+        self.assertEqual(errores, [])
+        self.assertIsNone(ps3_perfil._muestra)
+        tramos = self._tramos()
+        self.assertEqual(len(tramos), 2)
+        muestreados = [e for e in tramos.values() if "cprofile" in e["args"]]
+        self.assertEqual(len(muestreados), 1)
+        self.assertEqual(len(ps3_perfil._perfiles), 1)
+
+    def test_otro_perfilador_activo(self):
+        with mock.patch.object(cProfile.Profile, "enable",
+                               side_effect=ValueError("Another profiling tool is already active")):
+            with ps3_perfil.tramo("a", "descarga") as args:
+                args["bytes"] = 1
+        self.assertIsNone(ps3_perfil._muestra)
+        [evento] = self._tramos().values()
+        self.assertEqual(evento["args"]["bytes"], 1)
+        self.assertNotIn("cprofile", evento["args"])
+        # La siguiente fase ya puede muestrearse
+        with ps3_perfil.tramo("a", "descarga"):
+            pass
+        self.assertEqual(len(ps3_perfil._perfiles), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
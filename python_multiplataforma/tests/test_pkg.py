@@ -0,0 +1,127 @@
+"""ExtractorPKG: extraer en streaming un PKG retail sintético."""
+
+import sys
+import shutil
+import struct
+import hashlib
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import ps3_pkg
+
+CONTENT_ID = "UP0001-BLUS30001_00-JUEGOPRUEBA00001"
+IV = bytes(range(0xF0, 0x100))
+DATA_OFFSET = 0xC0
+FICHEROS = [
+    ("USRDIR", b"", ps3_pkg.TIPO_CARPETA),
+    ("PARAM.SFO", b"\0PSF" + bytes(range(200)), 0x03),
+    ("USRDIR/EBOOT.BIN", b"SCE\0" + b"eboot" * 3000, 0x03),
+    ("USRDIR/vacio.txt", b"", 0x03),
+    ("../fuera.txt", b"no sale de la carpeta", 0x03),
+]
+
+
+def _flujo_aes(n: int) -> bytes:
+    """Flujo AES-CTR hecho a mano con AES-ECB: contador = IV + nº de bloque."""
+    try:
+        from Crypto.Cipher import AES
+        cifrar = AES.new(ps3_pkg.CLAVE_PS3, AES.MODE_ECB).encrypt
+    except ImportError:
+        from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+        cifrar = Cipher(algorithms.AES(ps3_pkg.CLAVE_PS3), modes.ECB()).encryptor().update
+    iv = int.from_bytes(IV, "big")
+    contadores = b"".join(((iv + i) % (1 << 128)).to_bytes(16, "big") for i in range((n + 15) // 16))
+    return cifrar(contadores)[:n]
+
+
+def _alinear(n: int) -> int:
+    return (n + 15) // 16 * 16
+
+
+def pkg_retail() -> bytes:
+    tabla = ps3_pkg.PKG_ENTRADA.size * len(FICHEROS)
+    nombres, pos = [], tabla
+    for nombre, _, _ in FICHEROS:
+        nombres.append((pos, len(nombre.encode())))
+        pos = _alinear(pos + len(nombre.encode()))
+    datos, entradas = [], []
+    for (nombre, contenido, flags), (n_off, n_size) in zip(FICHEROS, nombres):
+        entradas.append(ps3_pkg.PKG_ENTRADA.pack(n_off, n_size, pos, len(contenido), flags, 0))
+        datos.append((pos, contenido))
+        pos = _alinear(pos + len(contenido))
+    plano = bytearray(pos)
+    plano[:tabla] = b"".join(entradas)
+    for (n_off, n_size), (nombre, _, _) in zip(nombres, FICHEROS):
+        plano[n_off:n_off + n_size] = nombre.encode()
+    for d_off, contenido in datos:
+        plano[d_off:d_off + len(contenido)] = contenido
+    cifrado = bytes(a ^ b for a, b in zip(plano, _flujo_aes(len(plano))))
+    # Tras los datos va la firma del PKG, que el extractor ignora
+    total = DATA_OFFSET + len(cifrado) + 0x60
+    cabecera = ps3_pkg.PKG_CABECERA.pack(ps3_pkg.PKG_MAGIA, 0x8000, ps3_pkg.TIPO_PS3, 0xC0, 0, 0,
+                                         len(FICHEROS), total, DATA_OFFSET, len(cifrado),
+                                         CONTENT_ID.encode(), b"\x11" * 16, IV)
+    return cabecera.ljust(DATA_OFFSET, b"\0") + cifrado + b"\xEE" * 0x60
+
+
+@unittest.skipIf(ps3_pkg._aes_ctr is None, "sin pycryptodome ni cryptography")
+class ExtraerRetail(unittest.TestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp, True)
+        self.pkg = pkg_retail()
+        # Tareas pequeñas y no múltiplo de 16: trozos que empiezan a mitad de bloque AES
+        parche = mock.patch.object(ps3_pkg, "TAREA", 1000)
+        parche.start()
+        self.addCleanup(parche.stop)
+
+    def _extraer(self, datos: bytes, trozo: int = 777, **kwargs) -> ps3_pkg.ExtractorPKG:
+        with ps3_pkg.ExtractorPKG(self.tmp, hilos=3, **kwargs) as extractor:
+            for i in range(0, len(datos), trozo):
+                extractor.write(datos[i:i + trozo])
+        return extractor
+
+    def test_cabecera(self):
+        cab = ps3_pkg.leer_cabecera(self.pkg)
+        self.assertFalse(cab.debug)
+        self.assertEqual(cab.content_id, CONTENT_ID)
+        self.assertEqual(cab.title_id, "BLUS30001")
+        with self.assertRaises(ValueError):
+            ps3_pkg.leer_cabecera(b"\0" * len(self.pkg))
+
+    def test_extraer(self):
+        extractor = self._extraer(self.pkg, sha256=hashlib.sha256(self.pkg).hexdigest())
+        carpeta = self.tmp / CONTENT_ID
+        self.assertEqual(extractor.carpeta, carpeta)
+        for nombre, contenido, flags in FICHEROS:
+            ruta = carpeta / nombre.replace("../", "")
+            if flags == ps3_pkg.TIPO_CARPETA:
+                self.assertTrue(ruta.is_dir())
+            else:
+                self.assertEqual(ruta.read_bytes(), contenido, nombre)
+        self.assertFalse((self.tmp / "fuera.txt").exists())
+        self.assertFalse((self.tmp / f"{CONTENT_ID}.part").exists())
+
+    def test_byte_a_byte_y_de_golpe(self):
+        for trozo in (1, len(self.pkg)):
+            self._extraer(self.pkg, trozo)
+            eboot = self.tmp / CONTENT_ID / "USRDIR" / "EBOOT.BIN"
+            self.assertEqual(eboot.read_bytes(), FICHEROS[2][1])
+
+    def test_sha256_distinto(self):
+        with self.assertRaises(ValueError):
+            self._extraer(self.pkg, sha256="0" * 64)
+        self.assertEqual(list(self.tmp.iterdir()), [])
+
+    def test_incompleto(self):
+        with self.assertRaises(ValueError):
+            self._extraer(self.pkg[:-200])
+        self.assertEqual(list(self.tmp.iterdir()), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+"""Planificador: orden de mayor a menor, picos, omitidos y reservas de PresupuestoDisco."""
+
+import sys
+import time
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import ps3_planificador as pl
+from ps3_planificador import Trabajo
+
+TEMP, FINAL = Path("/temp"), Path("/final")
+
+
+class Discos:
+    """Espacio libre (ya sin el margen) y sistema de ficheros de cada carpeta."""
+
+    def __init__(self, test: unittest.TestCase, libre: dict, fs: dict):
+        for nombre, valores in (("espacio_libre", {p: n + pl.MARGEN for p, n in libre.items()}),
+                                ("id_fs", fs)):
+            parche = mock.patch.object(pl, nombre, side_effect=lambda p, v=valores: v[Path(p)])
+            parche.start()
+            test.addCleanup(parche.stop)
+
+
+class Planificar(unittest.TestCase):
+    def test_mismo_disco_de_mayor_a_menor(self):
+        Discos(self, {TEMP: 100, FINAL: 100}, {TEMP: 1, FINAL: 1})
+        plan = pl.planificar([Trabajo("b", 10), Trabajo("a", 40), Trabajo("?", 0), Trabajo("c", 30)],
+                             TEMP, FINAL)
+        self.assertEqual([t.nombre for t in plan.orden], ["a", "c", "b", "?"])
+        self.assertTrue(plan.mismo_fs)
+        self.assertTrue(plan.factible)
+        self.assertEqual(plan.desconocidos, ["?"])
+        # Pico: lo ya desencriptado (40) + cifrada y salida del segundo (2×30)
+        self.assertEqual((plan.pico_temp, plan.pico_final), (100, 100))
+
+    def test_mismo_disco_omite_lo_que_no_cabe(self):
+        Discos(self, {TEMP: 100, FINAL: 100}, {TEMP: 1, FINAL: 1})
+        plan = pl.planificar([Trabajo("grande", 60), Trabajo("a", 40), Trabajo("b", 35)], TEMP, FINAL)
+        self.assertEqual([t.nombre for t in plan.orden], ["a"])
+        self.assertEqual([t.nombre for t in plan.omitidos], ["grande", "b"])
+        self.assertFalse(plan.factible)
+        self.assertIn("grande", plan.resumen())
+
+    def test_discos_distintos(self):
+        Discos(self, {TEMP: 50, FINAL: 70}, {TEMP: 1, FINAL: 2})
+        plan = pl.planificar([Trabajo("x", 60), Trabajo("a", 40), Trabajo("b", 30), Trabajo("c", 10)],
+                             TEMP, FINAL)
+        self.assertFalse(plan.mismo_fs)
+        # x no cabe en la temporal; c ya no cabe en la final tras a y b
+        self.assertEqual([t.nombre for t in plan.orden], ["a", "b"])
+        self.assertEqual([t.nombre for t in plan.omitidos], ["x", "c"])
+        self.assertEqual((plan.pico_temp, plan.pico_final), (40, 70))
+
+
+class Reservas(unittest.TestCase):
+    def _presupuesto(self, libre: int, mismo_fs: bool = True) -> pl.PresupuestoDisco:
+        Discos(self, {TEMP: libre, FINAL: libre}, {TEMP: 1, FINAL: 1 if mismo_fs else 2})
+        return pl.PresupuestoDisco(TEMP, FINAL)
+
+    def test_reserva_espera_a_que_libray_termine(self):
+        p = self._presupuesto(100)
+        self.assertTrue(p.reservar(40))          # 80 en el mismo disco
+        self.assertFalse(p.reservar(20, timeout=0.05))
+        p.confirmar(40, ok=True)                 # queda la salida (40) y se borra la cifrada
+        self.assertTrue(p.reservar(20, timeout=0.05))
+        # 40 permanentes + 40 reservados: 2×15 ya no cabe hasta liberar
+        self.assertFalse(p.reservar(15, timeout=0.05))
+        self.assertTrue(p.reservar(10, timeout=0.05))
+
+    def test_nunca_cabe_no_espera(self):
+        p = self._presupuesto(100)
+        self.assertTrue(p.reservar(30))
+        p.confirmar(30, ok=False)                # libray falló: queda la cifrada
+        inicio = time.monotonic()
+        self.assertFalse(p.reservar(40))         # 80 > 100 - 30, aunque se libere lo reservado
+        self.assertLess(time.monotonic() - inicio, 0.5)
+
+    def test_cancelar_despierta_a_quien_espera(self):
+        p = self._presupuesto(100)
+        self.assertTrue(p.reservar(50))
+        resultado = []
+        hilo = threading.Thread(target=lambda: resultado.append(p.reservar(30, timeout=5)))
+        hilo.start()
+        time.sleep(0.05)
+        p.cancelar(50)
+        hilo.join(5)
+        self.assertEqual(resultado, [True])
+
+    def test_abandonar(self):
+        p = self._presupuesto(100)
+        self.assertTrue(p.reservar(50))
+        abandonar = threading.Event()
+        threading.Timer(0.1, abandonar.set).start()
+        self.assertFalse(p.reservar(30, abandonar=abandonar))
+
+    def test_discos_distintos(self):
+        p = self._presupuesto(100, mismo_fs=False)
+        self.assertTrue(p.reservar(60))          # 60 en cada disco
+        self.assertFalse(p.reservar(50, timeout=0.05))
+        self.assertTrue(p.reservar(40, timeout=0.05))
+
+
+if __name__ == "__main__":
+    unittest.main()
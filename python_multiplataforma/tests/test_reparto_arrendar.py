@@ -0,0 +1,83 @@
+"""Regresiones del coordinador: arriendos que no llegan al trabajador y estados de su latido."""
+
+import io
+import sys
+import json
+import time
+import socket
+import struct
+import threading
+import unittest
+import contextlib
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import ps3_reparto
+
+
+def _puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class ArrendarDesconectado(unittest.TestCase):
+    def setUp(self):
+        self.coordinador = ps3_reparto.Coordinador(arriendo=600)
+        self.puerto = _puerto_libre()
+        with contextlib.redirect_stdout(io.StringIO()):
+            threading.Thread(target=ps3_reparto.servir, args=(self.coordinador, "127.0.0.1", self.puerto, ""),
+                             daemon=True).start()
+        fin = time.monotonic() + 5
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", self.puerto), timeout=1).close()
+                break
+            except OSError:
+                if time.monotonic() > fin:
+                    raise
+                time.sleep(0.05)
+
+    def test_trabajo_vuelve_a_la_cola(self):
+        cuerpo = json.dumps({"trabajador": "w1", "max": 1, "espera": 5}).encode("utf-8")
+        s = socket.create_connection(("127.0.0.1", self.puerto))
+        s.sendall(b"POST /arrendar HTTP/1.1\r\nHost: 127.0.0.1\r\nContent-Type: application/json\r\n"
+                  + f"Content-Length: {len(cuerpo)}\r\n\r\n".encode("ascii") + cuerpo)
+        # El coordinador está esperando trabajos (long polling): el trabajador se va con un RST
+        time.sleep(0.3)
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+        s.close()
+        time.sleep(0.1)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            t = self.coordinador.enviar({"tipo": "pkg", "url": "http://zeus.dl.playstation.net/cdn/x/juego.pkg"})
+            fin = time.monotonic() + 5
+            while t.estado != "en_cola" or not t.mensaje:
+                self.assertLess(time.monotonic(), fin, f"sigue {t.estado} en {t.trabajador}")
+                time.sleep(0.05)
+
+        self.assertEqual(t.mensaje, "trabajador desconectado")
+        self.assertEqual(t.intentos, 0)
+        self.assertEqual(t.trabajador, "")
+        # Y otro trabajador lo recibe en el acto
+        self.assertEqual([x.id for x in self.coordinador.arrendar("w2", 1)], [t.id])
+
+
+class LatidoEnCola(unittest.TestCase):
+    def test_en_cola_del_trabajador_sigue_asignado(self):
+        coordinador = ps3_reparto.Coordinador(arriendo=600)
+        t = coordinador.enviar({"tipo": "pkg", "url": "http://zeus.dl.playstation.net/cdn/x/juego.pkg"})
+        [a] = coordinador.arrendar("w1", 1)
+        for estado in ("en_cola", "esperando_espacio", "esperando_libray"):
+            coordinador.latido("w1", [{"id": a.id, "arriendo": a.arriendo, "estado": estado}])
+            self.assertEqual(t.estado, "asignado")
+        # Ni cambiando la prioridad se presta a otro mientras w1 lo tiene
+        coordinador.priorizar(t.id, 5)
+        self.assertEqual(coordinador.arrendar("w2", 1), [])
+        coordinador.latido("w1", [{"id": a.id, "arriendo": a.arriendo, "estado": "descargando"}])
+        self.assertEqual((t.estado, t.trabajador), ("descargando", "w1"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+"""SalidaCSO / LectorCSO: ida y vuelta de una imagen con bloques comprimibles y no."""
+
+import os
+import sys
+import shutil
+import hashlib
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import ps3_salida
+
+
+def _imagen() -> bytes:
+    # Ceros (se comprimen), aleatorio (se guarda tal cual) y un último bloque incompleto
+    return b"\0" * 70000 + os.urandom(40000) + b"PS3" * 3001
+
+
+class IdaYVueltaCSO(unittest.TestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp, True)
+        self.datos = _imagen()
+        self.cso = self.tmp / "juego.cso"
+
+    def _escribir(self, trozo: int = 7000, **kwargs) -> ps3_salida.SalidaCSO:
+        with ps3_salida.SalidaCSO(self.cso, len(self.datos), bloque=2048, hilos=2, ventana=2,
+                                  **kwargs) as salida:
+            for i in range(0, len(self.datos), trozo):
+                salida.write(self.datos[i:i + trozo])
+        return salida
+
+    def test_ida_y_vuelta(self):
+        salida = self._escribir()
+        self.assertLess(salida.comprimidos, len(self.datos))
+        self.assertEqual(salida.sha1.hexdigest(), hashlib.sha1(self.datos).hexdigest())
+        self.assertFalse(self.cso.with_name(self.cso.name + ".part").exists())
+
+        ps3_salida.comprobar_cso(self.cso, salida.total, salida.tamano)
+        self.assertEqual(ps3_salida.verificar_cso(self.cso, sha1=salida.sha1.hexdigest()),
+                         salida.sha1.hexdigest())
+        with ps3_salida.LectorCSO(self.cso) as lector:
+            self.assertEqual(lector.total, len(self.datos))
+            self.assertEqual(b"".join(lector.bloques()), self.datos)
+            # Lectura que cruza bloques comprimidos y planos
+            self.assertEqual(lector.leer(69000, 5000), self.datos[69000:74000])
+            self.assertEqual(lector.leer(len(self.datos) - 10, 100), self.datos[-10:])
+
+        iso = self.tmp / "juego.iso"
+        ps3_salida.descomprimir_cso(self.cso, iso)
+        self.assertEqual(iso.read_bytes(), self.datos)
+
+    def test_original_y_corrupcion(self):
+        salida = self._escribir()
+        original = self.tmp / "original.iso"
+        original.write_bytes(self.datos)
+        ps3_salida.verificar_cso(self.cso, original)
+
+        with open(self.cso, "ab") as f:
+            f.write(b"x")
+        with self.assertRaises(ValueError):
+            ps3_salida.comprobar_cso(self.cso, salida.total, salida.tamano)
+        with self.assertRaises(ValueError):
+            ps3_salida.verificar_cso(self.cso, sha1="0" * 40)
+
+    def test_tamano_distinto_al_previsto(self):
+        with self.assertRaises(ValueError):
+            with ps3_salida.SalidaCSO(self.cso, len(self.datos) + 1, bloque=2048, hilos=2) as salida:
+                salida.write(self.datos)
+        self.assertFalse(self.cso.exists())
+        self.assertFalse(self.cso.with_name(self.cso.name + ".part").exists())
+
+    def test_bloque_que_no_vuelve(self):
+        with mock.patch.object(ps3_salida.zlib, "decompress", return_value=b"otra cosa"):
+            with self.assertRaises(ValueError):
+                self._escribir()
+        self.assertFalse(self.cso.exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+"""SalidaPartes: partir según se escribe, verificar con el manifiesto y volver a unir."""
+
+import os
+import sys
+import shutil
+import hashlib
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import ps3_salida
+
+
+class PartesFAT32(unittest.TestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp, True)
+        self.datos = os.urandom(2500)
+        self.iso = self.tmp / "juego.iso"
+
+    def _partir(self, estilo: str = "numerico", tam: int = 1000, trozo: int = 333) -> ps3_salida.SalidaPartes:
+        with ps3_salida.SalidaPartes(self.iso, tam, estilo) as salida:
+            for i in range(0, len(self.datos), trozo):
+                salida.write(self.datos[i:i + trozo])
+        return salida
+
+    def test_partir_verificar_unir(self):
+        salida = self._partir()
+        self.assertEqual([p["tamano"] for p in salida.partes], [1000, 1000, 500])
+        nombres = sorted(p.name for p in self.tmp.iterdir())
+        self.assertEqual(nombres, ["juego.iso.0", "juego.iso.1", "juego.iso.2", "juego.iso.partes.json"])
+        self.assertFalse(self.iso.exists())
+        self.assertTrue(ps3_salida.existe_salida(self.iso))
+
+        manifiesto = ps3_salida.ruta_manifiesto(self.iso)
+        datos = ps3_salida.leer_manifiesto(manifiesto)
+        self.assertEqual(datos["sha1"], hashlib.sha1(self.datos).hexdigest())
+        self.assertEqual(datos["tamano"], len(self.datos))
+        self.assertEqual(ps3_salida.verificar_partes(manifiesto), [])
+
+        self.assertEqual(ps3_salida.unir_partes(manifiesto), self.iso)
+        self.assertEqual(self.iso.read_bytes(), self.datos)
+
+    def test_estilo_66600(self):
+        self._partir("66600")
+        self.assertTrue(ps3_salida.nombre_parte(self.iso, 2, "66600").exists())
+        self.assertEqual(ps3_salida.nombre_parte(self.iso, 2, "66600").name, "juego.iso.66602")
+
+    def test_verificar_detecta_fallos(self):
+        self._partir()
+        manifiesto = ps3_salida.ruta_manifiesto(self.iso)
+        parte = self.tmp / "juego.iso.1"
+        contenido = bytearray(parte.read_bytes())
+        contenido[0] ^= 0xFF
+        parte.write_bytes(bytes(contenido))
+        errores = ps3_salida.verificar_partes(manifiesto)
+        self.assertIn("juego.iso.1: SHA-1 no coincide", errores)
+        with self.assertRaises(ValueError):
+            ps3_salida.unir_partes(manifiesto, self.tmp / "unida.iso")
+        self.assertFalse((self.tmp / "unida.iso").exists())
+
+        parte.unlink()
+        self.assertEqual(ps3_salida.verificar_partes(manifiesto), ["Falta juego.iso.1"])
+
+    def test_una_sola_parte_queda_normal(self):
+        self._partir(tam=len(self.datos))
+        self.assertEqual(self.iso.read_bytes(), self.datos)
+        self.assertFalse(ps3_salida.ruta_manifiesto(self.iso).exists())
+
+    def test_abortar_no_deja_nada(self):
+        with self.assertRaises(RuntimeError):
+            with ps3_salida.SalidaPartes(self.iso, 1000) as salida:
+                salida.write(self.datos)
+                raise RuntimeError("libray falló")
+        self.assertEqual(list(self.tmp.iterdir()), [])
+
+    def test_tamano_parte(self):
+        self.assertEqual(ps3_salida.tamano_parte("fat32"), ps3_salida.TAM_PARTE_FAT32)
+        self.assertLess(ps3_salida.TAM_PARTE_FAT32, 4 * 1024 ** 3)
+        self.assertEqual(ps3_salida.tamano_parte("700M"), 700 * 1024 ** 2)
+        self.assertEqual(ps3_salida.tamano_parte("4GiB"), 4 * 1024 ** 3)
+        self.assertEqual(ps3_salida.tamano_parte(""), 0)
+        self.assertEqual(ps3_salida.tamano_parte("1048576"), 1048576)
+
+
+if __name__ == "__main__":
+    unittest.main()
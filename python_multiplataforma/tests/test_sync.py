@@ -0,0 +1,97 @@
+"""ps3_sync.planificar: camino rápido, adopción, cambios en el origen y poda."""
+
+import sys
+import shutil
+import hashlib
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import ps3_sync
+from ps3_sync import Deseado
+
+
+def _deseado(ruta: str, datos: bytes) -> Deseado:
+    sha1 = hashlib.sha1(datos).hexdigest()
+    return Deseado(ruta, f"item/{ruta}", len(datos), f"sha1:{sha1}", {"sha1": sha1})
+
+
+class PlanSync(unittest.TestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp, True)
+        self.datos = {"a.zip": b"juego a", "b.zip": b"juego b"}
+        self.deseados = [_deseado(r, d) for r, d in self.datos.items()]
+        for ruta, datos in self.datos.items():
+            (self.tmp / ruta).write_bytes(datos)
+
+    def _planificar(self, deseados=None, **kwargs) -> ps3_sync.Plan:
+        return ps3_sync.planificar(self.deseados if deseados is None else deseados,
+                                   self.tmp, ps3_sync.Manifiesto(self.tmp), **kwargs)
+
+    def _sincronizado(self) -> None:
+        """Pasada inicial: lo que ya está en disco se adopta y queda en el manifiesto."""
+        manifiesto = ps3_sync.Manifiesto(self.tmp)
+        plan = ps3_sync.planificar(self.deseados, self.tmp, manifiesto)
+        self.assertEqual(sorted(plan.adoptados), ["a.zip", "b.zip"])
+        self.assertEqual(plan.descargar, [])
+        manifiesto.guardar()
+
+    def test_adoptar_y_falta(self):
+        (self.tmp / "b.zip").write_bytes(b"juego b roto")
+        extra = _deseado("c.zip", b"juego c")
+        plan = self._planificar(self.deseados + [extra])
+        self.assertEqual(plan.adoptados, ["a.zip"])
+        self.assertEqual([(d.ruta, motivo) for d, motivo in plan.descargar],
+                         [("b.zip", "distinto en disco"), ("c.zip", "falta")])
+
+    def test_camino_rapido_no_lee(self):
+        self._sincronizado()
+        with mock.patch.object(ps3_sync, "_huella", side_effect=AssertionError("no debe leer")):
+            plan = self._planificar()
+        self.assertEqual(sorted(plan.al_dia), ["a.zip", "b.zip"])
+        self.assertEqual((plan.descargar, plan.adoptados), ([], []))
+        # --verificar sí recalcula las huellas
+        with mock.patch.object(ps3_sync, "_huella", wraps=ps3_sync._huella) as huella:
+            plan = self._planificar(verificar=True)
+        self.assertEqual(huella.call_count, 2)
+        self.assertEqual(sorted(plan.al_dia), ["a.zip", "b.zip"])
+
+    def test_cambiado_en_el_origen(self):
+        self._sincronizado()
+        nuevo = _deseado("a.zip", b"juego a v2")
+        with mock.patch.object(ps3_sync, "_huella", side_effect=AssertionError("no debe leer")):
+            plan = self._planificar([nuevo, self.deseados[1]])
+        self.assertEqual([(d.ruta, motivo) for d, motivo in plan.descargar],
+                         [("a.zip", "cambiado en el origen")])
+        self.assertEqual(plan.al_dia, ["b.zip"])
+
+    def test_validador_de_otro_tipo_se_comprueba(self):
+        self._sincronizado()
+        # Tras importar otros metadatos el validador cambia de tipo: se lee y se adopta
+        datos = self.datos["a.zip"]
+        sha256 = hashlib.sha256(datos).hexdigest()
+        otro = Deseado("a.zip", "item/a.zip", len(datos), f"sha256:{sha256}", {"sha256": sha256})
+        plan = self._planificar([otro, self.deseados[1]])
+        self.assertEqual(sorted(plan.al_dia), ["a.zip", "b.zip"])
+        self.assertEqual(plan.descargar, [])
+
+    def test_podar_solo_lo_sincronizado(self):
+        self._sincronizado()
+        (self.tmp / "mio.txt").write_bytes(b"no sincronizado")
+        plan = self._planificar(self.deseados[:1], podar=True)
+        self.assertEqual(plan.podar, ["b.zip"])
+        self.assertEqual(self._planificar(self.deseados[:1]).podar, [])
+
+        ps3_sync.sincronizar(self.deseados[:1], self.tmp, lambda d, p: False, podar=True,
+                             informar=lambda msg: None)
+        self.assertFalse((self.tmp / "b.zip").exists())
+        self.assertTrue((self.tmp / "mio.txt").exists())
+        self.assertEqual(list(ps3_sync.Manifiesto(self.tmp).entradas), ["a.zip"])
+
+
+if __name__ == "__main__":
+    unittest.main()